@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of GDB/MI string escaping (:func:`hwtHlsGdb.gdbMiMessages.gdbMiEscapeStr`) on a large
+stack-list-variables reply (the names of all LLVM IR registers are escaped for every reply).
+
+Compared implementations:
+
+* reference - per character generator :func:`hwtHlsGdb.gdbMiMessages.gdbMiEscapeStrChar`
+* table - str.translate without cache
+* cached - gdbMiEscapeStr as used by the frontend
+
+.. code-block:: text
+
+    python3 benchmarks/gdbMiEscapeBenchmark.py [-r REGISTERS] [-n REPEAT]
+"""
+
+import argparse
+import sys
+from time import perf_counter
+from typing import Callable, List
+
+from hwtHlsGdb.gdbMiMessages import gdbMiEscapeStr, gdbMiEscapeStrChar
+
+
+def gdbMiEscapeStrReference(text: str, sevenbit_strings: bool=True):
+    buff = []
+    for c in text:
+        buff.extend(gdbMiEscapeStrChar(c, '"', sevenbit_strings))
+    _text = ''.join(buff)
+    return f'"{_text:s}"'
+
+
+def generateRegisterNames(n: int) -> List[str]:
+    names = []
+    for i in range(n):
+        if i % 3 == 0:
+            names.append(f"%{i:d}")
+        elif i % 3 == 1:
+            names.append(f"%for.body{i:d}.i.i")
+        else:
+            names.append(f'%"name with\\tescapes {i:d}"')
+    return names
+
+
+def formatStackListVariables(names: List[str], escape: Callable[[str], str]) -> str:
+    regs = [f'{{name={escape(name)}, value="0x0"}}' for name in names]
+    return f'variables=[{",".join(regs):s}]'
+
+
+def runBenchmark(names: List[str], repeat: int, escape: Callable[[str], str]) -> float:
+    """
+    :returns: time per reply in seconds
+    """
+    t0 = perf_counter()
+    for _ in range(repeat):
+        formatStackListVariables(names, escape)
+    return (perf_counter() - t0) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of GDB/MI string escaping")
+    parser.add_argument("-r", "--registers", type=int, default=2000, help="number of registers in reply")
+    parser.add_argument("-n", "--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    names = generateRegisterNames(args.registers)
+    ref = formatStackListVariables(names, gdbMiEscapeStrReference)
+    assert formatStackListVariables(names, gdbMiEscapeStr) == ref
+
+    print(f"{len(names):d} registers, reply {len(ref):d} characters, {args.repeat:d} repetitions")
+    for name, escape in (("reference", gdbMiEscapeStrReference),
+                         ("table", gdbMiEscapeStr.__wrapped__),
+                         ("cached", gdbMiEscapeStr)):
+        t = runBenchmark(names, args.repeat, escape)
+        print(f"{name:10s} {t * 1e3:8.3f} ms/reply")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of GDB/MI command parser (:func:`hwtHlsGdb.gdbMiMessages.parseGdbCmd`).
+
+Commands are extracted from transcripts (the debug file written by hwtHlsGdb.gdbLlvimIr or a log of GDB/MI
+session from an IDE), a line is considered to be a command if it starts with an optional token followed by "-".
+If no transcript is specified, an embedded sample of VSCode and Eclipse CDT session is used.
+
+.. code-block:: text
+
+    python3 benchmarks/gdbMiParseBenchmark.py [gdb_out.txt ...]
+"""
+
+import argparse
+import re
+import sys
+from time import perf_counter
+from typing import List
+
+from hwtHlsGdb.gdbMiMessages import parseGdbCmd, _parseGdbCmdBody
+
+SAMPLE_TRANSCRIPT = r"""
+1-gdb-set breakpoint pending on
+2-gdb-set detach-on-fork on
+3-enable-pretty-printing
+4-interpreter-exec --thread-group i1 console "p/x (char)-1"
+5-interpreter-exec --thread-group i1 console "show endian"
+6-gdb-set --thread-group i1 language c
+7-data-evaluate-expression --thread-group i1 "sizeof (void*)"
+8-gdb-set --thread-group i1 language auto
+9-file-exec-and-symbols "/home/user/project/tmp/main.ll"
+10-list-thread-groups
+11-target-select remote 127.0.0.1:10000
+12-break-insert -f "/home/user/project/tmp/main.ll:11"
+13-break-insert -t -f main
+14-exec-run
+15-thread-info 1
+16-stack-info-depth --thread 1 1000
+17-stack-list-frames --thread 1
+18-stack-list-variables --thread 1 --frame 0 --simple-values
+19-var-create --thread 1 --frame 0 - * "%0"
+20-var-create --thread 1 --frame 0 - * "%1"
+21-var-create --thread 1 --frame 0 - * "%\"quoted name\\n\""
+22-exec-next --thread 1 1
+23-var-update --all-values *
+24-stack-list-frames --thread 1
+25-stack-list-variables --thread 1 --frame 0 --simple-values
+26-exec-step --thread 1 1
+27-var-update --all-values *
+28-data-list-register-values --thread 1 x
+29-exec-continue --thread 1
+30-break-delete 1
+31-interpreter-exec console "set pagination off"
+32-gdb-exit
+"""
+
+RE_CMD_LINE = re.compile(r"^\d*-[a-zA-Z]")
+
+
+def loadCommands(transcripts: List[str]) -> List[str]:
+    if transcripts:
+        lines = []
+        for t in transcripts:
+            with open(t) as f:
+                lines.extend(f)
+    else:
+        lines = SAMPLE_TRANSCRIPT.split("\n")
+    return [l.rstrip("\r\n") + "\n" for l in lines if RE_CMD_LINE.match(l)]
+
+
+def runBenchmark(commands: List[str], repeat: int, cached: bool) -> float:
+    """
+    :returns: time per command in seconds
+    """
+    t0 = perf_counter()
+    for _ in range(repeat):
+        if not cached:
+            _parseGdbCmdBody.cache_clear()
+        for c in commands:
+            parseGdbCmd(c)
+    return (perf_counter() - t0) / (repeat * len(commands))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of GDB/MI command parser")
+    parser.add_argument("transcript", nargs="*", help="debug file of gdbLlvimIr or other GDB/MI log")
+    parser.add_argument("-n", "--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    commands = loadCommands(args.transcript)
+    if not commands:
+        print("No commands found", file=sys.stderr)
+        return 1
+
+    print(f"{len(commands):d} commands, {args.repeat:d} repetitions")
+    for cached in (False, True):
+        t = runBenchmark(commands, args.repeat, cached)
+        print(f"{'cached' if cached else 'uncached':8s} {t * 1e6:8.3f} us/command")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the startup of GDB/MI frontend (hwtHlsGdb/gdbLlvimIr.py) as it is launched by IDE.
+
+Measured times (from the start of the process):
+
+* version - until the process executed with --version exits
+* prompt - until the first "(gdb)" prompt of "--interpreter mi2" session
+* symbols - until the reply to symbol-list-lines after file-exec-and-symbols (requires --ir),
+  the IR is loaded from index cache if it is there (:mod:`hwtHlsGdb.gdbLlvmIrIndexCache`),
+  use --no-cache to measure the parsing of the IR
+
+.. code-block:: text
+
+    python3 benchmarks/gdbMiStartupBenchmark.py [--ir 02.preLlvm.ll] [--no-cache] [-n REPEAT]
+"""
+
+import argparse
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+from typing import List, Optional, Dict
+
+GDB_MI_FRONTEND = Path(__file__).parent.parent / "hwtHlsGdb" / "gdbLlvimIr.py"
+
+
+def measureVersion(env: Dict[str, str]) -> float:
+    t0 = perf_counter()
+    subprocess.run([sys.executable, str(GDB_MI_FRONTEND), "--version"], env=env,
+                   stdout=subprocess.DEVNULL, check=True)
+    return perf_counter() - t0
+
+
+def _readUntil(p: subprocess.Popen, prefix: bytes):
+    while True:
+        line = p.stdout.readline()
+        if not line:
+            raise AssertionError("Unexpected end of output", prefix)
+        if line.startswith(prefix):
+            return line
+
+
+def measureSession(env: Dict[str, str], ir: Optional[str]) -> List[float]:
+    """
+    :returns: time to first prompt and optionally time to reply of symbol-list-lines
+    """
+    t0 = perf_counter()
+    p = subprocess.Popen([sys.executable, str(GDB_MI_FRONTEND), "--interpreter", "mi2"], env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        _readUntil(p, b"(gdb)")
+        times = [perf_counter() - t0]
+        if ir is not None:
+            ir = os.path.abspath(ir)
+            p.stdin.write(f'1-file-exec-and-symbols "{ir:s}"\n2-symbol-list-lines "{ir:s}"\n'.encode())
+            p.stdin.flush()
+            line = _readUntil(p, b"2^")
+            assert line.startswith(b"2^done"), line
+            times.append(perf_counter() - t0)
+        p.stdin.write(b"3-gdb-exit\n")
+        p.stdin.flush()
+        p.wait(10)
+    finally:
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of GDB/MI frontend startup")
+    parser.add_argument("--ir", help="LLVM IR file to load in file-exec-and-symbols")
+    parser.add_argument("--no-cache", action="store_true", help="disable the index cache")
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["HWTHLSGDB_TRANSCRIPT"] = os.path.join(tmp, "gdb_out.txt")
+        if args.no_cache:
+            env["HWTHLSGDB_CACHE_DIR"] = ""
+        if args.ir is not None and not args.no_cache:
+            measureSession(env, args.ir)  # fill the cache
+
+        results = {"version": [], "prompt": [], "symbols": []}
+        for _ in range(args.repeat):
+            results["version"].append(measureVersion(env))
+            times = measureSession(env, args.ir)
+            results["prompt"].append(times[0])
+            if args.ir is not None:
+                results["symbols"].append(times[1])
+
+    print(f"{args.repeat:d} repetitions")
+    for name, times in results.items():
+        if times:
+            print(f"{name:8s} min {min(times) * 1e3:8.1f} ms, median {statistics.median(times) * 1e3:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
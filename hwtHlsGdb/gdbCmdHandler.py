@@ -1,5 +1,5 @@
 from math import inf
-from typing import Union, Optional, Dict, Literal
+from typing import Union, Optional, Dict, Literal, Tuple
 
 from hwtHlsGdb.gdbRemoteMessages import GdbBreakPointType, \
     gdbReplyUnsupported
@@ -7,6 +7,15 @@ from hwtHlsGdb.gdbRemoteMessages import GdbBreakPointType, \
 class CycleLimitReached:
     pass
 
+
+class GdbStepMode:
+    """
+    Granularity of step and next commands (selected by "monitor step-mode")
+    """
+    INSTRUCTION = "instruction"
+    BLOCK = "block"  # until the start of the next basic block
+    TIME = "time"  # until the simulation time advances by specified time
+
 class GdbCmdHandler():
     """
     A handler handles the incoming GDB commands via GDBServerStub.
@@ -46,6 +55,69 @@ class GdbCmdHandler():
         """
         return gdbReplyUnsupported()
 
+    def handleNext(self):
+        """
+        Handles "vHwtNext" (an extension of this stub), a step which does not stop in called functions.
+        """
+        return gdbReplyUnsupported()
+
+    def handleMonitorCmd(self, cmd: str) -> Tuple[Optional[str], str]:
+        """
+        Handles "qRcmd" (the monitor command of GDB).
+
+        :param cmd: the command decoded from hex
+        :returns: tuple (text for console output or None, reply)
+        """
+        return (None, gdbReplyUnsupported())
+
+    def handleContinueBounded(self, cycleLimit: int):
+        """
+        Handles "monitor run N", continue execution until the next break point or until cycleLimit instructions
+        were executed.
+        """
+        return gdbReplyUnsupported()
+
+    def getSimTime(self) -> Optional[int]:
+        """
+        :returns: the current simulation time (for progress messages) or None if the target does not have any
+        """
+        return None
+
+    def getWaveLogBytes(self) -> Optional[int]:
+        """
+        :returns: the size of written wave log (for stats) or None if there is not any
+        """
+        return None
+
+    def handleFinish(self):
+        """
+        Handles "vHwtFinish" (an extension of this stub), runs until the current function returns to its caller.
+        :returns: OK if the execution was resumed, error if there is no caller
+        """
+        return gdbReplyUnsupported()
+
+    def handleRangeStep(self, start: int, end: int):
+        """
+        Handles range stepping ("r" action of vCont). It executes instructions while the address is in [start, end)
+        and steps over the called functions.
+        """
+        return gdbReplyUnsupported()
+
+    def handleUntil(self, address: int):
+        """
+        Handles "vHwtUntil" (an extension of this stub), runs until the address is reached
+        or the current function returns to its caller.
+        """
+        return gdbReplyUnsupported()
+
+    def handleFrameInfo(self):
+        """
+        Handles "qHwtFrames" (an extension of this stub) that queries the call stack.
+        :returns: comma separated hex addresses of all frames (the current instruction first,
+            then the call instruction in each caller)
+        """
+        return gdbReplyUnsupported()
+
     def handleReadMemory(self, address: int, length: int):
         """
         Handles read of the memory content.
@@ -151,6 +223,12 @@ class GdbCmdHandler():
         """
         return gdbReplyUnsupported()
 
+    def handleAddTemporaryBreakpoint(self, address: int):
+        """
+        Handles "vHwtTbreak" (an extension of this stub), adds a breakpoint which is deleted once hit.
+        """
+        return gdbReplyUnsupported()
+
     def handleRemoveBreakpoint(self, btype: GdbBreakPointType, address: int, kind: int):
         """
         Handles removing a breakpoint.
@@ -1,28 +1,34 @@
-import ast
 import binascii
 import logging
+from bisect import bisect_right
 from math import ceil, inf
-import re
-from typing import Optional, Dict, Tuple, Generator, Union, List, Set, Literal
+from typing import Optional, Dict, Tuple, Generator, Union, List, Set, Literal, Sequence
 
 from hwt.hdl.types.bits import HBits
 from hwt.hdl.types.bitsConst import HBitsConst
 from hwt.hdl.const import HConst
-from hwtHls.llvm.llvmIr import Function, BasicBlock, Instruction, TypeToIntegerType, IntegerType, \
-    LLVMStringContext
+from hwtHls.llvm.llvmIr import Function, BasicBlock, Instruction, LLVMStringContext, TypeToIntegerType, \
+    InstructionToCallInst, InstructionToReturnInst, ValueToConstantInt, ValueToUndefValue, Argument
 from hwtHls.ssa.analysis.llvmIrInterpret import LlvmIrInterpret
-from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler, CycleLimitReached
+from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler, CycleLimitReached, GdbStepMode
+from hwtHlsGdb.gdbLlvmIrCoverage import LlvmIrCoverage
+from hwtHlsGdb.gdbLlvmIrIndexCache import llvmIrHash, llvmIrIndexLoad, llvmIrIndexStore, LlvmIrIndex, \
+    llvmIrModuleIndexLoad, llvmIrModuleIndexStore, LlvmIrModuleIndex
+# :note: LlvmRegisterInfo, llvmIrIterRegs, llvmIrLoadModule are imported also for backward compatibility
+from hwtHlsGdb.gdbLlvmIrRegs import LLVM_IR_SRC_CODELINE_OFFSET, LlvmRegisterInfo, llvmIrIterRegs, llvmIrLoadModule, \
+    llvmIrFunctionInfos, LlvmIrFunctionInfo
 from hwtHlsGdb.gdbRemoteMessages import gdbReplyStopped, gdbReplyOk, \
     gdbReplyError, gdbReplyCurrentThreadId, gdbReplyThreadIds, \
     ERROR_BAD_ACCESS_SIZE_FOR_ADDRESS, _bytesToInt32Array, GdbBreakPointType, \
-    GdbTargetSignal
+    GdbTargetSignal, gdbReplyUnsupported
 from hwtSimApi.constants import CLK_PERIOD
 from pyDigitalWaveTools.vcd.writer import VcdWriter
 
 trace = logging.getLogger("GdbServerHandlerLllvmMir:trace").debug
 
-RE_ID = re.compile('[^0-9a-zA-Z_]+')
-LLVM_IR_SRC_CODELINE_OFFSET = 6
+# caller part of the call stack: index of function, basic block, predecessor block, call instruction
+# and values of registers of the called function saved before recursive call (or None)
+LlvmIrSimFrame = Tuple[int, BasicBlock, Optional[BasicBlock], Instruction, Optional[Dict[Instruction, HConst]]]
 
 
 class LlvmIrSimPcReg:
@@ -33,57 +39,6 @@ class LlvmIrSimPcReg:
     pass
 
 
-class LlvmRegisterInfo():
-
-    def __init__(self, codeline: int, registerIndex: Optional[int], instr: Instruction, dtype: Optional[IntegerType], name:Optional[str], dtypeName: Optional[str]):
-        self.codeline = codeline
-        self.registerIndex = registerIndex
-        self.instr = instr
-        self.dtype = dtype
-        self.name = name
-        self.dtypeName = dtypeName
-
-
-def llvmIrIterRegs(codelineOffset: int, regIndexOffset: int, fn: Function, sanitizeNames: bool):
-    seenNames: Set[str] = set()
-    for bb in fn:
-        bb: BasicBlock
-        for instr in bb:
-            instr: Instruction
-            t: IntegerType = TypeToIntegerType(instr.getType())
-            if t is None:
-                yield LlvmRegisterInfo(codelineOffset, None, instr, None, None, None)
-                codelineOffset += 1
-                continue
-
-            name = instr.printAsOperand()
-            dtypeName, name = name.split(' ', 1)
-            name = name.strip()
-            # if name.startswith("label "):
-            #    name = name[len("label "):]
-            if name.startswith("%"):
-                name = name[1:]
-            if name.startswith('"') and name.endswith('"'):
-                name = ast.literal_eval(name)
-
-            assert name, instr
-            _name = name
-            if sanitizeNames:
-                _name = name = RE_ID.sub("_", name)
-
-            nameI = 1
-            while name in seenNames:
-                name = f"{_name}_{nameI}"
-                nameI += 1
-            seenNames.add(name)
-
-            yield LlvmRegisterInfo(codelineOffset, regIndexOffset, instr, t, name, dtypeName)
-            codelineOffset += 1
-            regIndexOffset += 1
-
-        codelineOffset += 2
-
-
 class GdbCmdHandlerLllvmIr(GdbCmdHandler):
     """
     An object which translates GDB remote commands to a simulator of LLVM IR.
@@ -93,39 +48,98 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
     :ivar registerToIndex: dictionary mapping 
     :ivar nowTime: simulation time for logging purposes
     :ivar timeStep: time step for simulation time
+    :ivar coverage: optional line and branch coverage counters updated for every executed instruction
+    :ivar fnInfos: position of all functions in IR file and in the register file
+    :ivar fnIndexed: flag for each function which tells if the registers of the function were indexed
+    :ivar callStack: frames of callers of the current function (the outermost first)
+    :ivar curFnIndex: index of the currently executed function in fnInfos
+    :ivar finishDepth: if not None the execution stops once the call stack is shorter than this (exec-finish)
+    :ivar stepMode: granularity of step and next (:see: :class:`GdbStepMode`), selected by "monitor step-mode"
+    :ivar stepTime: simulation time executed by a step in GdbStepMode.TIME mode
+    :ivar breakpoints: dictionary address -> False for temporary breakpoints (deleted once hit), True for others
+    :note: If irFile (the file from which the function was parsed) is specified, register names and codelines
+        are loaded from the index cache (:mod:`hwtHlsGdb.gdbLlvmIrIndexCache`) or stored there for the next run
+        and for GDB/MI frontend.
+    :note: If fns (all functions of the module) are specified, the registers of all functions are in the register file
+        (in the same order as in GDB/MI frontend). Only the function of interpret is indexed upfront,
+        the other functions are indexed on the first access to their registers.
+        The registers of functions which were not indexed yet are reported as 0.
+    :note: A call of a function from fns enters the called function (the call and the return take one step each),
+        the return value is taken from the register returned by the function.
+        The arguments are bound only if the binding provides Function.args().
     """
 
     def __init__(self, interpret: LlvmIrInterpret,
                  fnArgs: tuple,
-                 codelineOffset: int=LLVM_IR_SRC_CODELINE_OFFSET):
+                 codelineOffset: int=LLVM_IR_SRC_CODELINE_OFFSET,
+                 collectCoverage: bool=False,
+                 waveLog: Optional[VcdWriter]=None,
+                 strCtx: Optional[LLVMStringContext]=None,
+                 timeStep: int=CLK_PERIOD,
+                 irFile: Optional[str]=None,
+                 fns: Optional[Sequence[Function]]=None):
         super(GdbCmdHandlerLllvmIr, self).__init__()
         self.interpret = interpret
+        self.fn: Function = interpret.F
         self.fnArgs = fnArgs
+        self.waveLog = waveLog
+        self.waveLogInitialized = waveLog is None
+        self.strCtx = strCtx
+        self.simCodelineLabel = None
+        self.simTimeLabel = None
+        self.nowTime = 0
+        self.timeStep = timeStep
         self.registerToIndex: Dict[Instruction, int] = {}
         self.registerToName: Dict[Instruction, str] = {}
         self.registerValue: Dict[Instruction, HConst] = {}
-        self.registers: List[Union[Instruction, Literal[LlvmIrSimPcReg]]] = [LlvmIrSimPcReg, ]
-        self.REGISTER_INFO: List[str] = [
-            f'name:pc;bitsize:64;offset:0;encoding:uint;format:hex;set:Program Counter;generic:pc;'
-        ]
+        self.indexToRegister: Dict[int, Instruction] = {}
         self.instrCodeline: Dict[Instruction, int] = {}
-        regOffset = 8
-        for r in llvmIrIterRegs(codelineOffset, len(self.REGISTER_INFO), interpret.F, False):
-            instr: Instruction = r.instr
-            self.instrCodeline[instr] = r.codeline
-            t = r.dtype
-            if t is None:
-                continue
-            self.registers.append(instr)
-            self.REGISTER_INFO.append(
-                f'name:{r.name};bitsize:{t.getBitWidth()};offset:{regOffset};encoding:uint;format:hex;set:LLVM IR reg;generic:{r.name};'
-            )
-            self.registerToIndex[instr] = r.registerIndex
-            self.registerToName[instr] = r.name
-            self.registerValue[instr] = HBits(t.getBitWidth()).from_py(None)
-            regOffset += ceil(t.getBitWidth() / 8)
 
-        self.indexToRegister = {v: k for k, v in self.registerToIndex.items()}
+        self.irHash = None if irFile is None else llvmIrHash(irFile)
+        self.fnInfos: List[LlvmIrFunctionInfo] = llvmIrFunctionInfos((interpret.F,) if fns is None else fns,
+                                                                     codelineOffset, 1, irFile)
+        if fns is not None and self.irHash is not None and llvmIrModuleIndexLoad(self.irHash) is None:
+            llvmIrModuleIndexStore(self.irHash, LlvmIrModuleIndex.fromFunctionInfos(self.fnInfos))
+        self.fnIndexed: List[bool] = [False for _ in self.fnInfos]
+        self._fnIndexByName: Dict[str, int] = {fi.name: i for i, fi in enumerate(self.fnInfos)}
+        # registers of each indexed function
+        self._fnRegs: List[Optional[List[Instruction]]] = [None for _ in self.fnInfos]
+        # call instruction -> index of the called function
+        self.callTargets: Dict[Instruction, int] = {}
+        self.returnInstrs: Set[Instruction] = set()
+        self.callStack: List[LlvmIrSimFrame] = []
+        self.finishDepth: Optional[int] = None
+        # (start address, end address, depth of call stack) of range stepping
+        self.stepRange: Optional[Tuple[int, int, int]] = None
+        # (step mode, depth of call stack, step over flag, end time) of a step in block or time mode
+        self.stepGranule: Optional[Tuple[str, int, bool, int]] = None
+        self.stepMode = GdbStepMode.INSTRUCTION
+        self.stepTime = CLK_PERIOD
+        # temporary breakpoint of exec-until
+        self._untilAddr: Optional[int] = None
+        self._fnRegIndexOffsets = [fi.regIndexOffset for fi in self.fnInfos]
+        fnName = interpret.F.getName().str()
+        fnIndex = next((i for i, fi in enumerate(self.fnInfos) if fi.name == fnName), None)
+        assert fnIndex is not None, ("Simulated function is not in fns", fnName)
+        codelineOffset = self.fnInfos[fnIndex].codelineOffset
+        self.fnIndex = self.curFnIndex = fnIndex
+
+        # registers are allocated for all functions, only the function of interpret is indexed now
+        self.registers: List[Union[None, Instruction, Literal[LlvmIrSimPcReg]]] = [LlvmIrSimPcReg, ]
+        self.registerBitWidths: List[int] = [64, ]
+        for fi in self.fnInfos:
+            self.registers.extend(None for _ in range(fi.regCnt))
+            self.registerBitWidths.extend(fi.bitWidths)
+        self._registerByteOffsets: List[int] = []
+        regOffset = 0
+        for bitWidth in self.registerBitWidths:
+            self._registerByteOffsets.append(regOffset)
+            regOffset += ceil(bitWidth / 8)
+        self.REGISTER_INFO: List[Optional[str]] = [None for _ in self.registers]
+        self.REGISTER_INFO[LlvmIrSimPcReg.INDEX] = \
+            f'name:pc;bitsize:64;offset:0;encoding:uint;format:hex;set:Program Counter;generic:pc;'
+        self._indexFunction(fnIndex)
+
         self.bb: Optional[BasicBlock] = None
         self.instr: Optional[Instruction] = None  # :note: this is always a next instruction which was not executed yet
         self.predBb: Optional[BasicBlock] = None
@@ -133,6 +147,161 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
         self.memory = {}
         self.breakpoints = {}
         self.codelineOffset = codelineOffset
+        self.coverage: Optional[LlvmIrCoverage] = None
+        if collectCoverage:
+            self.coverage = LlvmIrCoverage(interpret.F, self.instrCodeline, codelineOffset)
+
+    def _indexFunction(self, fnIndex: int):
+        """
+        Resolve names and codelines of registers of the function and allocate storage for their values.
+        """
+        fi = self.fnInfos[fnIndex]
+        fnRegs = self._fnRegs[fnIndex] = []
+        for r, bitWidth in self._iterRegs(fi.fn, fi.codelineOffset, fi.regIndexOffset, self.irHash, fnIndex):
+            instr: Instruction = r.instr
+            self.instrCodeline[instr] = r.codeline
+            calleeIndex = self._getCalleeIndex(instr)
+            if calleeIndex is not None:
+                self.callTargets[instr] = calleeIndex
+            elif InstructionToReturnInst(instr) is not None:
+                self.returnInstrs.add(instr)
+            if r.registerIndex is None:
+                continue
+            fnRegs.append(instr)
+            self.registers[r.registerIndex] = instr
+            self.REGISTER_INFO[r.registerIndex] = (
+                f'name:{r.name};bitsize:{bitWidth};offset:{self._registerByteOffsets[r.registerIndex]};'
+                f'encoding:uint;format:hex;set:LLVM IR reg;generic:{r.name};'
+            )
+            self.registerToIndex[instr] = r.registerIndex
+            self.indexToRegister[r.registerIndex] = instr
+            self.registerToName[instr] = r.name
+            self.registerValue[instr] = HBits(bitWidth).from_py(None)
+        self.fnIndexed[fnIndex] = True
+
+    def _getCalleeIndex(self, instr: Instruction) -> Optional[int]:
+        """
+        :returns: index of the function called by instr if it is a direct call of a function from fnInfos
+        """
+        call = InstructionToCallInst(instr)
+        if call is None:
+            return None
+        callee = call.getCalledFunction()
+        if callee is None:
+            return None  # indirect call
+        # None for declarations and intrinsics which are handled by interpret
+        return self._fnIndexByName.get(callee.getName().str(), None)
+
+    def _getCallArgValues(self, callInstr: Instruction, calleeIndex: int) -> Optional[List[Tuple[Argument, HConst]]]:
+        """
+        Resolve the values of arguments of the call (before any of them is bound, the callee may be the caller itself).
+
+        :returns: list of tuples (argument of the called function, value)
+            or None if some argument can not be resolved and the call can not be simulated in the called function
+        """
+        argValues = []
+        for a, op in zip(self.fnInfos[calleeIndex].fn.args(), callInstr.iterOperandValues()):
+            v = self._getOperandValue(op)
+            if v is None:
+                return None
+            argValues.append((a, v))
+        return argValues
+
+    def _enterCall(self, callInstr: Instruction, calleeIndex: int, argValues: List[Tuple[Argument, HConst]],
+                   bb: BasicBlock, predBb: Optional[BasicBlock]):
+        """
+        Push the frame of the caller, bind the arguments and move to the first instruction of the called function.
+
+        :param argValues: values of arguments from :meth:`~._getCallArgValues`
+        :returns: the entry block and the first instruction of the called function
+        """
+        if not self.fnIndexed[calleeIndex]:
+            self._indexFunction(calleeIndex)
+        registerValue = self.registerValue
+        savedValues = None
+        if calleeIndex == self.curFnIndex or any(f[0] == calleeIndex for f in self.callStack):
+            # recursion, registers and arguments of the called function are overwritten
+            savedValues = {r: registerValue[r] for r in self._fnRegs[calleeIndex]}
+            for a, _ in argValues:
+                v = registerValue.get(a, None)
+                if v is not None:
+                    savedValues[a] = v
+        for a, v in argValues:
+            registerValue[a] = v
+        callee = self.fnInfos[calleeIndex].fn
+        self.callStack.append((self.curFnIndex, bb, predBb, callInstr, savedValues))
+        self.curFnIndex = calleeIndex
+        bb = callee.getEntryBlock()
+        return bb, next(iter(bb))
+
+    def _getOperandValue(self, op) -> Optional[HConst]:
+        """
+        Resolve the value of an operand in the current state of the simulation, same as the interpret does,
+        the operand may be a register (instruction or bound argument), integer constant or undef/poison.
+
+        :returns: the value or None if the operand is not an integer value known to the simulation
+        """
+        v = self.registerValue.get(op, None)
+        if v is not None:
+            return v
+        t = TypeToIntegerType(op.getType())
+        if t is None:
+            return None
+        dtype = HBits(t.getBitWidth())
+        c = ValueToConstantInt(op)
+        if c is not None:
+            return dtype.from_py(c.getValue().getZExtValue())
+        if ValueToUndefValue(op) is not None:
+            return dtype.from_py(None)  # also poison, PoisonValue is a subclass of UndefValue
+        return None
+
+    def _returnFromCall(self, retInstr: Instruction):
+        """
+        Pop the frame of the caller, set the value of the call instruction and move after it.
+
+        :returns: the block, the predecessor block and the instruction after the call in the caller
+        """
+        fnIndex, bb, predBb, callInstr, savedValues = self.callStack.pop()
+        registerValue = self.registerValue
+        retVal = next(iter(retInstr.iterOperandValues()), None)
+        retVal = None if retVal is None else self._getOperandValue(retVal)
+        if savedValues is not None:
+            registerValue.update(savedValues)
+        curVal = registerValue.get(callInstr, None)
+        if curVal is not None:
+            # the value from the previous execution of the call must not survive an unresolved return value
+            registerValue[callInstr] = curVal._dtype.from_py(None) if retVal is None else retVal
+        self.curFnIndex = fnIndex
+        return bb, predBb, callInstr.getNextNode()
+
+    def _indexFunctionOfRegister(self, index: int):
+        fnIndex = bisect_right(self._fnRegIndexOffsets, index) - 1
+        if not self.fnIndexed[fnIndex]:
+            trace("index function %s", self.fnInfos[fnIndex].name)
+            self._indexFunction(fnIndex)
+
+    @staticmethod
+    def _iterRegs(fn: Function, codelineOffset: int, regIndexOffset: int, irHash: Optional[bytes], fnIndex: int=0):
+        """
+        :param irHash: hash of the IR file from which fn was parsed, if specified the index cache is used
+        :param fnIndex: index of the function in the module (:see: :func:`hwtHlsGdb.gdbLlvmIrRegs.llvmIrFunctionInfos`)
+        :returns: generator of tuples (register info, bit width) for every instruction in fn
+        """
+        if irHash is None:
+            for r in llvmIrIterRegs(codelineOffset, regIndexOffset, fn, False):
+                yield r, (0 if r.dtype is None else r.dtype.getBitWidth())
+            return
+
+        fnName = fn.getName().str()
+        index = llvmIrIndexLoad(irHash, fnIndex)
+        instrs = [instr for bb in fn for instr in bb]
+        if index is not None and index.fnName == fnName and len(index.codelines) == len(instrs):
+            yield from zip(index.iterRegs(codelineOffset, regIndexOffset, instrs), index.bitWidths)
+        else:
+            regs = tuple(llvmIrIterRegs(codelineOffset, regIndexOffset, fn, False))
+            llvmIrIndexStore(irHash, LlvmIrIndex.fromRegs(fnName, regs, codelineOffset, regIndexOffset), fnIndex)
+            for r in regs:
+                yield r, (0 if r.dtype is None else r.dtype.getBitWidth())
 
     def runCurrentInstr(self) -> Union[int, CycleLimitReached, None]:
         """
@@ -159,13 +328,45 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
                 assert instr is not None, bb
                 instrAddr = self.instrCodeline[instr] * 8
                 if instrAddr in self.breakpoints:
-                    return instrAddr
+                    return self._checkStop(instrAddr, True)
 
             self.nowTime += self.timeStep
+            callStack = self.callStack
             if waveLog is not None:
                 waveLog.logChange(self.nowTime, self.simTimeLabel, self.nowTime, None)
-                waveLog.logChange(self.nowTime, self.simCodelineLabel, instr, None)
-            predBb, bb, isJump = self._runLlvmIrFunctionInstr(waveLog, self.nowTime, self.registerValue, instr,
+                if not callStack:
+                    # the codeline signal is defined only for instructions of the simulated function
+                    waveLog.logChange(self.nowTime, self.simCodelineLabel, instr, None)
+
+            calleeIndex = self.callTargets.get(instr, None)
+            if calleeIndex is not None:
+                argValues = self._getCallArgValues(instr, calleeIndex)
+                if argValues is None:
+                    # not stepped into, the call is executed by the interpret as a call of any other function
+                    trace("call %r not simulated in the called function, some argument can not be resolved", instr)
+                    calleeIndex = None
+            if calleeIndex is not None or (callStack and instr in self.returnInstrs):
+                if calleeIndex is not None:
+                    if not callStack and self.coverage is not None:
+                        self.coverage.markLine(self.instrCodeline[instr])
+                    bb, instr = self._enterCall(instr, calleeIndex, argValues, bb, predBb)
+                    predBb = None
+                    instrAddr = self.instrCodeline[instr] * 8
+                else:
+                    bb, predBb, instr = self._returnFromCall(instr)
+                    instrAddr = self.instrCodeline[instr] * 8
+                    finishDepth = self.finishDepth
+                    if finishDepth is not None and len(callStack) < finishDepth:
+                        self.finishDepth = None
+                        # a breakpoint at the return address is hit as well (the temporary one is deleted)
+                        self._checkStop(instrAddr, False)
+                        return instrAddr
+                if instrAddr in self.breakpoints or self.stepRange is not None or self.stepGranule is not None:
+                    # the entry of the called function is a start of a block, the return continues in the block of the caller
+                    return self._checkStop(instrAddr, calleeIndex is not None)
+                return None
+
+            predBb, bb, isJump = self.interpret._runLlvmIrFunctionInstr(waveLog, self.nowTime, self.registerValue, instr,
                                                          predBb, bb, self.fnArgs,
                                                          self.simBlockLabel)
             prevInstr = instr
@@ -174,10 +375,16 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
             else:
                 instr = instr.getNextNode()
 
+            coverage = self.coverage
+            if coverage is not None and not callStack:
+                coverage.markLine(self.instrCodeline[prevInstr])
+                if isJump:
+                    coverage.markEdge(prevInstr, bb)
+
             assert instr is not None, (prevInstr, isJump, bb)
             instrAddr = self.instrCodeline[instr] * 8
-            if instrAddr in self.breakpoints:
-                return instrAddr
+            if instrAddr in self.breakpoints or self.stepRange is not None or self.stepGranule is not None:
+                return self._checkStop(instrAddr, isJump)
             else:
                 return None
         finally:
@@ -185,6 +392,79 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
             self.bb = bb
             self.instr = instr
 
+    def _checkStop(self, instrAddr: int, isBlockStart: bool) -> Optional[int]:
+        """
+        Check breakpoints, the step range and the step granule for the instruction which will be executed next.
+
+        :param isBlockStart: True if the instruction is the first instruction of a basic block
+        :returns: instrAddr if the execution should stop before the instruction
+        """
+        breakpoints = self.breakpoints
+        isPermanent = breakpoints.get(instrAddr, None)
+        if isPermanent is not None:
+            if not isPermanent:
+                # temporary breakpoint is deleted once hit
+                del breakpoints[instrAddr]
+            self.stepRange = None
+            self.stepGranule = None
+            return instrAddr
+
+        stepGranule = self.stepGranule
+        if stepGranule is not None:
+            mode, depth, stepOver, timeEnd = stepGranule
+            curDepth = len(self.callStack)
+            if curDepth < depth:
+                pass  # returned from the function where the step started
+            elif stepOver and curDepth > depth:
+                return None
+            elif mode == GdbStepMode.BLOCK:
+                if not isBlockStart:
+                    return None
+            elif self.nowTime < timeEnd:
+                return None
+            self.stepGranule = None
+            return instrAddr
+
+        stepRange = self.stepRange
+        if stepRange is not None:
+            start, end, depth = stepRange
+            curDepth = len(self.callStack)
+            # called functions are stepped over, the return from the function of the range ends the stepping
+            if curDepth < depth or (curDepth == depth and not (start <= instrAddr < end)):
+                self.stepRange = None
+                return instrAddr
+        return None
+
+    def _clearRunMode(self):
+        """
+        Cancel exec-finish, range stepping and until from previous resume (if it was stopped by something else).
+        """
+        self.finishDepth = None
+        self.stepRange = None
+        self.stepGranule = None
+        untilAddr = self._untilAddr
+        if untilAddr is not None:
+            if self.breakpoints.get(untilAddr, None) is False:
+                del self.breakpoints[untilAddr]
+            self._untilAddr = None
+
+    def reset(self, fnArgs: tuple):
+        """
+        Restart the simulation from the beginning of the function with new arguments.
+        Breakpoints and coverage counters are kept.
+        """
+        self.fnArgs = fnArgs
+        self.bb = None
+        self.instr = None
+        self.predBb = None
+        self.nowTime = 0
+        self.cycleLimit = 0
+        self.callStack.clear()
+        self.curFnIndex = self.fnIndex
+        self._clearRunMode()
+        for r, v in self.registerValue.items():
+            self.registerValue[r] = v._dtype.from_py(None)
+
     def handleInterruption(self):
         trace('interrupted')
         return gdbReplyOk(None)
@@ -196,13 +476,17 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
     def handleReadRegisters(self):
         trace("readRegisters")
         values = []
-        for r in self.registers:
+        for i, r in enumerate(self.registers):
             if r is LlvmIrSimPcReg:
                 if self.instr is None:
-                    v = 0
+                    v = self.codelineOffset * 8
                 else:
                     v = self.instrCodeline[self.instr] * 8
                 byteSize = 8
+            elif r is None:
+                # the function was not indexed yet, it was not executed and its registers are undefined
+                v = 0
+                byteSize = ceil(self.registerBitWidths[i] / 8)
             else:
                 _v: HBitsConst = self.registerValue[r]
                 v = _v.val & _v.vld_mask
@@ -222,7 +506,12 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
             v *= 8
             byteSize = 8
         else:
+            if index >= len(self.registers):
+                return gdbReplyError(1)
             r = self.registers[index]
+            if r is None:
+                self._indexFunctionOfRegister(index)
+                r = self.registers[index]
             _v = v = self.registerValue[r]
             v = (v.val & v.vld_mask)
             byteSize = ceil(_v._dtype.bit_length() / 8)
@@ -260,14 +549,118 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
 
     def handleStep(self, address: Optional[int]):
         trace("step")
-        self.cycleLimit = 1
+        self._clearRunMode()
+        self._startStep(False)
         return gdbReplyOk(None)
 
+    def handleNext(self):
+        trace("next")
+        self._clearRunMode()
+        self._startStep(True)
+        return gdbReplyOk(None)
+
+    def _startStep(self, stepOver: bool):
+        mode = self.stepMode
+        depth = len(self.callStack)
+        if mode == GdbStepMode.INSTRUCTION:
+            if stepOver and self.instr is not None:
+                instrAddr = self.instrCodeline[self.instr] * 8
+                self.stepRange = (instrAddr, instrAddr + 8, depth)
+                self.cycleLimit = inf
+            else:
+                self.cycleLimit = 1
+        else:
+            self.stepGranule = (mode, depth, stepOver, self.nowTime + self.stepTime)
+            self.cycleLimit = inf
+
     def handleContinue(self, address: Optional[int]):
         trace("continue")
+        self._clearRunMode()
+        self.cycleLimit = inf
+        return gdbReplyOk(None)
+
+    def handleContinueBounded(self, cycleLimit: int):
+        trace(f"continue {cycleLimit:d}")
+        self._clearRunMode()
+        self.cycleLimit = cycleLimit
+        return gdbReplyOk(None)
+
+    def getSimTime(self) -> Optional[int]:
+        return self.nowTime
+
+    def getWaveLogBytes(self) -> Optional[int]:
+        # VcdWriter does not expose the size of the output, the position in the output file is used
+        oFile = getattr(self.waveLog, "_oFile", None)
+        try:
+            return oFile.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def handleRangeStep(self, start: int, end: int):
+        trace(f"rangeStep {start:x},{end:x}")
+        self._clearRunMode()
+        self.stepRange = (start, end, len(self.callStack))
         self.cycleLimit = inf
         return gdbReplyOk(None)
 
+    def handleUntil(self, address: int):
+        trace(f"until {address:x}")
+        self._clearRunMode()
+        if address not in self.breakpoints:
+            self.breakpoints[address] = False
+            self._untilAddr = address
+        if self.callStack:
+            # stop also if the current function returns
+            self.finishDepth = len(self.callStack)
+        self.cycleLimit = inf
+        return gdbReplyOk(None)
+
+    def handleFrameInfo(self):
+        trace("frameInfo")
+        if self.instr is None:
+            addrs = [self.codelineOffset * 8]
+        else:
+            instrCodeline = self.instrCodeline
+            addrs = [instrCodeline[self.instr] * 8]
+            addrs.extend(instrCodeline[f[3]] * 8 for f in reversed(self.callStack))
+        return gdbReplyOk(",".join(f"{a:x}" for a in addrs))
+
+    def handleFinish(self):
+        trace("finish")
+        if not self.callStack:
+            # there is no caller in the outermost frame
+            return gdbReplyError(1)
+        self._clearRunMode()
+        self.finishDepth = len(self.callStack)
+        self.cycleLimit = inf
+        return gdbReplyOk(None)
+
+    def handleMonitorCmd(self, cmd: str):
+        trace(f"monitor {cmd:s}")
+        args = cmd.split()
+        if not args or args[0] == "help":
+            return ("step-mode [instruction|block|time [TIME]] - granularity of step and next\n", gdbReplyOk(None))
+        elif args[0] == "step-mode":
+            if len(args) == 1:
+                if self.stepMode == GdbStepMode.TIME:
+                    return (f"step-mode {self.stepMode:s} {self.stepTime:d}\n", gdbReplyOk(None))
+                return (f"step-mode {self.stepMode:s}\n", gdbReplyOk(None))
+            mode = args[1]
+            if mode not in (GdbStepMode.INSTRUCTION, GdbStepMode.BLOCK, GdbStepMode.TIME) or\
+                    len(args) > (3 if mode == GdbStepMode.TIME else 2):
+                return (None, gdbReplyError(1))
+            if len(args) == 3:
+                try:
+                    stepTime = int(args[2], 0)
+                except ValueError:
+                    return (None, gdbReplyError(1))
+                if stepTime <= 0:
+                    return (None, gdbReplyError(1))
+                self.stepTime = stepTime
+            self.stepMode = mode
+            return (None, gdbReplyOk(None))
+        return (None, gdbReplyUnsupported())
+
     def handleQSupported(self, features: Dict[str, bool]):
         return gdbReplyOk('QStartNoAckMode+;swbreak+;hwbreak+')
 
@@ -291,7 +684,11 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
     def handleRegisterInfo(self, index: int):
         trace(f'registerInfo:{index}')
         if index < len(self.REGISTER_INFO):
-            return gdbReplyOk(self.REGISTER_INFO[index])
+            info = self.REGISTER_INFO[index]
+            if info is None:
+                self._indexFunctionOfRegister(index)
+                info = self.REGISTER_INFO[index]
+            return gdbReplyOk(info)
         return gdbReplyError(1)
 
     def handleHostInfo(self):
@@ -320,6 +717,11 @@ class GdbCmdHandlerLllvmIr(GdbCmdHandler):
         self.breakpoints[address] = True
         return gdbReplyOk(None)
 
+    def handleAddTemporaryBreakpoint(self, address: int):
+        trace(f'addTemporaryBreakpoint at:{address:x}')
+        self.breakpoints.setdefault(address, False)
+        return gdbReplyOk(None)
+
     def handleRemoveBreakpoint(self, btype: GdbBreakPointType, address, kind: int):
         trace(f'removeBreakpoint at:{address:x}')
         if address in self.breakpoints:
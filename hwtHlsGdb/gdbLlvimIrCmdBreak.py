@@ -1,43 +1,77 @@
-from typing import Any, IO
+from typing import Any, IO, List, Optional
 
-from hwtHlsGdb.gdbCmdHandlerLlvmIr import LLVM_IR_SRC_CODELINE_OFFSET
+from hwtHlsGdb.gdbLlvmIrRegs import LLVM_IR_SRC_CODELINE_OFFSET
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
-from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, \
-    gdbMsgFormatBreakpoint, NL
-
-
-def gdbLlvmIrProcessCmdBreak(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
-    dbgFile = state.dbgFile
-    if cmd.name == 'break-insert':
-        # https://www.zeuthen.desy.de/dv/documentation/unixguide/infohtml/gdb/GDB_002fMI-Breakpoint-Commands.html#GDB_002fMI-Breakpoint-Commands
-        # https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Breakpoint-Commands.html#GDB_002fMI-Breakpoint-Commands
-        codeline = None
-        if cmd.args == ['-t', '-f', 'main'] or cmd.args == ['-f', 'main']:
-            assert state.remote is not None, cmd
-            codeline = LLVM_IR_SRC_CODELINE_OFFSET
-
-        elif len(cmd.args) == 2 and cmd.args[0] == "-f":
-            file, codeline = cmd.args[1].split(":")
-            assert file == state.exe or state.exe.endswith(file)
-            codeline = int(codeline)
-
-        if codeline is not None:
-            state.remote.breakInsert(codeline * 8)
-            bkpt = gdbMsgFormatBreakpoint(state.llvm, state.exe, codeline, state.breakpointIdCntr, codeline * 8)
-            state.breakpoints[state.breakpointIdCntr] = codeline
-            state.breakpointIdCntr += 1
-            w.write(f'=breakpoint-created,bkpt={bkpt:s}{NL}')
-            sendReplyDone(cmd, w, dbgFile, (('bkpt', bkpt),))
-            return True
-
-    elif cmd.name == 'break-delete':
-        if len(cmd.args) == 1:
-            number = int(cmd.args[0])
-            codeline = state.breakpoints.pop(number)
-            state.remote.breakDelete(codeline * 8)
-            w.write(f' =breakpoint-deleted,id={number:d}{NL}')
-            sendReplyDone(cmd, w, dbgFile, ())
-            return True
-    # =breakpoint-modified,bkpt={...}
-    # =breakpoint-deleted,id=number
-    return False
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, NL
+
+
+def gdbMiParseLocation(state: GdbInterpretState, location: str) -> Optional[int]:
+    """
+    :param location: function name or file:line
+    :returns: codeline of the location or None if it can not be parsed
+    """
+    fnIndex = state.symbols.fnIndexByName.get(location, None)
+    if fnIndex is not None:
+        # the first instruction of the function
+        return state.symbols.fns[fnIndex].codelineOffset
+    elif location == 'main':
+        assert state.remote is not None, location
+        return LLVM_IR_SRC_CODELINE_OFFSET
+    elif ":" in location:
+        file, codeline = location.rsplit(":", 1)
+        assert file == state.exe or state.exe.endswith(file)
+        return int(codeline)
+    else:
+        return None
+
+
+# https://www.zeuthen.desy.de/dv/documentation/unixguide/infohtml/gdb/GDB_002fMI-Breakpoint-Commands.html#GDB_002fMI-Breakpoint-Commands
+# https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Breakpoint-Commands.html#GDB_002fMI-Breakpoint-Commands
+@GDB_MI_COMMANDS.register("break-insert",
+                          GdbMiOption("-t"),  # temporary
+                          GdbMiOption("-h"),  # hardware
+                          GdbMiOption("-f"),  # create pending if location can not be parsed
+                          GdbMiOption("-d"),  # disabled
+                          GdbMiOption("-a"),  # tracepoint
+                          GdbMiOption("--qualified"),
+                          GdbMiOption("-c", True),  # condition
+                          GdbMiOption("-i", True),  # ignore count
+                          GdbMiOption("-p", True),  # thread
+                          )
+def gdbLlvmIrCmdBreakInsert(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    codeline = gdbMiParseLocation(state, args[0])
+    if codeline is None:
+        return False
+
+    temporary = "-t" in opts
+    if temporary:
+        # the stub deletes the breakpoint once hit
+        if not state.remote.breakInsertTemporary(codeline * 8):
+            return False
+        state.temporaryBreakpoints.add(state.breakpointIdCntr)
+    else:
+        # reply is checked with the next request, MI reply does not depend on it
+        state.remote.breakInsert(codeline * 8, wait=False)
+    bkpt = state.msgFormatter.formatBreakpoint(codeline, state.breakpointIdCntr, codeline * 8, temporary)
+    state.breakpoints[state.breakpointIdCntr] = codeline
+    state.breakpointIdCntr += 1
+    w.write(f'=breakpoint-created,bkpt={bkpt:s}{NL}')
+    sendReplyDone(cmd, w, state.dbgFile, (('bkpt', bkpt),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("break-delete")
+def gdbLlvmIrCmdBreakDelete(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if not args:
+        return False
+    for number in args:
+        number = int(number)
+        codeline = state.breakpoints.pop(number)
+        state.temporaryBreakpoints.discard(number)
+        state.remote.breakDelete(codeline * 8, wait=False)
+        w.write(f'=breakpoint-deleted,id="{number:d}"{NL}')
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
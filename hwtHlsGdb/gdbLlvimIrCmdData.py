@@ -1,45 +1,42 @@
-from typing import Any, IO
+from typing import Any, IO, List
 
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
-from hwtHlsGdb.gdbMiMessages import GdbMiCmd, filterArgs, sendReplyDone
-
-
-def gdbLlvmIrProcessCmdData(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
-    dbgFile = state.dbgFile
-    if cmd.name == 'data-evaluate-expression':
-        args = filterArgs(cmd.args, [['--thread', '1'], ['--frame', '0'], ['--thread-group', 'i1']])
-        if args == ['"sizeof (void*)"']:
-            sendReplyDone(cmd, w, state.dbgFile, (("value", '"8"'),))
-            return True
-        elif len(args) == 1:
-            expr = cmd.args[0]
-            if not expr.startswith('"'):
-                raise NotImplementedError()
-            for r in state.llvmRegs:
-                if r.name == expr:
-                    regI = r.registerIndex
-                    if regI is not None:
-                        v = state.remote.readRegister(regI)
-                        sendReplyDone(cmd, w, dbgFile, (('value', f'"0x{v:x}"')))
-                        return True
-
-    elif cmd.name == 'data-list-register-names':
-        if cmd.args == [] or cmd.args == ['--thread-group', 'i1']:
-            sendReplyDone(cmd, w, dbgFile, (('register-names', '[]'),))
-            return True
-
-    elif cmd.name == 'data-list-register-values':
-        formatChar = cmd.args[0]
-        if len(cmd.args) == 1:
-            if formatChar == 'x':
-                regValues = []
-                for r in state.llvmRegs:
-                    regI = r.registerIndex
-                    if regI is not None:
-                        v = state.remote.readRegister(regI)
-                        regValues.append(f'{{number="{regI:d}",value="0x{v:x}"}}')
-                regValues = str(regValues).replace("'", '"')
-                sendReplyDone(cmd, w, dbgFile, (('register-values', regValues),))
-                return True
-
-    return False
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone
+
+
+@GDB_MI_COMMANDS.register("data-evaluate-expression")
+def gdbLlvmIrCmdDataEvaluateExpression(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    expr = args[0]
+    if expr == "sizeof (void*)":
+        sendReplyDone(cmd, w, state.dbgFile, (("value", '"8"'),))
+        return True
+
+    r = state.getFunctionSymbols().getRegByName(expr)
+    if r is None:
+        return False
+    v = state.remote.readRegister(r.registerIndex)
+    sendReplyDone(cmd, w, state.dbgFile, (('value', f'"0x{v:x}"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("data-list-register-names")
+def gdbLlvmIrCmdDataListRegisterNames(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, (('register-names', '[]'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("data-list-register-values", GdbMiOption("--skip-unavailable"))
+def gdbLlvmIrCmdDataListRegisterValues(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args != ['x']:
+        return False
+    # registers of the function of the selected frame, other functions are indexed only when they are needed
+    intRegs = state.getFunctionSymbols().intRegs
+    values = state.remote.readRegisterList([r.registerIndex for r in intRegs])
+    regValues = [f'{{number="{r.registerIndex:d}",value="0x{v:x}"}}' for r, v in zip(intRegs, values)]
+    sendReplyDone(cmd, w, state.dbgFile, (('register-values', f'[{",".join(regValues):s}]'),))
+    return True
@@ -1,42 +1,104 @@
-from typing import Any, IO
+from typing import Any, IO, List
 
+from hwtHlsGdb.gdbLlvimIrCmdBreak import gdbMiParseLocation
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
-from hwtHlsGdb.gdbMiMessages import GdbMiCmd, filterArgs, sendReplyDone, \
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, \
     sendReplyRunning, sendInterruptRunning, NL
 
 
-def gdbLlvmIrProcessCmdExec(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
-    dbgFile = state.dbgFile
-    if cmd.name == 'exec-continue':
-        # https://getdocs.org/Gdb/docs/latest/gdb/GDB_002fMI-Program-Execution
-        if cmd.args == [] or cmd.args == ['--thread-group', 'i1'] or cmd.args == ['--thread', '1']:
-            state.remote.sendContinue()
-            sendReplyRunning(cmd, w, dbgFile, ())
-            sendInterruptRunning(w, dbgFile, (('thread-id', '"1"'),))
-            return True
-
-    elif cmd.name == 'exec-interrupt':
-        args = filterArgs(cmd.args, [['--thread', '1'], ['--thread-group', '1']])
-        if args == []:
-            state.remote.sendInterrupt()
-            sendReplyDone(cmd, w, dbgFile, ())
-            return True
-
-    elif cmd.name == 'exec-next' or cmd.name == 'exec-step':
-        args = filterArgs(cmd.args, [['--thread', '1'], ['--thread-group', '1']])
-        if args == ['1'] or cmd.args == []:
-            state.remote.sendStep()
-            sendReplyRunning(cmd, w, dbgFile, ())
-            sendInterruptRunning(w, dbgFile, (('thread-id', '"1"'),))
-            return True
-
-    elif cmd.name == 'exec-run':
-        if cmd.args == []:
-            w.write(f'=thread-group-started,id="i1",pid="1"{NL}')
-            w.write(f'=thread-created,id="1",group-id="i1"{NL}')
-            state.remote.sendContinue()
-
-            sendReplyRunning(cmd, w, dbgFile, ())
-            sendInterruptRunning(w, dbgFile, (('thread-id', '"1"'),))
-            return True
-    return False
+# https://getdocs.org/Gdb/docs/latest/gdb/GDB_002fMI-Program-Execution
+@GDB_MI_COMMANDS.register("exec-continue", GdbMiOption("--all"), GdbMiOption("--reverse"))
+def gdbLlvmIrCmdExecContinue(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args or "--reverse" in opts:
+        return False
+    state.remote.sendContinue()
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-finish", GdbMiOption("--reverse"))
+def gdbLlvmIrCmdExecFinish(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args or "--reverse" in opts:
+        return False
+    # the simulator runs until the current function returns, it is refused in the outermost frame
+    if not state.remote.sendFinish():
+        return False
+    state.execFinishPending = True
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-interrupt", GdbMiOption("--all"))
+def gdbLlvmIrCmdExecInterrupt(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args:
+        return False
+    state.remote.sendInterrupt()
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-next")
+def gdbLlvmIrCmdExecNext(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args and args != ['1']:
+        return False
+    remote = state.remote
+    if remote.sendNext():
+        pass  # the granularity of the step is selected by "monitor step-mode"
+    elif remote.supportsRangeStep():
+        # the range of the current instruction, called functions are stepped over in the stub
+        pc = remote.readRegister(0)
+        remote.sendRangeStep(pc, pc + 8)
+    else:
+        remote.sendStep()
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-step")
+def gdbLlvmIrCmdExecStep(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args and args != ['1']:
+        return False
+    state.remote.sendStep()
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-until")
+def gdbLlvmIrCmdExecUntil(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -exec-until [location]
+    if len(args) > 1:
+        return False
+    remote = state.remote
+    if args:
+        # run to cursor, the stub stops also if the current function returns
+        codeline = gdbMiParseLocation(state, args[0])
+        if codeline is None or not remote.sendUntil(codeline * 8):
+            return False
+    else:
+        # like exec-next, but does not stop on jumps back in loops
+        pc = remote.readRegister(0)
+        fnIndex = state.symbols.getFunctionIndexByCodeline(pc // 8)
+        if fnIndex is None or not remote.supportsRangeStep():
+            return False
+        remote.sendRangeStep(state.symbols.fns[fnIndex].codelineOffset * 8, pc + 8)
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("exec-run", GdbMiOption("--all"), GdbMiOption("--start"))
+def gdbLlvmIrCmdExecRun(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args or "--start" in opts:
+        return False
+    w.write(f'=thread-group-started,id="i1",pid="1"{NL}')
+    w.write(f'=thread-created,id="1",group-id="i1"{NL}')
+    state.remote.sendContinue()
+
+    sendReplyRunning(cmd, w, state.dbgFile, ())
+    sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+    return True
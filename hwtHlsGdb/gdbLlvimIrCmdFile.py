@@ -0,0 +1,43 @@
+import os
+from typing import Any, IO, List
+
+from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone
+
+
+@GDB_MI_COMMANDS.register("file-exec-and-symbols")
+def gdbLlvmIrCmdFileExecAndSymbols(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if not args:
+        return False
+    exe = args[-1]
+    # exe = os.path.relpath(exe, start=os.getcwd())
+    if not os.path.isfile(exe):
+        return False
+    # the IR is loaded on first use
+    state.setExe(exe)
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register("symbol-list-lines")
+def gdbLlvmIrCmdSymbolListLines(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    """
+    -symbol-list-lines {filename | function}
+
+    :note: The function name is an extension which lists lines of a single function
+        (only this function is indexed).
+    """
+    if len(args) != 1:
+        return False
+    if args[0] == state.exe:
+        fns = state.symbols.iterFunctions()
+    else:
+        fn = state.symbols.getFunctionByName(args[0])
+        if fn is None:
+            return False
+        fns = (fn,)
+    regs = [f'{{pc="0x{r.codeline*8:x}",line="{r.codeline}"}}' for fn in fns for r in fn.regs]
+    doneArgs = (('lines', f'[{",".join(regs):s}]'),)
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
@@ -0,0 +1,266 @@
+import os
+from typing import Any, IO, List
+
+from hwtHlsGdb.gdbLlvimIrCmdStack import GDB_STACK_LIST_VARIABLES_FILTERS
+from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, gdbMiEscapeStr, \
+    NL, parseGdbCmd, writeCmdToDebugFile, sendReplyRunning, sendInterruptRunning
+
+VERSION = """\
+GNU gdb (Ubuntu 13.1-2ubuntu2) 13.1
+Hwt gdbLlvmMir GDB stub"""
+
+USAGE = """
+"""
+
+# settings which are accepted by gdb-set but which do not have any effect
+GDB_SET_IGNORED = {
+    ("breakpoint", "pending", "on"),
+    ('detach-on-fork', 'on'),
+    ('python', 'print-stack', 'none'),
+    ('print', 'object', 'on'),
+    ('print', 'sevenbit-strings', 'on'),
+    ('host-charset', 'UTF-8'),
+    ('target-charset', 'UTF-8'),
+    ('target-wide-charset', 'UTF-32'),
+    ('dprintf-style', 'call'),
+    ('mi-async', 'on'),
+    ('record', 'full', 'stop-at-limit', 'off'),
+    ('auto-solib-add', 'on'),
+    ('language', 'c'),
+    ('language', 'auto'),
+    ('stop-on-solib-events', '1'),
+}
+
+# default value of "set max-completions" in GDB
+GDB_MAX_COMPLETIONS = 200
+
+
+def gdbShowVersion(f):
+    for line in (VERSION + USAGE).split("\n"):
+        f.write('~')
+        f.write(gdbMiEscapeStr(line + "\n"))
+        f.write(NL)
+
+
+# https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Miscellaneous-Commands.html#The-_002dcomplete-Command
+@GDB_MI_COMMANDS.register("complete")
+def gdbLlvmIrCmdComplete(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    """
+    Complete the last word of console command as a register name of the current function.
+    """
+    if len(args) != 1:
+        return False
+    command = args[0]
+    wordStart = max(command.rfind(" "), command.rfind("\t")) + 1
+    word = command[wordStart:]
+    if word.startswith("%"):
+        wordStart += 1
+        word = word[1:]
+    commandPrefix = command[:wordStart]
+
+    matches = []
+    maxCompletionsReached = False
+    for name in state.getFunctionSymbols().names.iterPrefix(word):
+        if len(matches) == GDB_MAX_COMPLETIONS:
+            maxCompletionsReached = True
+            break
+        matches.append(commandPrefix + name)
+
+    doneArgs = []
+    if matches:
+        doneArgs.append(("completion", gdbMiEscapeStr(os.path.commonprefix(matches))))
+    doneArgs.append(("matches", matches))
+    doneArgs.append(("max_completions_reached", '"1"' if maxCompletionsReached else '"0"'))
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+@GDB_MI_COMMANDS.register("environment-cd")
+def gdbLlvmIrCmdEnvironmentCd(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    os.chdir(args[0])
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register("enable-pretty-printing")
+def gdbLlvmIrCmdEnablePrettyPrinting(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register(("gdb-exit", "kill"))
+def gdbLlvmIrCmdGdbExit(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    state.dbgFile.write('<-: ')
+    w.write(f'^exit{NL}')
+    state.gdbExit = True
+    return True
+
+
+@GDB_MI_COMMANDS.register("gdb-set")
+def gdbLlvmIrCmdGdbSet(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) == 2 and args[0] == "hwt-stack-list-variables":
+        if args[1] not in GDB_STACK_LIST_VARIABLES_FILTERS:
+            return False
+        state.stackListVariablesFilter = args[1]
+    elif tuple(args) not in GDB_SET_IGNORED and not (args and args[0] == "solib-search-path"):
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register(("gdb-show", "show"))
+def gdbLlvmIrCmdGdbShow(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args == ['language']:
+        sendReplyDone(cmd, w, state.dbgFile, (("value", '"auto"'),))
+        return True
+    elif args == ['hwt-stack-list-variables']:
+        sendReplyDone(cmd, w, state.dbgFile, (("value", f'"{state.stackListVariablesFilter:s}"'),))
+        return True
+    elif args == ['architecture']:
+        w.write('~')
+        w.write(gdbMiEscapeStr('The target architecture is set to "auto" (currently "i386").\n'))
+        w.write(NL)
+        sendReplyDone(cmd, w, state.dbgFile, ())
+        return True
+    return False
+
+
+@GDB_MI_COMMANDS.register("gdb-version")
+def gdbLlvmIrCmdGdbVersion(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    gdbShowVersion(w)
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+# https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Miscellaneous-Commands.html#The-_002dinterpreter_002dexec-Command
+@GDB_MI_COMMANDS.register("interpreter-exec")
+def gdbLlvmIrCmdInterpreterExec(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 2:
+        return False
+    interpreter, cmdStr = args
+    if interpreter == "console":
+        if cmdStr == "p/x (char)-1":
+            w.write('~')
+            w.write(gdbMiEscapeStr("$1 = 0xff\n"))
+            w.write(NL)
+            sendReplyDone(cmd, w, state.dbgFile, ())
+            return True
+        elif cmdStr == "show endian":
+            w.write('~')
+            w.write(gdbMiEscapeStr("The target endianness is set automatically (currently little endian)\n"))
+            w.write(NL)
+            sendReplyDone(cmd, w, state.dbgFile, ())
+            return True
+        elif cmdStr.startswith("monitor ") or cmdStr == "monitor":
+            # executed by the stub (qRcmd)
+            if state.remote is None:
+                return False
+            monitorCmd = cmdStr[len("monitor"):].strip()
+            monitorArgs = monitorCmd.split()
+            if monitorArgs and monitorArgs[0] == "run":
+                # bounded continue, the target is running after the reply
+                if len(monitorArgs) != 2 or not monitorArgs[1].isdigit() or\
+                        not state.remote.sendContinueBounded(int(monitorArgs[1])):
+                    return False
+                sendReplyRunning(cmd, w, state.dbgFile, ())
+                sendInterruptRunning(w, state.dbgFile, (('thread-id', '"1"'),))
+                return True
+
+            output = state.remote.monitor(monitorCmd)
+            if output is None:
+                return False
+            if output:
+                w.write('~')
+                w.write(gdbMiEscapeStr(output))
+                w.write(NL)
+            sendReplyDone(cmd, w, state.dbgFile, ())
+            return True
+        elif cmdStr.startswith("-"):
+            return False  # console does not accept MI commands
+    elif interpreter not in ("mi", "mi2", "mi3"):
+        return False
+
+    # the nested command is replied with the token of interpreter-exec command
+    nestedCmd = parseGdbCmd(cmdStr, cmd.token)
+    if nestedCmd is None:
+        return False
+    if state.dbgFile:
+        writeCmdToDebugFile(nestedCmd, state.dbgFile)
+    return GDB_MI_COMMANDS.dispatch(nestedCmd, w, state)
+
+
+@GDB_MI_COMMANDS.register("list-features")
+def gdbLlvmIrCmdListFeatures(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # 1^done,features=["frozen-varobjs","pending-breakpoints","thread-info","data-read-memory-bytes","breakpoint-notifications","ada-task-info","language-option","info-gdb-mi-command","undefined-command-error-code","exec-run-start-option","data-disassemble-a-option","python"]
+    features = ["frozen-varobjs", "pending-breakpoints", "thread-info",
+                "data-read-memory-bytes", "breakpoint-notifications", "ada-task-info",
+                "language-option", "info-gdb-mi-command", "undefined-command-error-code",
+                "exec-run-start-option", "data-disassemble-a-option", "python"]
+    sendReplyDone(cmd, w, state.dbgFile, (("features", features),))
+    return True
+
+
+# https://www.zeuthen.desy.de/dv/documentation/unixguide/infohtml/gdb/GDB_002fMI-Miscellaneous-Commands.html
+@GDB_MI_COMMANDS.register("list-thread-groups", GdbMiOption("--available"), GdbMiOption("--recurse", True))
+def gdbLlvmIrCmdListThreadGroups(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args == []:
+        sendReplyDone(cmd, w, state.dbgFile, (("groups", f'[{{id="i1",type="process",pid="1",executable="target:{"/" if state.exe is None else state.exe:s}",cores=["0"]}}]'),))
+        return True
+    elif args == ['i1']:
+        frame = state.msgFormatter.formatFrame(0 if state.remote is None else state.remote.readRegister(0) // 8)
+        doneArgs = (("threads", f'[{{id="1",target-id="Thread 0.0",name={state.msgFormatter.func:s},frame={frame},state="stopped",core="3"}}]'),)
+        sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+        return True
+    return False
+
+
+@GDB_MI_COMMANDS.register("set")
+def gdbLlvmIrCmdSet(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args != ["pagination", 'off']:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register("source")
+def gdbLlvmIrCmdSource(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args != ['.gdbinit']:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
+
+
+@GDB_MI_COMMANDS.register("trace-status")
+def gdbLlvmIrCmdTraceStatus(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if args:
+        return False
+    doneArgs = (('supported', '"1"'), ('running', '"0"'),
+                ('frames', '"0"'), ('frames-created', '"0"'),
+                ('buffer-size', '"5242880"'), ('buffer-free', '"5242880"'),
+                ('disconnected', '"0"'), ('circular', '"0"'),
+                ('user-name', '""'), ('notes', '""'),
+                ('start-time', '"0.000000"'), ('stop-time', '"0.000000"'))
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+@GDB_MI_COMMANDS.register("hwt-stats")
+def gdbLlvmIrCmdHwtStats(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -hwt-stats [histogram]
+    if len(args) > 1 or (args and args[0] != "histogram"):
+        return False
+    if state.remote is not None:
+        # the stats of the stub are a text for console ("monitor stats")
+        output = state.remote.monitor("stats histogram" if args else "stats")
+        if output:
+            w.write('~')
+            w.write(gdbMiEscapeStr(output))
+            w.write(NL)
+    commands = [f'{{name="{name:s}",calls="{callCnt:d}",total-us="{totalTime * 1e6:.0f}",max-us="{maxTime * 1e6:.0f}"}}'
+                for name, callCnt, totalTime, maxTime in GDB_MI_COMMANDS.iterStats()]
+    sendReplyDone(cmd, w, state.dbgFile, (("commands", f'[{",".join(commands):s}]'),))
+    return True
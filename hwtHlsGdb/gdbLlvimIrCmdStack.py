@@ -1,45 +1,148 @@
-from typing import Any, IO
+from typing import Any, IO, List
+
 
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
 from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, \
-    gdbMsgFormatStack, gdbMiEscapeStr
-
-
-def gdbLlvmIrProcessCmdStack(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
-    dbgFile = state.dbgFile
-    if cmd.name == 'stack-info-depth':
-        # https://ftp.gnu.org/old-gnu/Manuals/gdb/html_node/gdb_226.html
-        if cmd.args == ['--thread', '1'] or cmd.args == ['--thread', '0']:
-            sendReplyDone(cmd, w, dbgFile, (("depth", f'"{state.curStackDepth:d}"'),))
-            return True
-        elif cmd.args[:-1] == ['--thread', '1'] or cmd.args[:-1] == ['--thread', '0']:
-            state.curStackDepth = min(state.curStackDepth, int(cmd.args[-1]))
-            doneArgs = (("depth", f'"{state.curStackDepth}"'),)
-            sendReplyDone(cmd, w, dbgFile, doneArgs)
-            return True
-
-    elif cmd.name == 'stack-list-frames':
-        if cmd.args == ['--thread-group', 'i1'] or cmd.args == ['--thread', '1'] or cmd.args == ['0', '1000']:
-            doneArgs = ((f'stack', gdbMsgFormatStack(state.remote.readRegister(0) // 8, state.llvm, state.exe)),)
-            sendReplyDone(cmd, w, dbgFile, doneArgs)
-            return True
-
-    elif cmd.name == 'stack-list-arguments':
-        if cmd.args == ['0', '0', '0']:
-            doneArgs = (('stack-args', '[frame={level="0",args=[]}]'),)
-            sendReplyDone(cmd, w, dbgFile, doneArgs)
-            return True
-
-    elif cmd.name == 'stack-list-variables':
-        if cmd.args == ['0']:
-            regs = [f'{{name={gdbMiEscapeStr(r.name)}, value="{0}"}}' for r in state.llvmRegs if r.registerIndex is not None]
-            doneArgs = (('variables', f'[{",".join(regs):s}]'),)  # {name="x",value="11"}
-            sendReplyDone(cmd, w, dbgFile, doneArgs)
-            return True
-
-    elif cmd.name == 'stack-select-frame':
-        # https://ftp.gnu.org/old-gnu/Manuals/gdb/html_chapter/gdb_22.html
-        if cmd.args == ['--thread', '1', '0']:
-            sendReplyDone(cmd, w, dbgFile, ())
-            return True
-    return False
+    gdbMiEscapeStr
+
+# print-values argument of stack-list-* commands as a number or as an option
+GDB_MI_PRINT_VALUES = {
+    "0": "0", "1": "1", "2": "2",
+    "--no-values": "0", "--all-values": "1", "--simple-values": "2",
+}
+# values of "gdb-set hwt-stack-list-variables" (:see: gdbLlvmIrCmdStackListVariables)
+GDB_STACK_LIST_VARIABLES_FILTERS = ("all", "current-block", "changed")
+_GDB_MI_STACK_LIST_OPTIONS = (
+    GdbMiOption("--no-frame-filters"),
+    GdbMiOption("--skip-unavailable"),
+    GdbMiOption("--no-values"),
+    GdbMiOption("--all-values"),
+    GdbMiOption("--simple-values"),
+)
+
+
+# https://ftp.gnu.org/old-gnu/Manuals/gdb/html_node/gdb_226.html
+@GDB_MI_COMMANDS.register("stack-info-depth")
+def gdbLlvmIrCmdStackInfoDepth(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -stack-info-depth [max-depth]
+    if len(args) > 1:
+        return False
+    depth = len(state.remote.readFrames())
+    if args:
+        depth = min(depth, int(args[0]))
+    sendReplyDone(cmd, w, state.dbgFile, (("depth", f'"{depth:d}"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("stack-list-frames", GdbMiOption("--no-frame-filters"))
+def gdbLlvmIrCmdStackListFrames(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -stack-list-frames [low-frame high-frame]
+    if len(args) not in (0, 2):
+        return False
+    # all frames are obtained by a single request
+    codelines = [addr // 8 for addr in state.remote.readFrames()]
+    low = 0
+    if args:
+        low, high = int(args[0]), int(args[1])
+        codelines = codelines[low:high + 1]
+    doneArgs = ((f'stack', state.msgFormatter.formatStackFrames(codelines, low)),)
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+def gdbMiPopPrintValues(opts: GdbMiCmdOpts, args: List[str]):
+    """
+    :returns: print-values as a number in str and the rest of args or (None, args) if print-values is missing
+    """
+    for o in opts:
+        v = GDB_MI_PRINT_VALUES.get(o, None)
+        if v is not None:
+            return v, args
+    if args:
+        v = GDB_MI_PRINT_VALUES.get(args[0], None)
+        if v is not None:
+            return v, args[1:]
+    return None, args
+
+
+@GDB_MI_COMMANDS.register("stack-list-arguments", *_GDB_MI_STACK_LIST_OPTIONS)
+def gdbLlvmIrCmdStackListArguments(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -stack-list-arguments print-values [low-frame high-frame]
+    printValues, args = gdbMiPopPrintValues(opts, args)
+    if printValues is None or len(args) not in (0, 2):
+        return False
+    levels = range(len(state.remote.readFrames()))
+    if args:
+        levels = levels[int(args[0]):int(args[1]) + 1]
+    # arguments of LLVM IR functions are not tracked as registers
+    frames = ",".join(f'frame={{level="{level:d}",args=[]}}' for level in levels)
+    doneArgs = (('stack-args', f'[{frames:s}]'),)
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+@GDB_MI_COMMANDS.register("stack-list-variables",
+                          *_GDB_MI_STACK_LIST_OPTIONS,
+                          GdbMiOption("--current-block"),
+                          GdbMiOption("--changed"))
+def gdbLlvmIrCmdStackListVariables(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    """
+    List registers of the current function with values obtained by a single read of all registers.
+
+    The list can be limited to registers defined in the basic block of the current instruction (--current-block)
+    or to registers which value changed since the previous read of all registers (--changed, usually previous stop).
+    The default can be set by "gdb-set hwt-stack-list-variables {all|current-block|changed}"
+    because IDEs do not allow to add options to this command.
+    """
+    printValues, args = gdbMiPopPrintValues(opts, args)
+    if printValues is None or args:
+        return False
+
+    remote = state.remote
+    varFilter = state.stackListVariablesFilter
+    if "--current-block" in opts:
+        varFilter = "current-block"
+    elif "--changed" in opts:
+        varFilter = "changed"
+
+    if varFilter == "current-block":
+        llvmRegs = state.symbols.getBlockRegs(state.getSelectedFrameCodeline())
+    else:
+        llvmRegs = state.getFunctionSymbols().intRegs
+
+    if printValues != "0" or varFilter == "changed":
+        # a single cached "g" if stopped, pipelined "p" packets if running
+        values = remote.readRegisterList([r.registerIndex for r in llvmRegs])
+        if varFilter == "changed" and not remote.running:
+            prev = remote.prevRegisters
+            if prev is not None:
+                regCnt = len(prev)
+                changed = [(r, v) for r, v in zip(llvmRegs, values)
+                           if r.registerIndex >= regCnt or prev[r.registerIndex] != v]
+                llvmRegs = [r for r, _ in changed]
+                values = [v for _, v in changed]
+
+    if printValues == "0":
+        regs = [f'{{name={gdbMiEscapeStr(r.name)}}}' for r in llvmRegs]
+    elif printValues == "1":
+        regs = [f'{{name={gdbMiEscapeStr(r.name)},value="0x{v:x}"}}' for r, v in zip(llvmRegs, values)]
+    else:
+        regs = [f'{{name={gdbMiEscapeStr(r.name)},type={gdbMiEscapeStr(r.dtypeName)},value="0x{v:x}"}}'
+                for r, v in zip(llvmRegs, values)]
+    doneArgs = (('variables', f'[{",".join(regs):s}]'),)  # {name="x",value="11"}
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+# https://ftp.gnu.org/old-gnu/Manuals/gdb/html_chapter/gdb_22.html
+@GDB_MI_COMMANDS.register("stack-select-frame")
+def gdbLlvmIrCmdStackSelectFrame(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1 or not args[0].isdigit():
+        return False
+    level = int(args[0])
+    if level != 0 and level >= len(state.remote.readFrames()):
+        return False
+    state.selectedFrame = level
+    sendReplyDone(cmd, w, state.dbgFile, ())
+    return True
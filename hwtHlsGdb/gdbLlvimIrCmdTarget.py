@@ -1,75 +1,105 @@
-from typing import Any, IO
+from typing import Any, IO, List
 
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiCmdOpts
 from hwtHlsGdb.gdbMiMessages import GdbMiCmd, \
     NL, sendReplyConnected, format_exception, \
-    sendGdbPrompt, gdbMiEscapeStr, gdbMsgFormatStopped, \
-    gdbMsgFormatStoppedByInterrupt, sendReplyDone
-from hwtHlsGdb.gdbRemoteClient import GdbRemoteClient
+    sendGdbPrompt, gdbMiEscapeStr, sendReplyDone
+from hwtHlsGdb.gdbRemoteClient import GdbRemoteClient, GdbRemoteRequest
 from hwtHlsGdb.gdbRemoteMessages import GdbRemotePktStopped, \
     GdbTargetSignal
 
 
-def gdbLlvmIrProcessCmdTarget(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
+@GDB_MI_COMMANDS.register("target-select")
+def gdbLlvmIrCmdTargetSelect(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
     dbgFile = state.dbgFile
-    if cmd.name == 'target-select':
-        if cmd.args[0] == 'remote':
-            assert len(cmd.args) == 2, cmd.args
-            targetHost, targetPort = cmd.args[1].split(":")
+    isLoopback = args == ['loopback'] or args == ['remote', 'loopback']
+    if isLoopback or (args and args[0] == 'remote'):
+        def interuptHandler(remote:GdbRemoteClient, pkt):
+            if isinstance(pkt, GdbRemotePktStopped):
+                codeline = remote.readRegister(0) // 8
+                state.selectedFrame = 0
+                execFinishPending = state.execFinishPending
+                state.execFinishPending = False
+                if pkt.reason == GdbTargetSignal.TRAP and execFinishPending:
+                    msg = state.msgFormatter.formatStoppedFunctionFinished(codeline)
+                elif pkt.reason == GdbTargetSignal.TRAP:
+                    msg = state.msgFormatter.formatStopped(codeline)
+                elif pkt.reason == GdbTargetSignal.INT:
+                    msg = state.msgFormatter.formatStoppedByInterrupt(codeline)
+                elif pkt.reason == GdbTargetSignal.SIGKILL:
+                    msg = state.msgFormatter.formatStoppedByInterrupt(codeline)
+                else:
+                    raise NotImplementedError(pkt.reason)
 
-            def interuptHandler(remote:GdbRemoteClient, pkt):
-                if isinstance(pkt, GdbRemotePktStopped):
-                    codeline = remote.readRegister(0) // 8
-                    if pkt.reason == GdbTargetSignal.TRAP:
-                        msg = gdbMsgFormatStopped(codeline, state.llvm, state.exe)
-                    elif pkt.reason == GdbTargetSignal.INT:
-                        msg = gdbMsgFormatStoppedByInterrupt(codeline, state.llvm, state.exe)
-                    elif pkt.reason == GdbTargetSignal.SIGKILL:
-                        msg = gdbMsgFormatStoppedByInterrupt(codeline, state.llvm, state.exe)
-                    else:
-                        raise NotImplementedError(pkt.reason)
+                w.write(msg)
+                w.write(NL)
+                if state.temporaryBreakpoints and pkt.reason == GdbTargetSignal.TRAP:
+                    # the stub already deleted the breakpoint
+                    for number in sorted(state.temporaryBreakpoints):
+                        if state.breakpoints[number] == codeline:
+                            state.temporaryBreakpoints.remove(number)
+                            del state.breakpoints[number]
+                            w.write(f'=breakpoint-deleted,id="{number:d}"{NL}')
+                # sendGdbPrompt(w)
+            else:
+                raise NotImplementedError(pkt)
 
-                    w.write(msg)
-                    w.write(NL)
-                    w.flush()
-                    # sendGdbPrompt(w)
-                else:
-                    raise NotImplementedError(pkt)
+        if isLoopback:
+            # the simulator runs in this process
+            assert state.loopbackHandler is not None, "target-select loopback requires handler passed to main()"
+            # imported only there because it loads the GDB server (and its logging configuration)
+            from hwtHlsGdb.gdbRemoteLoopback import GdbRemoteClientLoopback
+            state.remote = GdbRemoteClientLoopback(state.loopbackHandler, interuptHandler, dbgFile)
+        else:
+            # host:port, unix:path, fd:N or | command
+            assert len(args) >= 2, args
+            state.remote = GdbRemoteClient(" ".join(args[1:]), interuptHandler, dbgFile)
+        def consoleOutputHandler(text: str):
+            # progress messages of the stub while running
+            w.write('~')
+            w.write(gdbMiEscapeStr(text))
+            w.write(NL)
+
+        state.remote.consoleOutputHandler = consoleOutputHandler
+
+        def requestErrorHandler(req: GdbRemoteRequest):
+            # failed breakpoint insert/delete whose MI command was already completed
+            w.write('&')
+            w.write(gdbMiEscapeStr(f"Warning: remote request {req.payload:s} failed: {req.error:s}\n"))
+            w.write(NL)
 
-            state.remote = GdbRemoteClient(targetHost, int(targetPort), interuptHandler, dbgFile)
-            w.write(f'=tsv-created,name="trace_timestamp",initial="0"{NL}')
-            w.flush()
-            # sendGdbPrompt(w)
-            w.write(f'=thread-group-started,id="i1",pid="0"{NL}')
-            # sendGdbPrompt(w)
-            w.flush()
-            w.write(f'=thread-created,id="1",group-id="i1"{NL}')
-            # sendGdbPrompt(w)
-            w.flush()
-            try:
-                _remote = state.exitStack.enter_context(state.remote)
-                assert _remote is state.remote
-                assert state.remote.socket is not None
-                # for _, _w in cmdIos:
-                # w.write('~"\\nThis GDB supports auto-downloading debuginfo from the following URLs:\\n"' + NL)
-                # w.write('~"  <https://debuginfod.ubuntu.com>\\n"' + NL)
-                # w.write('~"Enable debuginfod for this session? (y or [n]) "' + NL)
-                # w.write(gdbMsgFormatStopped(LLVM_IR_SRC_CODELINE_OFFSET, llvm, exe))
-                # w.write(NL)
-                # _w.write('*stopped,frame={addr="0x000000",func="_start",args=[],'
-                #        'from="target:/lib64/ld-linux-x86-64.so.2",arch="i386:x86-64"},'
-                #        'thread-id="1",stopped-threads="all",core="10"' + NL)
-                #sendReplyConnected(cmd, w, dbgFile, ())
+        state.remote.requestErrorHandler = requestErrorHandler
+        w.write(f'=tsv-created,name="trace_timestamp",initial="0"{NL}')
+        # sendGdbPrompt(w)
+        w.write(f'=thread-group-started,id="i1",pid="0"{NL}')
+        # sendGdbPrompt(w)
+        w.write(f'=thread-created,id="1",group-id="i1"{NL}')
+        # sendGdbPrompt(w)
+        try:
+            _remote = state.exitStack.enter_context(state.remote)
+            assert _remote is state.remote
+            assert state.remote.isConnected()
+            # for _, _w in cmdIos:
+            # w.write('~"\\nThis GDB supports auto-downloading debuginfo from the following URLs:\\n"' + NL)
+            # w.write('~"  <https://debuginfod.ubuntu.com>\\n"' + NL)
+            # w.write('~"Enable debuginfod for this session? (y or [n]) "' + NL)
+            # w.write(gdbMsgFormatStopped(LLVM_IR_SRC_CODELINE_OFFSET, llvm, exe))
+            # w.write(NL)
+            # _w.write('*stopped,frame={addr="0x000000",func="_start",args=[],'
+            #        'from="target:/lib64/ld-linux-x86-64.so.2",arch="i386:x86-64"},'
+            #        'thread-id="1",stopped-threads="all",core="10"' + NL)
+            #sendReplyConnected(cmd, w, dbgFile, ())
 
-                # w.write('*stopped,frame={addr="0x00007ffff7fe4da0",func="_start",args=[],from="target:/lib64/ld-linux-x86-64.so.2",arch="i386:x86-64"},thread-id="1",stopped-threads="all",core="0"' + NL)
-                # vscode requires done instead connected
-                sendReplyDone(cmd, w, dbgFile, ())
-            except Exception as e:
-                dbgFile.write(format_exception(e))
-                dbgFile.write('\n')
-                errMsg = f'^error,msg={gdbMiEscapeStr(repr(e))}{NL}'
-                w.write(errMsg)
-                sendGdbPrompt(w)
-                state.remote = None
-            return True
+            # w.write('*stopped,frame={addr="0x00007ffff7fe4da0",func="_start",args=[],from="target:/lib64/ld-linux-x86-64.so.2",arch="i386:x86-64"},thread-id="1",stopped-threads="all",core="0"' + NL)
+            # vscode requires done instead connected
+            sendReplyDone(cmd, w, dbgFile, ())
+        except Exception as e:
+            dbgFile.write(format_exception(e))
+            dbgFile.write('\n')
+            errMsg = f'^error,msg={gdbMiEscapeStr(repr(e))}{NL}'
+            w.write(errMsg)
+            sendGdbPrompt(w)
+            state.remote = None
+        return True
     return False
@@ -1,72 +1,174 @@
-import ast
-import re
-from typing import Any, IO
+from typing import Any, IO, List
 
+from hwtHlsGdb.gdbLlvimIrCmdStack import gdbMiPopPrintValues
 from hwtHlsGdb.gdbLlvimIrInterpretState import GdbInterpretState
-from hwtHlsGdb.gdbMiMessages import GdbMiCmd, filterArgs, sendReplyDone
-
-
-def gdbLlvmIrProcessCmdVar(cmd: GdbMiCmd, r: IO[Any], w: IO[Any], state: GdbInterpretState):
-    if cmd.name == 'var-create':
-        args = filterArgs(cmd.args, [['--thread', '1'], ['--frame', '0']])
-        if len(args) == 3 and args[0] == '-' and args[1] == '*':
-            # If ‘-’ is specified, the varobj system will generate a string “varNNNNNN” automatically.
-            # A ‘*’ indicates that the current frame should be used.
-            varName = args[2]
-            if varName.startswith('"') and varName.endswith('"'):
-                varName = ast.literal_eval(varName)
-            foundReg = None
-            for r in state.llvmRegs:
-                if r.name == varName:
-                    foundReg = r
-                    break
-            if foundReg is not None:
-                name = f'"var{foundReg.registerIndex:d}"'
-                value = f'"0x{state.remote.readRegister(foundReg.registerIndex):x}"'
-                dtypeName = f'"{foundReg.dtypeName:s}"'
-            else:
-                cur = state.tmpVariables.get(varName, None)
-                value = '""'
-                dtypeName = "unknown"
-                if cur is not None:
-                    name = cur
-                else:
-                    name = f'"var{state.tmpVariablesIdCntr:d}"'
-                    state.tmpVariables[varName] = name
-                    state.tmpVariablesIdCntr += 1
-
-            doneArgs = (('name', name),
-                        ('value', value),
-                        ('numchild', '"0"'), ('type', dtypeName),
-                        ('thread-id', '"1"'), ('has_more', '"0"'))
-            sendReplyDone(cmd, w, state.dbgFile, doneArgs)
-            return True
-
-    elif cmd.name == 'var-delete':
-        if len(cmd.args) == 1:
-            varName = cmd.args[0]
-            if varName.startswith('"') and varName.endswith('"'):
-                varName = ast.literal_eval(varName)
-            m = re.match("^var(\d+)$", varName)
-            if m:
-                regIndex = int(m.group(1))
-                assert regIndex > 0 and regIndex < len(state.llvmRegs), (varName, len(len(state.llvmRegs)))
-                sendReplyDone(cmd, w, state.dbgFile, ())
-                return True
-
-    elif cmd.name == 'var-update':
-        if len(cmd.args) == 2 and cmd.args[0] == '1':
-            varName = cmd.args[1]
-            if varName == "*":
-                raise NotImplementedError()
-            m = re.match("^var(\d+)$", varName)
-            value = ""
-            if m:
-                regIndex = int(m.group(1))
-                if regIndex < len(state.llvmRegs):
-                    value = f'"0x{state.remote.readRegister(regIndex):x}"'
-            changelist = f'[{{name="{varName:s}",value="{value}",in_scope="true",type_changed="false"}}]'
-            doneArgs = (('changelist', changelist),)
-            sendReplyDone(cmd, w, state.dbgFile, doneArgs)
-            return True
-    return False
+from hwtHlsGdb.gdbLlvimIrVarObj import GDB_VAROBJ_FORMATS
+from hwtHlsGdb.gdbMiCmdRegistry import GDB_MI_COMMANDS, GdbMiOption, GdbMiCmdOpts
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd, sendReplyDone, gdbMiEscapeStr
+
+# https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Variable-Objects.html
+
+
+@GDB_MI_COMMANDS.register("var-create")
+def gdbLlvmIrCmdVarCreate(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -var-create {name | "-"} {frame-addr | "*" | "@"} expression
+    if len(args) != 3 or args[1] not in ('*', '@'):
+        return False
+    # If ‘-’ is specified, the varobj system will generate a string “varNNNNNN” automatically.
+    # A ‘*’ indicates that the current frame should be used.
+    name, _, expression = args
+    if name != '-' and state.varObjs.get(name) is not None:
+        return False
+
+    reg = state.getFunctionSymbols().getRegByName(expression)
+    if reg is None:
+        return False  # only registers can be evaluated, same as for data-evaluate-expression
+    v = state.varObjs.create(name, expression, reg)
+    value = state.varObjs.evaluate(state.remote, v)
+    doneArgs = (('name', f'"{v.name:s}"'),
+                ('value', f'"{value:s}"'),
+                ('numchild', '"0"'), ('type', gdbMiEscapeStr(v.typeName)),
+                ('thread-id', '"1"'), ('has_more', '"0"'))
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-delete", GdbMiOption("-c"))
+def gdbLlvmIrCmdVarDelete(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    if state.varObjs.get(args[0]) is None:
+        return False
+    # with -c only children are deleted, varobjs for registers do not have any
+    ndeleted = 0 if "-c" in opts else state.varObjs.delete(args[0])
+    sendReplyDone(cmd, w, state.dbgFile, (("ndeleted", f'"{ndeleted:d}"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-update",
+                          GdbMiOption("--no-values"),
+                          GdbMiOption("--all-values"),
+                          GdbMiOption("--simple-values"))
+def gdbLlvmIrCmdVarUpdate(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -var-update [print-values] {name | "*"}
+    printValues, args = gdbMiPopPrintValues(opts, args)
+    if len(args) != 1:
+        return False
+    name = args[0]
+    if name != "*" and state.varObjs.get(name) is None:
+        return False
+
+    # only varobjs which value changed since the last report are in changelist
+    changes = []
+    for v, value in state.varObjs.update(state.remote, name):
+        if printValues == "0":
+            changes.append(f'{{name="{v.name:s}",in_scope="true",type_changed="false",has_more="0"}}')
+        else:
+            # all varobjs are of a simple type, "1" and "2" behaves the same
+            changes.append(f'{{name="{v.name:s}",value="{value:s}",in_scope="true",type_changed="false",has_more="0"}}')
+    doneArgs = (('changelist', f'[{",".join(changes):s}]'),)
+    sendReplyDone(cmd, w, state.dbgFile, doneArgs)
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-evaluate-expression", GdbMiOption("-f", True))
+def gdbLlvmIrCmdVarEvaluateExpression(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    v = state.varObjs.get(args[0])
+    if v is None:
+        return False
+    fmt = opts.get("-f", None)
+    if fmt is not None:
+        if fmt not in GDB_VAROBJ_FORMATS:
+            return False
+        # format specified only for this evaluation
+        origFmt = v.format
+        origValue = v.value
+        v.format = fmt
+        try:
+            value = state.varObjs.evaluate(state.remote, v)
+        finally:
+            v.format = origFmt
+            v.value = origValue
+    else:
+        value = state.varObjs.evaluate(state.remote, v)
+    sendReplyDone(cmd, w, state.dbgFile, (("value", f'"{value:s}"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-set-format")
+def gdbLlvmIrCmdVarSetFormat(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 2 or args[1] not in GDB_VAROBJ_FORMATS:
+        return False
+    v = state.varObjs.get(args[0])
+    if v is None:
+        return False
+    v.format = args[1]
+    value = state.varObjs.evaluate(state.remote, v)
+    sendReplyDone(cmd, w, state.dbgFile, (("format", f'"{v.format:s}"'), ("value", f'"{value:s}"')))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-show-format")
+def gdbLlvmIrCmdVarShowFormat(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    v = state.varObjs.get(args[0])
+    if v is None:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, (("format", f'"{v.format:s}"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-info-type")
+def gdbLlvmIrCmdVarInfoType(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    v = state.varObjs.get(args[0])
+    if v is None:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, (("type", gdbMiEscapeStr(v.typeName)),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-info-expression")
+def gdbLlvmIrCmdVarInfoExpression(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1:
+        return False
+    v = state.varObjs.get(args[0])
+    if v is None:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, (("lang", '"C"'), ("exp", gdbMiEscapeStr(v.expression))))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-info-num-children")
+def gdbLlvmIrCmdVarInfoNumChildren(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1 or state.varObjs.get(args[0]) is None:
+        return False
+    sendReplyDone(cmd, w, state.dbgFile, (("numchild", '"0"'),))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-list-children",
+                          GdbMiOption("--no-values"),
+                          GdbMiOption("--all-values"),
+                          GdbMiOption("--simple-values"))
+def gdbLlvmIrCmdVarListChildren(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    # -var-list-children [print-values] name [from to]
+    _, args = gdbMiPopPrintValues(opts, args)
+    if len(args) not in (1, 3) or state.varObjs.get(args[0]) is None:
+        return False
+    # LLVM IR registers are scalars without any children
+    sendReplyDone(cmd, w, state.dbgFile, (("numchild", '"0"'), ("has_more", '"0"')))
+    return True
+
+
+@GDB_MI_COMMANDS.register("var-show-attributes")
+def gdbLlvmIrCmdVarShowAttributes(cmd: GdbMiCmd, opts: GdbMiCmdOpts, args: List[str], w: IO[Any], state: GdbInterpretState):
+    if len(args) != 1 or state.varObjs.get(args[0]) is None:
+        return False
+    # LLVM IR is in SSA form, registers can not be assigned from debugger
+    sendReplyDone(cmd, w, state.dbgFile, (("attr", '"noneditable"'),))
+    return True
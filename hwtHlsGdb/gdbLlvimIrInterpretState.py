@@ -1,25 +1,145 @@
 from contextlib import ExitStack
-from typing import  Optional, IO, Any, Tuple, List, Dict
+from typing import  Optional, IO, Any, Tuple, List, Dict, Iterable, Set
 
-from hwtHls.llvm.llvmIr import LlvmCompilationBundle, Instruction, IntegerType
+from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler
+from hwtHlsGdb.gdbLlvimIrSymbolTable import LlvmIrModuleSymbolTable, LlvmIrSymbolTable
+from hwtHlsGdb.gdbLlvimIrVarObj import GdbVarObjTable
+from hwtHlsGdb.gdbLlvmIrIndexCache import llvmIrHash, llvmIrIndexLoad, LlvmIrIndex, llvmIrIndexStore, \
+    llvmIrModuleIndexLoad, LlvmIrModuleIndex, llvmIrModuleIndexStore
+from hwtHlsGdb.gdbLlvmIrRegs import LLVM_IR_SRC_CODELINE_OFFSET, llvmIrIterRegs, llvmIrLoadModule, \
+    LlvmIrFunctionInfo, llvmIrDefinedFunctions, llvmIrFunctionInfos, LlvmRegisterInfo
+from hwtHlsGdb.gdbMiMessages import GdbMiMsgFormatter
 from hwtHlsGdb.gdbRemoteClient import GdbRemoteClient
 
 
 class GdbInterpretState():
+    """
+    :ivar symbols: functions and registers of the debugged module
+    :ivar msgFormatter: formatter of frame/breakpoint messages for the debugged module
+    :note: symbols and msgFormatter are loaded on first use after :meth:`~.setExe`
+        (from the index cache or by parsing the IR), so file-exec-and-symbols is answered immediately.
+        The registers of each function are indexed on the first reference to the function.
+    """
 
     def __init__(self, dbgFile: Optional[IO[Any]]):
         self.cmdIos: List[Tuple[IO[Any], IO[Any]]] = []
         self.remote: Optional[GdbRemoteClient] = None
         self.appTty: Optional[Tuple[IO[Any], IO[Any]]] = None
         self.dbgFile: Optional[IO[Any]] = dbgFile
-        self.llvm: Optional[LlvmCompilationBundle] = None
-        # codeline, instruction, result type, register name
-        self.llvmRegs: Tuple[int, Instruction, Optional[IntegerType], Optional[str]] = []
+        self.llvm: Optional["LlvmCompilationBundle"] = None
+        self._symbols: Optional[LlvmIrModuleSymbolTable] = None
+        self._irHash: Optional[bytes] = None
+        # functions of the parsed module (if the module was parsed)
+        self._fnInfos: Optional[List[LlvmIrFunctionInfo]] = None
         # number to codeline
         self.breakpoints: Dict[int, int] = {}
         self.breakpointIdCntr = 0
-        self.tmpVariables: Dict[str, str] = {}  # requested name to assigned name
-        self.tmpVariablesIdCntr = 0
+        # numbers of breakpoints created by break-insert -t, deleted once hit
+        self.temporaryBreakpoints: Set[int] = set()
+        # GDB/MI variable objects created by var-create
+        self.varObjs = GdbVarObjTable()
+        # default filter of stack-list-variables (:see: :data:`hwtHlsGdb.gdbLlvimIrCmdStack.GDB_STACK_LIST_VARIABLES_FILTERS`)
+        self.stackListVariablesFilter = "all"
         self.exe: Optional[str] = None  # path to debugged IR file
-        self.curStackDepth = 1
+        self._msgFormatter: Optional[GdbMiMsgFormatter] = None
+        # level of the frame selected by stack-select-frame, reset on every stop
+        self.selectedFrame = 0
+        # set by exec-finish to report the next stop as "function-finished"
+        self.execFinishPending = False
         self.exitStack: Optional[ExitStack] = None
+        # set by gdb-exit command to stop the main loop
+        self.gdbExit = False
+        # handler for "target-select loopback" if simulator runs in the same process
+        self.loopbackHandler: Optional[GdbCmdHandler] = None
+
+    def setExe(self, exe: str):
+        """
+        Set the debugged IR file, the file is loaded lazily
+        """
+        self.exe = exe
+        self.llvm = None
+        self._symbols = None
+        self._irHash = None
+        self._fnInfos = None
+        self._msgFormatter = None
+        self.varObjs.clear()
+
+    def _loadModule(self) -> List[LlvmIrFunctionInfo]:
+        """
+        Parse the IR and resolve positions of all functions.
+        """
+        if self._fnInfos is None:
+            self.llvm, M = llvmIrLoadModule(self.exe)
+            fns = llvmIrDefinedFunctions(M)
+            if fns:
+                self.llvm.main = fns[0]
+            self._fnInfos = llvmIrFunctionInfos(fns, LLVM_IR_SRC_CODELINE_OFFSET, 1, self.exe)
+        return self._fnInfos
+
+    def _loadFunctionRegs(self, fnIndex: int) -> Iterable[LlvmRegisterInfo]:
+        """
+        Load registers of a function from the index cache or index the function in parsed module.
+        """
+        fi = self._symbols.fns[fnIndex]
+        index = llvmIrIndexLoad(self._irHash, fnIndex)
+        if index is not None and index.fnName == fi.name:
+            # the IR does not need to be parsed, all information for the frontend is in the index
+            return index.iterRegs(fi.codelineOffset, fi.regIndexOffset)
+
+        fn = self._loadModule()[fnIndex].fn
+        regs = tuple(llvmIrIterRegs(fi.codelineOffset, fi.regIndexOffset, fn, False))
+        llvmIrIndexStore(self._irHash, LlvmIrIndex.fromRegs(fi.name, regs, fi.codelineOffset, fi.regIndexOffset), fnIndex)
+        return regs
+
+    def _loadExe(self):
+        exe = self.exe
+        if exe is None:
+            self._symbols = LlvmIrModuleSymbolTable()
+            self._msgFormatter = GdbMiMsgFormatter(None, None)
+            return
+
+        self._irHash = llvmIrHash(exe)
+        moduleIndex = llvmIrModuleIndexLoad(self._irHash)
+        if moduleIndex is None:
+            fnInfos = self._loadModule()
+            llvmIrModuleIndexStore(self._irHash, LlvmIrModuleIndex.fromFunctionInfos(fnInfos))
+        else:
+            fnInfos = moduleIndex.toFunctionInfos()
+        symbols = self._symbols = LlvmIrModuleSymbolTable(fnInfos, self._loadFunctionRegs)
+        self._msgFormatter = GdbMiMsgFormatter(fnInfos[0].name if fnInfos else None, exe,
+                                               symbols.getFunctionNameByCodeline)
+
+    @property
+    def symbols(self) -> LlvmIrModuleSymbolTable:
+        if self._symbols is None:
+            self._loadExe()
+        return self._symbols
+
+    @property
+    def msgFormatter(self) -> GdbMiMsgFormatter:
+        if self._msgFormatter is None:
+            self._loadExe()
+        return self._msgFormatter
+
+    def getSelectedFrameCodeline(self) -> int:
+        """
+        :returns: codeline of the current instruction in the selected frame (the call instruction for callers)
+        """
+        remote = self.remote
+        if self.selectedFrame == 0:
+            return remote.readRegister(0) // 8
+        return remote.readFrames()[self.selectedFrame] // 8
+
+    def getFunctionSymbols(self) -> LlvmIrSymbolTable:
+        """
+        :returns: symbols of the function of the selected frame
+            (the first function of the module if the target is not connected)
+        """
+        symbols = self.symbols
+        fn = None
+        remote = self.remote
+        if remote is not None and remote.isConnected():
+            fn = symbols.getFunctionByCodeline(self.getSelectedFrameCodeline())
+        if fn is None:
+            fn = symbols.getEntryFunction()
+        return fn
@@ -0,0 +1,183 @@
+from bisect import bisect_right
+from typing import Optional, Dict, List, Tuple, Sequence, Generator, Callable, Iterable
+
+from hwtHlsGdb.gdbLlvmIrRegs import LlvmRegisterInfo, LlvmIrFunctionInfo
+
+
+class LlvmIrNameTrie():
+    """
+    Prefix tree of register names for command completion.
+
+    :ivar root: the root node, the node is a dictionary character -> child node,
+        key None is used for the name which ends in this node
+    """
+
+    def __init__(self, names: Sequence[str]=()):
+        self.root: Dict[Optional[str], dict] = {}
+        for name in names:
+            self.insert(name)
+
+    def insert(self, name: str):
+        node = self.root
+        for c in name:
+            child = node.get(c, None)
+            if child is None:
+                child = node[c] = {}
+            node = child
+        node[None] = name
+
+    def iterPrefix(self, prefix: str) -> Generator[str, None, None]:
+        """
+        :returns: generator of all names starting with prefix (in order of insertion for each node)
+        """
+        node = self.root
+        for c in prefix:
+            node = node.get(c, None)
+            if node is None:
+                return
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            name = node.get(None, None)
+            if name is not None:
+                yield name
+            stack.extend(child for c, child in reversed(node.items()) if c is not None)
+
+
+class LlvmIrSymbolTable():
+    """
+    Index of LLVM IR registers of a function of the debugged module.
+
+    :ivar name: name of the function
+    :ivar codelineOffset: codeline of the first instruction, the codeline arrays start at this codeline
+    :ivar regs: all instructions in order of appearance in the IR file
+    :ivar intRegs: instructions which have a register on the target (registerIndex is not None)
+    :ivar regByName: register name -> register info
+    :ivar regByCodeline: codeline -> instruction (None for lines without instruction)
+    :ivar blockByCodeline: codeline -> instructions of the basic block which contains the codeline
+    :ivar names: prefix tree of register names
+    """
+
+    def __init__(self, regs: Sequence[LlvmRegisterInfo]=(), name: Optional[str]=None):
+        self.name = name
+        self.regs: Tuple[LlvmRegisterInfo, ...] = tuple(regs)
+        self.intRegs: Tuple[LlvmRegisterInfo, ...] = tuple(r for r in self.regs if r.registerIndex is not None)
+        self.regByName: Dict[str, LlvmRegisterInfo] = {r.name: r for r in self.intRegs}
+
+        codelineOffset = self.codelineOffset = self.regs[0].codeline if self.regs else 0
+        lineCnt = self.regs[-1].codeline + 1 - codelineOffset if self.regs else 0
+        self.regByCodeline: List[Optional[LlvmRegisterInfo]] = [None for _ in range(lineCnt)]
+        self.blockByCodeline: List[Tuple[LlvmRegisterInfo, ...]] = [() for _ in range(lineCnt)]
+        block: List[LlvmRegisterInfo] = []
+        for r in self.regs:
+            # instructions of a block are on consecutive lines,
+            # blocks are separated by a label line and an empty line
+            if block and block[-1].codeline + 1 != r.codeline:
+                self._addBlock(block)
+                block = []
+            block.append(r)
+            self.regByCodeline[r.codeline - codelineOffset] = r
+        if block:
+            self._addBlock(block)
+
+        self.names = LlvmIrNameTrie(self.regByName.keys())
+
+    def _addBlock(self, block: List[LlvmRegisterInfo]):
+        blockIntRegs = tuple(r for r in block if r.registerIndex is not None)
+        for r in block:
+            self.blockByCodeline[r.codeline - self.codelineOffset] = blockIntRegs
+
+    def getRegByName(self, name: str) -> Optional[LlvmRegisterInfo]:
+        return self.regByName.get(name, None)
+
+    def getRegByCodeline(self, codeline: int) -> Optional[LlvmRegisterInfo]:
+        codeline -= self.codelineOffset
+        if 0 <= codeline < len(self.regByCodeline):
+            return self.regByCodeline[codeline]
+        return None
+
+    def getBlockRegs(self, codeline: int) -> Tuple[LlvmRegisterInfo, ...]:
+        """
+        :returns: registers defined in the basic block which contains the instruction on specified codeline
+        """
+        codeline -= self.codelineOffset
+        if 0 <= codeline < len(self.blockByCodeline):
+            return self.blockByCodeline[codeline]
+        return ()
+
+
+class LlvmIrModuleSymbolTable():
+    """
+    Index of all functions of the debugged LLVM IR module.
+    The positions of functions are known upfront (:class:`LlvmIrFunctionInfo`),
+    the :class:`~.LlvmIrSymbolTable` of a function is built on the first reference to the function
+    so the modules with many functions are not indexed completely if just a few functions are debugged.
+
+    :ivar fns: functions in order of the module
+    :ivar fnIndexByName: function name -> index in fns
+    :ivar _fnCodelines: tuples (codelineOffset, index in fns) sorted by codeline
+    :ivar _tables: symbol table for each function, None if not built yet
+    :ivar _loadFunctionRegs: function which returns registers of the function with specified index
+    """
+
+    def __init__(self, fns: Sequence[LlvmIrFunctionInfo]=(),
+                 loadFunctionRegs: Optional[Callable[[int], Iterable[LlvmRegisterInfo]]]=None):
+        self.fns: Tuple[LlvmIrFunctionInfo, ...] = tuple(fns)
+        self.fnIndexByName: Dict[str, int] = {fi.name: i for i, fi in enumerate(self.fns)}
+        self._fnCodelines: List[Tuple[int, int]] = sorted((fi.codelineOffset, i) for i, fi in enumerate(self.fns))
+        self._tables: List[Optional[LlvmIrSymbolTable]] = [None for _ in self.fns]
+        self._loadFunctionRegs = loadFunctionRegs
+
+    def getFunction(self, fnIndex: int) -> LlvmIrSymbolTable:
+        t = self._tables[fnIndex]
+        if t is None:
+            t = self._tables[fnIndex] = LlvmIrSymbolTable(self._loadFunctionRegs(fnIndex), self.fns[fnIndex].name)
+        return t
+
+    def getFunctionIndexByCodeline(self, codeline: int) -> Optional[int]:
+        """
+        :returns: index of the function which contains the codeline (the last function which starts before it)
+        """
+        i = bisect_right(self._fnCodelines, (codeline, len(self.fns)))
+        if i == 0:
+            return None
+        return self._fnCodelines[i - 1][1]
+
+    def getFunctionByCodeline(self, codeline: int) -> Optional[LlvmIrSymbolTable]:
+        fnIndex = self.getFunctionIndexByCodeline(codeline)
+        return None if fnIndex is None else self.getFunction(fnIndex)
+
+    def getFunctionNameByCodeline(self, codeline: int) -> Optional[str]:
+        """
+        :note: The function is not indexed.
+        """
+        fnIndex = self.getFunctionIndexByCodeline(codeline)
+        return None if fnIndex is None else self.fns[fnIndex].name
+
+    def getFunctionByName(self, name: str) -> Optional[LlvmIrSymbolTable]:
+        fnIndex = self.fnIndexByName.get(name, None)
+        return None if fnIndex is None else self.getFunction(fnIndex)
+
+    def getEntryFunction(self) -> LlvmIrSymbolTable:
+        """
+        :returns: the first function of the module (an empty table if there is not any)
+        """
+        if not self.fns:
+            return LlvmIrSymbolTable()
+        return self.getFunction(0)
+
+    def iterFunctions(self) -> Generator[LlvmIrSymbolTable, None, None]:
+        """
+        :note: All functions are indexed.
+        """
+        for i in range(len(self.fns)):
+            yield self.getFunction(i)
+
+    def getRegByCodeline(self, codeline: int) -> Optional[LlvmRegisterInfo]:
+        fn = self.getFunctionByCodeline(codeline)
+        return None if fn is None else fn.getRegByCodeline(codeline)
+
+    def getBlockRegs(self, codeline: int) -> Tuple[LlvmRegisterInfo, ...]:
+        fn = self.getFunctionByCodeline(codeline)
+        return () if fn is None else fn.getBlockRegs(codeline)
@@ -0,0 +1,132 @@
+from typing import Optional, Dict, List, Tuple
+
+from hwtHlsGdb.gdbLlvmIrRegs import LlvmRegisterInfo
+from hwtHlsGdb.gdbRemoteClient import GdbRemoteClient
+
+# https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Variable-Objects.html#The-_002dvar_002dset_002dformat-Command
+GDB_VAROBJ_FORMATS = ("natural", "hexadecimal", "decimal", "octal", "binary", "zero-hexadecimal")
+
+
+class GdbVarObj():
+    """
+    GDB/MI variable object
+
+    :ivar name: name of the varobj used in MI commands
+    :ivar expression: the expression for which the varobj was created (name of LLVM IR register)
+    :ivar reg: register for the expression
+    :ivar format: display format (:see: GDB_VAROBJ_FORMATS)
+    :ivar value: last value reported to the IDE, None if not known yet
+    """
+
+    def __init__(self, name: str, expression: str, reg: LlvmRegisterInfo):
+        self.name = name
+        self.expression = expression
+        self.reg = reg
+        self.format = "natural"
+        self.value: Optional[str] = None
+
+    @property
+    def typeName(self):
+        return self.reg.dtypeName
+
+    def formatValue(self, v: int, byteSize: int) -> str:
+        fmt = self.format
+        if fmt == "natural" or fmt == "hexadecimal":
+            return f"0x{v:x}"
+        elif fmt == "decimal":
+            return f"{v:d}"
+        elif fmt == "octal":
+            return f"0{v:o}"
+        elif fmt == "binary":
+            return f"{v:b}"
+        elif fmt == "zero-hexadecimal":
+            return f"0x{v:0{byteSize * 2}x}"
+        else:
+            raise ValueError(fmt)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.name:s} {self.expression:s}={self.value}>"
+
+
+class GdbVarObjTable():
+    """
+    Container of all varobjs of a debug session.
+    The values of registers are resolved using a single bulk read of all registers
+    (:meth:`GdbRemoteClient.readRegisters`) which is cached by the client until the execution resumes,
+    :meth:`~.update` reports only varobjs which value changed since the last report.
+
+    :ivar varObjs: dictionary name -> varobj (in order of creation)
+    :ivar nameCntr: counter used to generate names for varobjs created with "-" name
+    """
+
+    def __init__(self):
+        self.varObjs: Dict[str, GdbVarObj] = {}
+        self.nameCntr = 1
+
+    def clear(self):
+        self.varObjs.clear()
+
+    def create(self, name: str, expression: str, reg: LlvmRegisterInfo) -> GdbVarObj:
+        """
+        :param name: name of varobj or "-" to generate it
+        """
+        if name == "-":
+            while True:
+                name = f"var{self.nameCntr:d}"
+                self.nameCntr += 1
+                if name not in self.varObjs:
+                    break
+        else:
+            assert name not in self.varObjs, ("Duplicated varobj name", name)
+        v = self.varObjs[name] = GdbVarObj(name, expression, reg)
+        return v
+
+    def delete(self, name: str) -> int:
+        """
+        :returns: number of deleted varobjs
+        """
+        # varobjs for LLVM IR registers do not have any children
+        return 0 if self.varObjs.pop(name, None) is None else 1
+
+    def get(self, name: str) -> Optional[GdbVarObj]:
+        return self.varObjs.get(name, None)
+
+    @staticmethod
+    def _readValues(remote: GdbRemoteClient, varObjs: List[GdbVarObj]) -> List[int]:
+        if not varObjs:
+            return []
+        # a single cached "g" if stopped, pipelined "p" packets if running
+        return remote.readRegisterList([v.reg.registerIndex for v in varObjs])
+
+    def _formatValue(self, remote: GdbRemoteClient, v: GdbVarObj, value: int) -> str:
+        sizes = remote.registerByteSizes
+        regIndex = v.reg.registerIndex
+        byteSize = sizes[regIndex] if sizes is not None and regIndex < len(sizes) else 8
+        return v.formatValue(value, byteSize)
+
+    def evaluate(self, remote: GdbRemoteClient, v: GdbVarObj) -> str:
+        """
+        Read the current value and mark it as reported.
+        """
+        value = self._formatValue(remote, v, self._readValues(remote, [v])[0])
+        v.value = value
+        return value
+
+    def update(self, remote: GdbRemoteClient, name: str) -> List[Tuple[GdbVarObj, str]]:
+        """
+        :param name: name of varobj or "*" for all
+        :returns: list of varobjs which value changed since the last report (and the new value)
+        """
+        if name == "*":
+            varObjs = list(self.varObjs.values())
+        else:
+            v = self.varObjs[name]
+            varObjs = [v]
+
+        changed = []
+        for v, value in zip(varObjs, self._readValues(remote, varObjs)):
+            value = self._formatValue(remote, v, value)
+            if value != v.value:
+                v.value = value
+                changed.append((v, value))
+        return changed
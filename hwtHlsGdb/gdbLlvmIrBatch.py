@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Headless batch debugging of LLVM IR.
+
+The simulator of LLVM IR (:class:`~.GdbCmdHandlerLllvmIr`) is driven directly by a script instead of an IDE
+and GDBServerStub. Each combination of script and input vector is executed as an independent job
+in a process pool. The IR is parsed only once per worker process.
+
+Script format (one command per line, "#" starts a comment):
+
+.. code-block:: text
+
+    break <codeline>        # insert breakpoint
+    delete <codeline>       # remove breakpoint
+    continue                # run until breakpoint or end of simulation
+    step [<n>]              # execute n instructions (default 1)
+    expect <reg> <value>    # check value of LLVM IR register (int literal, e.g. 10 or 0xa)
+    expect-line <codeline>  # check that the execution is stopped at specified codeline
+
+Input vectors are in JSON format, it is a list of vectors, vector is a list of arguments
+of simulated function. An argument is a list of values for input (the values are passed as iterator)
+or null for an output (the output values are collected into list and reported in result).
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+from math import inf
+import os
+import sys
+from time import perf_counter
+from typing import List, Optional, Tuple, Union, Dict
+
+from hwtHls.ssa.analysis.llvmIrInterpret import LlvmIrInterpret, SimIoUnderflowErr
+from hwtHlsGdb.gdbCmdHandler import CycleLimitReached
+from hwtHlsGdb.gdbCmdHandlerLlvmIr import GdbCmdHandlerLllvmIr, llvmIrLoadModule, \
+    LLVM_IR_SRC_CODELINE_OFFSET, LlvmIrSimPcReg
+from hwtHlsGdb.gdbLlvmIrCoverage import LlvmIrCoverage
+from hwtHlsGdb.gdbLlvmIrRegs import llvmIrDefinedFunctions, llvmIrIterRegs
+
+
+class GdbBatchScript():
+    """
+    Parsed breakpoint/assertion script (:see: module doc)
+
+    :ivar commands: list of tuples (source line number, command name, arguments),
+        integer arguments are already converted to int
+    """
+    # command name -> (number of required arguments, number of optional arguments, indices of integer arguments)
+    COMMANDS: Dict[str, Tuple[int, int, Tuple[int, ...]]] = {
+        "break": (1, 0, (0,)),
+        "delete": (1, 0, (0,)),
+        "continue": (0, 0, ()),
+        "step": (0, 1, (0,)),
+        "expect": (2, 0, (1,)),
+        "expect-line": (1, 0, (0,)),
+    }
+
+    def __init__(self, name: str, commands: List[Tuple[int, str, List[Union[str, int]]]]):
+        self.name = name
+        self.commands = commands
+
+    @classmethod
+    def fromStr(cls, name: str, text: str):
+        commands = []
+        for lineNo, line in enumerate(text.split("\n"), 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            cmd, *args = line.split()
+            spec = cls.COMMANDS.get(cmd, None)
+            if spec is None:
+                raise ValueError(f"{name:s}:{lineNo:d}: Unknown command", cmd)
+            argCntMin, argCntOptional, intArgs = spec
+            if not (argCntMin <= len(args) <= argCntMin + argCntOptional):
+                raise ValueError(f"{name:s}:{lineNo:d}: Wrong number of arguments", cmd, args)
+            for i in intArgs:
+                if i < len(args):
+                    try:
+                        args[i] = int(args[i], 0)
+                    except ValueError:
+                        raise ValueError(f"{name:s}:{lineNo:d}: Expected integer", cmd, args[i]) from None
+            if cmd == "step" and args and args[0] <= 0:
+                raise ValueError(f"{name:s}:{lineNo:d}: Number of instructions must be positive", cmd, args[0])
+            commands.append((lineNo, cmd, args))
+        return cls(name, commands)
+
+    @classmethod
+    def fromFile(cls, fileName: str):
+        with open(fileName) as f:
+            return cls.fromStr(fileName, f.read())
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.name:s} {len(self.commands):d} commands>"
+
+
+class GdbBatchResult():
+    """
+    Result of a single job (a script executed with a single input vector)
+
+    :ivar failures: list of messages for failed expectations
+    :ivar error: the exception which interrupted the simulation (if any)
+    :ivar finished: True if the simulation consumed all inputs
+    :ivar instrCnt: number of executed instructions
+    :ivar duration: wall time of the job in seconds
+    :ivar outputs: values collected in output arguments
+    :ivar coverage: tuple (lineHits, edgeHits) if coverage was collected
+    """
+
+    def __init__(self, scriptIndex: int, vectorIndex: int):
+        self.scriptIndex = scriptIndex
+        self.vectorIndex = vectorIndex
+        self.failures: List[str] = []
+        self.error: Optional[str] = None
+        self.finished = False
+        self.instrCnt = 0
+        self.duration = 0.0
+        self.outputs: List[Optional[list]] = []
+        self.coverage = None
+
+    @property
+    def ok(self):
+        return not self.failures and self.error is None
+
+    def __repr__(self):
+        status = "OK" if self.ok else "FAIL"
+        return (f"<{self.__class__.__name__:s} script:{self.scriptIndex:d} vector:{self.vectorIndex:d} {status:s} "
+                f"instrs:{self.instrCnt:d} {self.duration * 1e3:.3f}ms>")
+
+
+class GdbBatchRunner():
+    """
+    Executes scripts on a :class:`~.GdbCmdHandlerLllvmIr` without any GDB client.
+
+    :ivar regByName: dictionary mapping name of LLVM IR register to register index
+    """
+
+    def __init__(self, handler: GdbCmdHandlerLllvmIr):
+        self.handler = handler
+        self.regByName: Dict[str, int] = {
+            handler.registerToName[instr]: index for instr, index in handler.registerToIndex.items()
+        }
+
+    def _run(self, res: GdbBatchResult, cycleLimit: Union[int, float]):
+        """
+        Run until breakpoint, end of simulation or cycleLimit instructions were executed.
+        """
+        h = self.handler
+        h.cycleLimit = cycleLimit
+        while True:
+            try:
+                breakAddr = h.runCurrentInstr()
+            except SimIoUnderflowErr:
+                # all inputs consumed, the rest of the script is evaluated on the final state
+                res.finished = True
+                return
+            if breakAddr is CycleLimitReached:
+                return
+            res.instrCnt += 1
+            if breakAddr is not None:
+                return
+
+    def readRegister(self, name: str) -> Optional[int]:
+        h = self.handler
+        index = self.regByName[name]
+        v = h.registerValue[h.registers[index]]
+        if v.vld_mask != (1 << v._dtype.bit_length()) - 1:
+            return None  # value is not fully defined
+        return v.val
+
+    def readPc(self) -> int:
+        """
+        :returns: codeline of the instruction which will be executed next
+        """
+        return int.from_bytes(bytes.fromhex(self.handler.handleReadRegister(LlvmIrSimPcReg.INDEX)), 'little') // 8
+
+    def run(self, script: GdbBatchScript, res: GdbBatchResult):
+        h = self.handler
+        for addr in tuple(h.breakpoints.keys()):
+            h.handleRemoveBreakpoint(None, addr, 0)
+
+        for lineNo, cmd, args in script.commands:
+            loc = f"{script.name:s}:{lineNo:d}"
+            if cmd == "break":
+                h.handleAddBreakpoint(None, args[0] * 8, 0)
+            elif cmd == "delete":
+                h.handleRemoveBreakpoint(None, args[0] * 8, 0)
+            elif cmd == "continue":
+                if not res.finished:
+                    self._run(res, inf)
+            elif cmd == "step":
+                if not res.finished:
+                    self._run(res, args[0] if args else 1)
+            elif cmd == "expect":
+                name, expected = args
+                v = self.readRegister(name)
+                if v != expected:
+                    res.failures.append(f"{loc:s}: {name:s} expected {expected:d} got {v}")
+            elif cmd == "expect-line":
+                expected = args[0]
+                v = self.readPc()
+                if v != expected:
+                    res.failures.append(f"{loc:s}: expected to stop at line {expected:d}, stopped at {v:d}")
+
+
+def gdbBatchVectorToFnArgs(vector: List[Optional[list]]):
+    """
+    Convert vector from JSON to arguments of simulated function (:see: module doc)
+    """
+    return tuple([] if a is None else iter(a) for a in vector)
+
+
+# state of the worker process, there is a single runner (and handler) for each worker process
+_worker: Optional[Tuple[GdbBatchRunner, List[GdbBatchScript], list]] = None
+
+
+def _gdbBatchWorkerInit(irFile: str, scripts: List[GdbBatchScript], codelineOffset: int, collectCoverage: bool):
+    global _worker
+    llvm, M = llvmIrLoadModule(irFile)
+    fns = llvmIrDefinedFunctions(M)
+    interpret = LlvmIrInterpret(fns[0])
+    handler = GdbCmdHandlerLllvmIr(interpret, (), codelineOffset=codelineOffset,
+                                   collectCoverage=collectCoverage, irFile=irFile, fns=fns)
+    # llvm and M are kept in the state to keep the LLVM context alive
+    _worker = (GdbBatchRunner(handler), scripts, [llvm, M])
+
+
+def _gdbBatchWorkerRun(scriptIndex: int, vectorIndex: int, vector: List[Optional[list]]) -> GdbBatchResult:
+    runner, scripts, _ = _worker
+    handler = runner.handler
+    res = GdbBatchResult(scriptIndex, vectorIndex)
+    fnArgs = gdbBatchVectorToFnArgs(vector)
+    handler.reset(fnArgs)
+    coverage = handler.coverage
+    if coverage is not None:
+        coverage.reset()
+
+    t0 = perf_counter()
+    try:
+        runner.run(scripts[scriptIndex], res)
+    except Exception as e:
+        res.error = repr(e)
+    res.duration = perf_counter() - t0
+
+    res.outputs = [a if isinstance(a, list) else None for a in fnArgs]
+    if coverage is not None:
+        res.coverage = (coverage.lineHits[:], coverage.edgeHits[:])
+    return res
+
+
+def gdbBatchRun(irFile: str, scripts: List[GdbBatchScript], vectors: List[List[Optional[list]]],
+                jobs: Optional[int]=None, codelineOffset: int=LLVM_IR_SRC_CODELINE_OFFSET,
+                collectCoverage: bool=False) -> List[GdbBatchResult]:
+    """
+    Execute every script with every input vector.
+
+    :param jobs: number of worker processes, None for number of CPUs, 1 to run in this process
+    :returns: results in order of (script, vector)
+    """
+    tasks = [(si, vi, v) for si in range(len(scripts)) for vi, v in enumerate(vectors)]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(tasks)))
+    initArgs = (irFile, scripts, codelineOffset, collectCoverage)
+    if jobs == 1:
+        global _worker
+        _gdbBatchWorkerInit(*initArgs)
+        try:
+            return [_gdbBatchWorkerRun(*t) for t in tasks]
+        finally:
+            _worker = None
+
+    with ProcessPoolExecutor(jobs, initializer=_gdbBatchWorkerInit, initargs=initArgs) as pool:
+        futures = [pool.submit(_gdbBatchWorkerRun, *t) for t in tasks]
+        return [f.result() for f in futures]
+
+
+def createArgumentParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Run LLVM IR simulation with breakpoint/assertion scripts for many input vectors')
+    parser.add_argument('ir', help="LLVM IR file (.ll)")
+    parser.add_argument('--script', dest='script', action='append', default=[], help="breakpoint/assertion script")
+    parser.add_argument('--vectors', dest='vectors', required=True, help="JSON file with input vectors")
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None)
+    parser.add_argument('--codeline-offset', dest='codelineOffset', type=int, default=LLVM_IR_SRC_CODELINE_OFFSET)
+    parser.add_argument('--lcov', dest='lcov', help="write (merge) line and branch coverage to lcov tracefile")
+    return parser
+
+
+def main(argv: Optional[List[str]]=None):
+    args = createArgumentParser().parse_args(argv)
+    scripts = [GdbBatchScript.fromFile(s) for s in args.script]
+    if not scripts:
+        scripts.append(GdbBatchScript("<continue>", [(0, "continue", [])]))
+    with open(args.vectors) as f:
+        vectors = json.load(f)
+
+    t0 = perf_counter()
+    results = gdbBatchRun(args.ir, scripts, vectors, args.jobs, args.codelineOffset, args.lcov is not None)
+    duration = perf_counter() - t0
+
+    failed = 0
+    for res in results:
+        print(f"{scripts[res.scriptIndex].name:s} vector:{res.vectorIndex:d} {'OK' if res.ok else 'FAIL':s} "
+              f"instrs:{res.instrCnt:d} time:{res.duration * 1e3:.3f}ms outputs:{res.outputs}")
+        if not res.ok:
+            failed += 1
+            for msg in res.failures:
+                print("    ", msg)
+            if res.error is not None:
+                print("    ", res.error)
+    print(f"{len(results) - failed:d}/{len(results):d} passed in {duration:.3f}s")
+
+    if args.lcov is not None:
+        # only the control flow of the simulated function is needed to merge the counters from workers
+        llvm, M = llvmIrLoadModule(args.ir)
+        fn = llvmIrDefinedFunctions(M)[0]
+        instrCodeline = {r.instr: r.codeline for r in llvmIrIterRegs(args.codelineOffset, 0, fn, False)}
+        coverage = LlvmIrCoverage(fn, instrCodeline, args.codelineOffset)
+        for res in results:
+            coverage.merge(res.coverage)
+        coverage.writeLcovFile(args.lcov, args.ir)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+from array import array
+from copy import copy
+import os
+from pathlib import Path
+import time
+from typing import Dict, Tuple, List, IO, Any, Union
+from xml.sax.saxutils import quoteattr, escape
+
+from hwtHls.llvm.llvmIr import Function, BasicBlock, Instruction, ValueToBasicBlock
+
+
+class LlvmIrCoverage():
+    """
+    Cumulative line and branch (successor edge) coverage of LLVM IR function.
+    Counters are kept in flat arrays indexed by instruction/edge index so the update
+    during simulation is just an increment of an array item.
+
+    :note: Lines are the same codelines as used for GDB addresses (:see: llvmIrIterRegs).
+        Edge is identified by the codeline of the terminator instruction and the index of the successor.
+
+    :ivar codelineOffset: codeline of the first instruction
+    :ivar lineHits: execution counter for each codeline, indexed by codeline - codelineOffset
+        (label and empty lines between blocks have a counter which is never used)
+    :ivar codelines: list of codelines which correspond to some instruction
+    :ivar edgeIndex: dictionary mapping (terminator, successor block) to index in edge arrays
+    :ivar edgeCodeline: codeline of terminator for each edge
+    :ivar edgeBranchIndex: index of the successor in terminator for each edge
+    :ivar edgeHits: counter how many times the control flow passed this edge
+    """
+
+    def __init__(self, fn: Function, instrCodeline: Dict[Instruction, int], codelineOffset: int):
+        self.fnName = fn.getName().str()
+        self.codelineOffset = codelineOffset
+        self.codelines: List[int] = sorted(instrCodeline.values())
+        lastCodeline = self.codelines[-1] if self.codelines else codelineOffset
+        self.lineHits = array('Q', bytes(8 * (lastCodeline - codelineOffset + 1)))
+        self.edgeIndex: Dict[Tuple[Instruction, BasicBlock], int] = {}
+        self.edgeCodeline = array('L')
+        self.edgeBranchIndex = array('L')
+        for bb in fn:
+            bb: BasicBlock
+            term = None
+            for term in bb:
+                pass
+            if term is None:
+                continue
+            succIndex = 0
+            for op in term.iterOperandValues():
+                suc = ValueToBasicBlock(op)
+                if suc is None:
+                    continue
+                k = (term, suc)
+                if k in self.edgeIndex:
+                    # multiple switch cases with the same successor
+                    continue
+                self.edgeIndex[k] = len(self.edgeCodeline)
+                self.edgeCodeline.append(instrCodeline[term])
+                self.edgeBranchIndex.append(succIndex)
+                succIndex += 1
+
+        self.edgeHits = array('Q', bytes(8 * len(self.edgeCodeline)))
+
+    def reset(self):
+        for i in range(len(self.lineHits)):
+            self.lineHits[i] = 0
+        for i in range(len(self.edgeHits)):
+            self.edgeHits[i] = 0
+
+    def copy(self) -> "LlvmIrCoverage":
+        """
+        :returns: a copy with its own counters (the description of the function is shared)
+        """
+        c = copy(self)
+        c.lineHits = array('Q', self.lineHits)
+        c.edgeHits = array('Q', self.edgeHits)
+        return c
+
+    def markLine(self, codeline: int):
+        self.lineHits[codeline - self.codelineOffset] += 1
+
+    def markEdge(self, term: Instruction, suc: BasicBlock):
+        i = self.edgeIndex.get((term, suc), None)
+        if i is not None:
+            self.edgeHits[i] += 1
+
+    def merge(self, other: Union["LlvmIrCoverage", Tuple[array, array]]):
+        """
+        Add counters from other coverage of the same function (or from a tuple (lineHits, edgeHits)
+        which is used to transfer results between processes).
+        """
+        if isinstance(other, LlvmIrCoverage):
+            lineHits, edgeHits = other.lineHits, other.edgeHits
+        else:
+            lineHits, edgeHits = other
+        assert len(lineHits) == len(self.lineHits), ("Coverage of a different function", len(lineHits), len(self.lineHits))
+        assert len(edgeHits) == len(self.edgeHits), ("Coverage of a different function", len(edgeHits), len(self.edgeHits))
+        for i, v in enumerate(lineHits):
+            self.lineHits[i] += v
+        for i, v in enumerate(edgeHits):
+            self.edgeHits[i] += v
+
+    def mergeLcov(self, f: IO[Any], sourceFile: str):
+        """
+        Add counters from lcov tracefile (produced by :meth:`~.writeLcov` in a previous run).
+        Records for other source files and lines which do not exist in this function are ignored.
+        """
+        inRecord = False
+        edgeForLine: Dict[Tuple[int, int], int] = {
+            (line, br): i for i, (line, br) in enumerate(zip(self.edgeCodeline, self.edgeBranchIndex))
+        }
+        lineHits = self.lineHits
+        lineCnt = len(lineHits)
+        for line in f:
+            line = line.strip()
+            if line.startswith("SF:"):
+                inRecord = line[3:] == sourceFile
+            elif line == "end_of_record":
+                inRecord = False
+            elif not inRecord:
+                continue
+            elif line.startswith("DA:"):
+                codeline, cnt = line[3:].split(",")[:2]
+                i = int(codeline) - self.codelineOffset
+                if i >= 0 and i < lineCnt:
+                    lineHits[i] += int(cnt)
+            elif line.startswith("BRDA:"):
+                codeline, _, br, cnt = line[5:].split(",")
+                if cnt == "-":
+                    continue
+                i = edgeForLine.get((int(codeline), int(br)), None)
+                if i is not None:
+                    self.edgeHits[i] += int(cnt)
+
+    def _edgesPerCodeline(self) -> Dict[int, List[int]]:
+        res: Dict[int, List[int]] = {}
+        for i, codeline in enumerate(self.edgeCodeline):
+            res.setdefault(codeline, []).append(i)
+        return res
+
+    def writeLcov(self, f: IO[Any], sourceFile: str, testName: str=""):
+        """
+        Write coverage in lcov tracefile format (as produced by geninfo)
+        https://github.com/linux-test-project/lcov/blob/master/man/geninfo.1
+        """
+        lineHits = self.lineHits
+        codelineOffset = self.codelineOffset
+        f.write(f"TN:{testName:s}\n")
+        f.write(f"SF:{sourceFile:s}\n")
+        fnLine = self.codelines[0] if self.codelines else codelineOffset
+        fnHits = lineHits[fnLine - codelineOffset] if self.codelines else 0
+        f.write(f"FN:{fnLine:d},{self.fnName:s}\n")
+        f.write(f"FNDA:{fnHits:d},{self.fnName:s}\n")
+        f.write(f"FNF:1\nFNH:{1 if fnHits else 0:d}\n")
+        edgeHits = self.edgeHits
+        brFound = 0
+        brHit = 0
+        for codeline, edges in self._edgesPerCodeline().items():
+            if len(edges) < 2:
+                continue  # unconditional jump is not a branch
+            brFound += len(edges)
+            termHits = lineHits[codeline - codelineOffset]
+            for i in edges:
+                cnt = edgeHits[i]
+                if cnt:
+                    brHit += 1
+                f.write(f"BRDA:{codeline:d},0,{self.edgeBranchIndex[i]:d},{cnt if termHits else '-'}\n")
+        f.write(f"BRF:{brFound:d}\nBRH:{brHit:d}\n")
+        lineHit = 0
+        for codeline in self.codelines:
+            cnt = lineHits[codeline - codelineOffset]
+            if cnt:
+                lineHit += 1
+            f.write(f"DA:{codeline:d},{cnt:d}\n")
+        f.write(f"LF:{len(self.codelines):d}\nLH:{lineHit:d}\n")
+        f.write("end_of_record\n")
+
+    def writeLcovFile(self, path: Union[str, Path], sourceFile: str, testName: str="", merge: bool=True):
+        """
+        Write lcov tracefile, if merge is True and the file exists the counters from the file are added first.
+
+        :note: The counters from the file are added to a copy, the counters in this object are not modified.
+        """
+        cov = self
+        if merge and os.path.exists(path):
+            cov = self.copy()
+            with open(path) as f:
+                cov.mergeLcov(f, sourceFile)
+        with open(path, "w") as f:
+            cov.writeLcov(f, sourceFile, testName)
+
+    def writeCobertura(self, f: IO[Any], sourceFile: str):
+        """
+        Write coverage in Cobertura XML format
+        https://github.com/cobertura/web/blob/master/htdocs/xml/coverage-04.dtd
+        """
+        lineHits = self.lineHits
+        codelineOffset = self.codelineOffset
+        edgesPerCodeline = self._edgesPerCodeline()
+        linesValid = len(self.codelines)
+        linesCovered = sum(1 for codeline in self.codelines if lineHits[codeline - codelineOffset])
+        branchesValid = 0
+        branchesCovered = 0
+        lines = []
+        for codeline in self.codelines:
+            cnt = lineHits[codeline - codelineOffset]
+            edges = edgesPerCodeline.get(codeline, ())
+            if len(edges) > 1:
+                taken = sum(1 for i in edges if self.edgeHits[i])
+                branchesValid += len(edges)
+                branchesCovered += taken
+                lines.append(f'<line number="{codeline:d}" hits="{cnt:d}" branch="true" '
+                             f'condition-coverage="{taken * 100 // len(edges):d}% ({taken:d}/{len(edges):d})"/>')
+            else:
+                lines.append(f'<line number="{codeline:d}" hits="{cnt:d}" branch="false"/>')
+
+        lineRate = linesCovered / linesValid if linesValid else 1.0
+        branchRate = branchesCovered / branchesValid if branchesValid else 1.0
+        sourceDir = str(Path(sourceFile).parent)
+        fileName = Path(sourceFile).name
+        f.write('<?xml version="1.0" ?>\n')
+        f.write('<!DOCTYPE coverage SYSTEM "http://cobertura.sourceforge.net/xml/coverage-04.dtd">\n')
+        f.write(f'<coverage line-rate="{lineRate:.4f}" branch-rate="{branchRate:.4f}" lines-covered="{linesCovered:d}" '
+                f'lines-valid="{linesValid:d}" branches-covered="{branchesCovered:d}" branches-valid="{branchesValid:d}" '
+                f'complexity="0" version="0" timestamp="{int(time.time() * 1000):d}">\n')
+        f.write(f'<sources><source>{escape(sourceDir):s}</source></sources>\n')
+        f.write(f'<packages><package name="." line-rate="{lineRate:.4f}" branch-rate="{branchRate:.4f}" complexity="0"><classes>\n')
+        f.write(f'<class name={quoteattr(self.fnName)} filename={quoteattr(fileName)} '
+                f'line-rate="{lineRate:.4f}" branch-rate="{branchRate:.4f}" complexity="0">\n')
+        f.write(f'<methods/><lines>\n')
+        for line in lines:
+            f.write(line)
+            f.write('\n')
+        f.write('</lines></class></classes></package></packages></coverage>\n')
+
+    def getSummary(self) -> Tuple[int, int, int, int]:
+        """
+        :returns: tuple (lines hit, lines found, branches hit, branches found)
+        """
+        codelineOffset = self.codelineOffset
+        lineHit = sum(1 for codeline in self.codelines if self.lineHits[codeline - codelineOffset])
+        brFound = 0
+        brHit = 0
+        for edges in self._edgesPerCodeline().values():
+            if len(edges) > 1:
+                brFound += len(edges)
+                brHit += sum(1 for i in edges if self.edgeHits[i])
+        return (lineHit, len(self.codelines), brHit, brFound)
+
+    def __repr__(self):
+        lineHit, lineFound, brHit, brFound = self.getSummary()
+        return f"<{self.__class__.__name__:s} {self.fnName:s} lines:{lineHit:d}/{lineFound:d} branches:{brHit:d}/{brFound:d}>"
+
@@ -0,0 +1,286 @@
+from array import array
+import hashlib
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import Optional, List, Sequence, Generator, Iterable, Tuple, Union
+
+from hwtHlsGdb.gdbLlvmIrRegs import LlvmRegisterInfo, LlvmIrFunctionInfo
+
+trace = logging.getLogger("LlvmIrIndexCache:trace").debug
+
+# header: magic, version, byteorder of arrays, hash of IR, length of arrays, size of string section
+_INDEX_HEADER = struct.Struct("<8sHH32sII")
+_INDEX_MAGIC = b"HWTGDBIX"
+_MODULE_INDEX_MAGIC = b"HWTGDBMX"
+_INDEX_VERSION = 2
+_INDEX_BYTEORDER = 0 if sys.byteorder == "little" else 1
+
+
+def _indexToBytes(magic: bytes, irHash: bytes, arrays: Sequence[array], strings: Sequence[str]) -> Optional[bytes]:
+    """
+    :param arrays: arrays of the same length with 4B items
+    :returns: serialized index or None if it can not be serialized
+    """
+    if any("\0" in s for s in strings):
+        return None  # "\0" is used as a separator
+    stringsData = "\0".join(strings).encode("utf-8")
+    header = _INDEX_HEADER.pack(magic, _INDEX_VERSION, _INDEX_BYTEORDER, irHash,
+                                len(arrays[0]), len(stringsData))
+    return b"".join((header, *(a.tobytes() for a in arrays), stringsData))
+
+
+def _indexFromBuffer(buff: Sequence[int], magic: bytes, irHash: bytes, typecodes: str) -> Optional[Tuple[List[array], List[str]]]:
+    """
+    :returns: tuple (arrays, strings) or None if the buffer does not contain an index of this version for this IR
+    """
+    if len(buff) < _INDEX_HEADER.size:
+        return None
+    _magic, version, byteorder, _irHash, itemCnt, stringsSize = _INDEX_HEADER.unpack_from(buff, 0)
+    if _magic != magic or version != _INDEX_VERSION or byteorder != _INDEX_BYTEORDER or _irHash != irHash:
+        return None
+    offset = _INDEX_HEADER.size
+    arraysSize = itemCnt * 4
+    if len(buff) != offset + len(typecodes) * arraysSize + stringsSize:
+        return None
+
+    with memoryview(buff) as m:
+        arrays = []
+        for typecode in typecodes:
+            a = array(typecode)
+            a.frombytes(m[offset:offset + arraysSize])
+            arrays.append(a)
+            offset += arraysSize
+        strings = str(m[offset:offset + stringsSize], "utf-8").split("\0")
+    return arrays, strings
+
+
+def llvmIrIndexCacheDir() -> Optional[Path]:
+    """
+    :returns: directory of the index cache, None if the cache is disabled
+        (HWTHLSGDB_CACHE_DIR environment variable set to empty string)
+    """
+    d = os.environ.get("HWTHLSGDB_CACHE_DIR", None)
+    if d is None:
+        return Path.home() / ".cache" / "hwtHlsGdb"
+    elif not d:
+        return None
+    return Path(d)
+
+
+def llvmIrHash(irFile: str) -> bytes:
+    """
+    :returns: sha256 of the content of IR file
+    """
+    with open(irFile, "rb") as f:
+        return hashlib.file_digest(f, "sha256").digest()
+
+
+class LlvmIrIndex():
+    """
+    Register and line index of LLVM IR function (the result of :func:`hwtHlsGdb.gdbLlvmIrRegs.llvmIrIterRegs`)
+    in a compact form which can be stored in cache file and loaded without parsing the IR.
+
+    :note: Codelines and register indices are stored relative to codelineOffset and regIndexOffset
+        so the same index can be used with any offset.
+
+    :ivar fnName: name of the function
+    :ivar codelines: codeline - codelineOffset for each instruction
+    :ivar registerIndices: registerIndex - regIndexOffset for each instruction, -1 for instructions without register
+    :ivar bitWidths: bit width of the result for each instruction, 0 for instructions without register
+    :ivar names: names of registers (for instructions with register only)
+    :ivar dtypeNames: names of types of registers (for instructions with register only)
+    """
+
+    def __init__(self, fnName: str, codelines: array, registerIndices: array, bitWidths: array,
+                 names: List[str], dtypeNames: List[str]):
+        self.fnName = fnName
+        self.codelines = codelines
+        self.registerIndices = registerIndices
+        self.bitWidths = bitWidths
+        self.names = names
+        self.dtypeNames = dtypeNames
+
+    @classmethod
+    def fromRegs(cls, fnName: str, regs: Iterable[LlvmRegisterInfo], codelineOffset: int, regIndexOffset: int):
+        codelines = array('I')
+        registerIndices = array('i')
+        bitWidths = array('I')
+        names = []
+        dtypeNames = []
+        for r in regs:
+            codelines.append(r.codeline - codelineOffset)
+            if r.registerIndex is None:
+                registerIndices.append(-1)
+                bitWidths.append(0)
+            else:
+                registerIndices.append(r.registerIndex - regIndexOffset)
+                bitWidths.append(r.dtype.getBitWidth())
+                names.append(r.name)
+                dtypeNames.append(r.dtypeName)
+        return cls(fnName, codelines, registerIndices, bitWidths, names, dtypeNames)
+
+    def iterRegs(self, codelineOffset: int, regIndexOffset: int,
+                 instrs: Optional[Iterable["Instruction"]]=None) -> Generator[LlvmRegisterInfo, None, None]:
+        """
+        :param instrs: optional instructions of the function (in the same order as used for construction of this index),
+            if not specified the instr of :class:`LlvmRegisterInfo` is None
+        :note: The dtype of :class:`LlvmRegisterInfo` is not available, use :attr:`~.bitWidths` instead.
+        """
+        if instrs is None:
+            instrs = (None for _ in range(len(self.codelines)))
+        names = iter(self.names)
+        dtypeNames = iter(self.dtypeNames)
+        for codeline, regIndex, instr in zip(self.codelines, self.registerIndices, instrs):
+            if regIndex < 0:
+                yield LlvmRegisterInfo(codeline + codelineOffset, None, instr, None, None, None)
+            else:
+                yield LlvmRegisterInfo(codeline + codelineOffset, regIndex + regIndexOffset, instr, None,
+                                       next(names), next(dtypeNames))
+
+    def toBytes(self, irHash: bytes) -> Optional[bytes]:
+        """
+        :returns: serialized index or None if it can not be serialized
+        """
+        return _indexToBytes(_INDEX_MAGIC, irHash, (self.codelines, self.registerIndices, self.bitWidths),
+                             (self.fnName, *self.names, *self.dtypeNames))
+
+    @classmethod
+    def fromBuffer(cls, buff: Sequence[int], irHash: bytes) -> Optional["LlvmIrIndex"]:
+        """
+        :returns: deserialized index or None if the buffer does not contain an index of this version for this IR
+        """
+        res = _indexFromBuffer(buff, _INDEX_MAGIC, irHash, "IiI")
+        if res is None:
+            return None
+        (codelines, registerIndices, bitWidths), strings = res
+        regCnt = (len(strings) - 1) // 2
+        return cls(strings[0], codelines, registerIndices, bitWidths, strings[1:1 + regCnt], strings[1 + regCnt:])
+
+
+class LlvmIrModuleIndex():
+    """
+    Table of functions of LLVM IR module (:class:`hwtHlsGdb.gdbLlvmIrRegs.LlvmIrFunctionInfo`) in a compact form
+    which can be stored in cache file. The index of each function (:class:`~.LlvmIrIndex`) is stored in a separate file
+    when the function is indexed for the first time.
+
+    :ivar fnNames: names of functions
+    :ivar codelineOffsets: codeline of the first instruction of each function
+    :ivar regIndexOffsets: register index of the first register of each function
+    :ivar regCnts: number of registers of each function
+    """
+
+    def __init__(self, fnNames: List[str], codelineOffsets: array, regIndexOffsets: array, regCnts: array):
+        self.fnNames = fnNames
+        self.codelineOffsets = codelineOffsets
+        self.regIndexOffsets = regIndexOffsets
+        self.regCnts = regCnts
+
+    @classmethod
+    def fromFunctionInfos(cls, fnInfos: Iterable[LlvmIrFunctionInfo]):
+        fnNames = []
+        codelineOffsets = array('I')
+        regIndexOffsets = array('I')
+        regCnts = array('I')
+        for fi in fnInfos:
+            fnNames.append(fi.name)
+            codelineOffsets.append(fi.codelineOffset)
+            regIndexOffsets.append(fi.regIndexOffset)
+            regCnts.append(fi.regCnt)
+        return cls(fnNames, codelineOffsets, regIndexOffsets, regCnts)
+
+    def toFunctionInfos(self) -> List[LlvmIrFunctionInfo]:
+        return [LlvmIrFunctionInfo(*fi) for fi in zip(self.fnNames, self.codelineOffsets, self.regIndexOffsets, self.regCnts)]
+
+    def toBytes(self, irHash: bytes) -> Optional[bytes]:
+        if not self.fnNames:
+            return None  # empty string section can not be distinguished from a single empty name
+        return _indexToBytes(_MODULE_INDEX_MAGIC, irHash, (self.codelineOffsets, self.regIndexOffsets, self.regCnts),
+                             self.fnNames)
+
+    @classmethod
+    def fromBuffer(cls, buff: Sequence[int], irHash: bytes) -> Optional["LlvmIrModuleIndex"]:
+        res = _indexFromBuffer(buff, _MODULE_INDEX_MAGIC, irHash, "III")
+        if res is None:
+            return None
+        (codelineOffsets, regIndexOffsets, regCnts), fnNames = res
+        if len(fnNames) != len(codelineOffsets):
+            return None
+        return cls(fnNames, codelineOffsets, regIndexOffsets, regCnts)
+
+
+def _llvmIrIndexCacheFile(cacheDir: Path, irHash: bytes, fnIndex: Optional[int]) -> Path:
+    if fnIndex is None:
+        return cacheDir / f"{irHash.hex():s}.idx"
+    return cacheDir / f"{irHash.hex():s}.{fnIndex:d}.idx"
+
+
+def _llvmIrIndexCacheLoad(indexCls, irHash: bytes, fnIndex: Optional[int]):
+    cacheDir = llvmIrIndexCacheDir()
+    if cacheDir is None:
+        return None
+    fileName = _llvmIrIndexCacheFile(cacheDir, irHash, fnIndex)
+    try:
+        with open(fileName, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                index = indexCls.fromBuffer(m, irHash)
+    except (OSError, ValueError) as e:
+        trace("index cache miss %s: %r", fileName, e)
+        return None
+    trace("index cache %s %s", "hit" if index is not None else "invalid", fileName)
+    return index
+
+
+def _llvmIrIndexCacheStore(irHash: bytes, fnIndex: Optional[int], index: Union[LlvmIrIndex, LlvmIrModuleIndex]):
+    cacheDir = llvmIrIndexCacheDir()
+    if cacheDir is None:
+        return
+    data = index.toBytes(irHash)
+    if data is None:
+        return
+    fileName = _llvmIrIndexCacheFile(cacheDir, irHash, fnIndex)
+    tmpFileName = fileName.with_name(f"{fileName.name:s}.{os.getpid():d}.tmp")
+    try:
+        cacheDir.mkdir(parents=True, exist_ok=True)
+        with open(tmpFileName, "wb") as f:
+            f.write(data)
+        # atomic replace, concurrent readers see the old or the new file
+        os.replace(tmpFileName, fileName)
+    except OSError as e:
+        trace("index cache store failed %s: %r", fileName, e)
+
+
+def llvmIrModuleIndexLoad(irHash: bytes) -> Optional[LlvmIrModuleIndex]:
+    """
+    Load table of functions of IR with specified hash from cache.
+
+    :returns: the index or None if it is not in cache
+    """
+    return _llvmIrIndexCacheLoad(LlvmIrModuleIndex, irHash, None)
+
+
+def llvmIrModuleIndexStore(irHash: bytes, index: LlvmIrModuleIndex):
+    """
+    Store table of functions to cache, errors are ignored because the cache is optional.
+    """
+    _llvmIrIndexCacheStore(irHash, None, index)
+
+
+def llvmIrIndexLoad(irHash: bytes, fnIndex: int=0) -> Optional[LlvmIrIndex]:
+    """
+    Load index of a function of IR with specified hash from cache.
+
+    :param fnIndex: index of the function in :class:`~.LlvmIrModuleIndex`
+    :returns: the index or None if it is not in cache
+    """
+    return _llvmIrIndexCacheLoad(LlvmIrIndex, irHash, fnIndex)
+
+
+def llvmIrIndexStore(irHash: bytes, index: LlvmIrIndex, fnIndex: int=0):
+    """
+    Store index of a function to cache, errors are ignored because the cache is optional.
+    """
+    _llvmIrIndexCacheStore(irHash, fnIndex, index)
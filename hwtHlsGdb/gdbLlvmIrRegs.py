@@ -0,0 +1,182 @@
+"""
+Indexing of LLVM IR registers and lines shared by the simulator (GdbCmdHandlerLllvmIr) and the GDB/MI frontend.
+
+:note: hwtHls is imported only in functions which need it, so the GDB/MI frontend starts without loading LLVM
+    (and it does not need to load it at all if the index is found in cache).
+"""
+from array import array
+import ast
+import re
+from typing import Optional, Tuple, Set, Dict, List, Sequence
+
+RE_ID = re.compile('[^0-9a-zA-Z_]+')
+# "define" line of a function with the name of the function (quoted or plain)
+RE_DEFINE = re.compile(r'^define\b[^@]*@(?:"((?:[^"\\]|\\.)*)"|([-a-zA-Z$._0-9]+))\(')
+RE_NAME_ESCAPE = re.compile(r'\\([0-9a-fA-F]{2})')
+LLVM_IR_SRC_CODELINE_OFFSET = 6
+
+
+class LlvmRegisterInfo():
+
+    def __init__(self, codeline: int, registerIndex: Optional[int], instr: Optional["Instruction"], dtype: Optional["IntegerType"], name:Optional[str], dtypeName: Optional[str]):
+        self.codeline = codeline
+        self.registerIndex = registerIndex
+        self.instr = instr
+        self.dtype = dtype
+        self.name = name
+        self.dtypeName = dtypeName
+
+
+class LlvmIrFunctionInfo():
+    """
+    Position of a function in the IR file and in the register file of the target.
+    It is resolved for all functions of the module upfront, the instructions of the function
+    are indexed (:func:`~.llvmIrIterRegs`) only on the first reference to the function.
+
+    :ivar name: name of the function
+    :ivar codelineOffset: codeline of the first instruction of the function
+    :ivar regIndexOffset: register index of the first register of the function
+    :ivar regCnt: number of registers of the function (instructions with integer type)
+    :ivar fn: the function object if the module was parsed
+    :ivar bitWidths: bit width of each register if the module was parsed
+    """
+
+    def __init__(self, name: str, codelineOffset: int, regIndexOffset: int, regCnt: int,
+                 fn: Optional["Function"]=None, bitWidths: Optional[array]=None):
+        self.name = name
+        self.codelineOffset = codelineOffset
+        self.regIndexOffset = regIndexOffset
+        self.regCnt = regCnt
+        self.fn = fn
+        self.bitWidths = bitWidths
+
+    def __repr__(self):
+        return (f"<{self.__class__.__name__:s} {self.name:s} codeline:{self.codelineOffset:d} "
+                f"regs:{self.regIndexOffset:d}+{self.regCnt:d}>")
+
+
+def llvmIrDefinedFunctions(M: "Module") -> List["Function"]:
+    """
+    :returns: functions of the module which have a body (declarations are skipped) in order of the module
+    """
+    return [fn for fn in M if next(iter(fn), None) is not None]
+
+
+def llvmIrScanFunctionCodelines(irFile: str) -> Dict[str, int]:
+    """
+    Find functions in the text of the IR file without parsing it.
+
+    :returns: dictionary function name -> codeline of the first instruction
+    :note: The first instruction is 2 lines after the "define" line (the label of the entry block is in between),
+        for the first function this corresponds to :data:`~.LLVM_IR_SRC_CODELINE_OFFSET`.
+    """
+    codelines = {}
+    with open(irFile) as f:
+        for lineNo, line in enumerate(f, 1):
+            if not line.startswith("define"):
+                continue
+            m = RE_DEFINE.match(line)
+            if m is None:
+                continue
+            quotedName, name = m.groups()
+            if name is None:
+                name = RE_NAME_ESCAPE.sub(lambda e: chr(int(e.group(1), 16)), quotedName)
+            codelines[name] = lineNo + 2
+    return codelines
+
+
+def llvmIrFunctionInfos(fns: Sequence["Function"], codelineOffset: int, regIndexOffset: int,
+                        irFile: Optional[str]=None) -> List[LlvmIrFunctionInfo]:
+    """
+    Resolve the position of all functions, only the types of instructions are checked,
+    the instructions are not printed and named as in :func:`~.llvmIrIterRegs`.
+
+    :param fns: functions with a body (:see: :func:`~.llvmIrDefinedFunctions`) in order of the module
+    :param codelineOffset: codeline of the first instruction of the first function
+    :param irFile: the IR file from which fns were parsed, if specified the codelines of functions are taken from it
+        (:see: :func:`~.llvmIrScanFunctionCodelines`, shifted so the first function starts at codelineOffset),
+        otherwise the functions are expected to follow each other without anything in between
+    """
+    from hwtHls.llvm.llvmIr import TypeToIntegerType
+    codelines = {} if irFile is None else llvmIrScanFunctionCodelines(irFile)
+    codelineShift = None
+    fnInfos = []
+    for fn in fns:
+        name = fn.getName().str()
+        codeline = codelines.get(name, None)
+        if codeline is not None:
+            if codelineShift is None:
+                codelineShift = codelineOffset - codeline
+            codelineOffset = codeline + codelineShift
+        instrCnt = 0
+        bbCnt = 0
+        bitWidths = array('I')
+        for bb in fn:
+            bbCnt += 1
+            for instr in bb:
+                instrCnt += 1
+                t = TypeToIntegerType(instr.getType())
+                if t is not None:
+                    bitWidths.append(t.getBitWidth())
+        fnInfos.append(LlvmIrFunctionInfo(name, codelineOffset, regIndexOffset, len(bitWidths), fn, bitWidths))
+        # an empty line and a label between blocks, "}", an empty line, "define" and the label of the entry block
+        codelineOffset += instrCnt + 2 * bbCnt + 2
+        regIndexOffset += len(bitWidths)
+    return fnInfos
+
+
+def llvmIrIterRegs(codelineOffset: int, regIndexOffset: int, fn: "Function", sanitizeNames: bool):
+    from hwtHls.llvm.llvmIr import TypeToIntegerType
+    seenNames: Set[str] = set()
+    for bb in fn:
+        for instr in bb:
+            t = TypeToIntegerType(instr.getType())
+            if t is None:
+                yield LlvmRegisterInfo(codelineOffset, None, instr, None, None, None)
+                codelineOffset += 1
+                continue
+
+            name = instr.printAsOperand()
+            dtypeName, name = name.split(' ', 1)
+            name = name.strip()
+            # if name.startswith("label "):
+            #    name = name[len("label "):]
+            if name.startswith("%"):
+                name = name[1:]
+            if name.startswith('"') and name.endswith('"'):
+                name = ast.literal_eval(name)
+
+            assert name, instr
+            _name = name
+            if sanitizeNames:
+                _name = name = RE_ID.sub("_", name)
+
+            nameI = 1
+            while name in seenNames:
+                name = f"{_name}_{nameI}"
+                nameI += 1
+            seenNames.add(name)
+
+            yield LlvmRegisterInfo(codelineOffset, regIndexOffset, instr, t, name, dtypeName)
+            codelineOffset += 1
+            regIndexOffset += 1
+
+        codelineOffset += 2
+
+
+def llvmIrLoadModule(irFile: str) -> Tuple["LlvmCompilationBundle", "Module"]:
+    """
+    Parse LLVM IR file.
+
+    :note: LlvmCompilationBundle is returned because it owns the LLVMContext of the module
+        and must be kept alive as long as the module is used.
+    """
+    from hwtHls.llvm.llvmIr import LlvmCompilationBundle, SMDiagnostic, parseIR
+    llvm = LlvmCompilationBundle(irFile, [])
+    Err = SMDiagnostic()
+    with open(irFile) as f:
+        irStr = f.read()
+    M = parseIR(irStr, "test", Err, llvm.ctx)
+    if M is None:
+        raise AssertionError(Err.str("test", True, True))
+    return llvm, M
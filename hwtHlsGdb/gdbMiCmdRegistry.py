@@ -0,0 +1,159 @@
+from time import perf_counter
+from typing import Dict, Callable, IO, Any, List, Tuple, Union, Optional
+
+from hwtHlsGdb.gdbMiMessages import GdbMiCmd
+
+
+class GdbMiOption():
+    """
+    Declarative description of an option of GDB/MI command.
+
+    :ivar name: name of the option including dashes (e.g. "--thread", "-t")
+    :ivar hasValue: if True the option is followed by a value, else it is a flag
+    """
+
+    def __init__(self, name: str, hasValue: bool=False):
+        self.name = name
+        self.hasValue = hasValue
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.name:s}{' <value>' if self.hasValue else ''}>"
+
+
+# options which may be used with any command
+# https://sourceware.org/gdb/onlinedocs/gdb/Context-management.html
+GDB_MI_COMMON_OPTIONS: Dict[str, GdbMiOption] = {o.name: o for o in (
+    GdbMiOption("--thread", True),
+    GdbMiOption("--frame", True),
+    GdbMiOption("--thread-group", True),
+    GdbMiOption("--language", True),
+)}
+
+GdbMiCmdOpts = Dict[str, Union[str, bool]]
+# handler(cmd, options, positional args, output, state) -> True if the command was processed
+GdbMiCmdHandlerFn = Callable[[GdbMiCmd, GdbMiCmdOpts, List[str], IO[Any], "GdbInterpretState"], bool]
+
+
+class GdbMiCmdHandler():
+    """
+    Registered handler of a single GDB/MI command with the statistics of its execution.
+
+    :ivar options: dictionary of command specific options
+    :ivar callCnt: number of calls
+    :ivar totalTime: total time spent in handler in seconds
+    :ivar maxTime: max time of a single call in seconds
+    """
+
+    def __init__(self, name: str, fn: GdbMiCmdHandlerFn, options: Tuple[GdbMiOption, ...]):
+        self.name = name
+        self.fn = fn
+        self.options: Dict[str, GdbMiOption] = {o.name: o for o in options}
+        self.callCnt = 0
+        self.totalTime = 0.0
+        self.maxTime = 0.0
+
+    def parseArgs(self, args: List[str]) -> Optional[Tuple[GdbMiCmdOpts, List[str]]]:
+        """
+        Split arguments to options and positional arguments.
+        Options are expected before positional arguments, "--" ends options explicitly.
+
+        :returns: tuple (options, positional arguments) or None if the value of some option is missing
+        """
+        opts: GdbMiCmdOpts = {}
+        options = self.options
+        i = 0
+        argCnt = len(args)
+        while i < argCnt:
+            a = args[i]
+            if a == "--":
+                i += 1
+                break
+            o = options.get(a, None)
+            if o is None:
+                o = GDB_MI_COMMON_OPTIONS.get(a, None)
+                if o is None:
+                    break
+            if o.hasValue:
+                if i + 1 >= argCnt:
+                    return None
+                opts[a] = args[i + 1]
+                i += 2
+            else:
+                opts[a] = True
+                i += 1
+
+        return opts, args[i:]
+
+    def __call__(self, cmd: GdbMiCmd, w: IO[Any], state: "GdbInterpretState") -> bool:
+        parsed = self.parseArgs(cmd.args)
+        if parsed is None:
+            return False  # answered by ^error as any other malformed command
+        opts, args = parsed
+        t0 = perf_counter()
+        try:
+            return self.fn(cmd, opts, args, w, state)
+        finally:
+            t = perf_counter() - t0
+            self.callCnt += 1
+            self.totalTime += t
+            if t > self.maxTime:
+                self.maxTime = t
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.name:s}>"
+
+
+class GdbMiCmdRegistry():
+    """
+    Dictionary mapping GDB/MI command names to handlers.
+    The handlers are registered using :meth:`~.register` decorator, any module can add new commands.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, GdbMiCmdHandler] = {}
+
+    def register(self, names: Union[str, Tuple[str, ...]], *options: GdbMiOption):
+        """
+        Decorator which registers the function as a handler of GDB/MI command(s)
+
+        .. code-block:: python
+
+            @GDB_MI_COMMANDS.register("break-insert", GdbMiOption("-t"), GdbMiOption("-c", True))
+            def gdbLlvmIrCmdBreakInsert(cmd, opts, args, w, state):
+                ...
+        """
+        if isinstance(names, str):
+            names = (names,)
+
+        def _register(fn: GdbMiCmdHandlerFn):
+            for name in names:
+                assert name not in self.handlers, ("Command already registered", name, self.handlers[name])
+                self.handlers[name] = GdbMiCmdHandler(name, fn, options)
+            return fn
+
+        return _register
+
+    def get(self, name: str) -> Optional[GdbMiCmdHandler]:
+        return self.handlers.get(name, None)
+
+    def dispatch(self, cmd: GdbMiCmd, w: IO[Any], state: "GdbInterpretState") -> bool:
+        """
+        :returns: True if the command was processed, False if there is no handler or the handler
+            does not support the arguments
+        """
+        h = self.handlers.get(cmd.name, None)
+        if h is None:
+            return False
+        return h(cmd, w, state)
+
+    def iterStats(self):
+        """
+        :returns: generator of tuples (name, callCnt, totalTime, maxTime) for called commands
+            sorted by total time
+        """
+        handlers = sorted((h for h in self.handlers.values() if h.callCnt), key=lambda h: h.totalTime, reverse=True)
+        for h in handlers:
+            yield (h.name, h.callCnt, h.totalTime, h.maxTime)
+
+
+GDB_MI_COMMANDS = GdbMiCmdRegistry()
@@ -1,11 +1,14 @@
+from functools import lru_cache
+import gzip
 import os
 from pathlib import Path
 import re
 import sys
+from queue import SimpleQueue
+from threading import Thread
 import traceback
-from typing import Optional, List, Tuple, IO, Any, Deque
+from typing import Optional, List, Tuple, IO, Any, Deque, Dict, Callable, Sequence
 
-from hwtHls.llvm.llvmIr import LlvmCompilationBundle
 from collections import deque
 
 NL = '\r\n'
@@ -35,18 +38,31 @@ NL = '\r\n'
 #
 #
 class TeeedFile():
-    RE_LINE = '\n'
+    """
+    File wrapper which copies all data also to dupFile (debug transcript).
+    The output is collected in a buffer and written to mainFile by a single write in :meth:`~.flush`.
+    The input is read in bulk by :meth:`~.readLines` which returns all complete lines at once.
+
+    :ivar inBuff: incomplete line from the last read
+    :ivar lines: complete lines which were not consumed by :meth:`~.readline` yet
+    """
+    READ_SIZE = 64 * 1024
 
     def __init__(self, mainFile: IO[Any], dupFile: IO[Any]):
         self.mainFile = mainFile
         self.dupFile = dupFile
-        self.buff: Deque[str] = deque()
+        self.inBuff = bytearray()
+        self.lines: Deque[str] = deque()
+        self.outBuff: List[str] = []
+        self.eof = False
 
     def __enter__(self):
         self.mainFile = self.mainFile.__enter__()
         return self
 
     def __exit__(self, t, value, traceback):
+        if self.outBuff and not self.mainFile.closed:
+            self.flush()
         self.mainFile.__exit__(t, value, traceback)
 
     @property
@@ -56,40 +72,121 @@ class TeeedFile():
     def fileno(self):
         return self.mainFile.fileno()
 
-    def hasLineAvailable(self):
-        return len(self.buff) > 1  # "\n".split('\n') == ['', ''] so if there was line there must be at least 2 items
-
-    def readline(self):
-        # use os.read directly to avoid
-        buff = self.buff
-        if len(buff) > 1:
-            d = self.buff.popleft() + '\n'
+    def readLines(self) -> List[str]:
+        """
+        Read available data (a single os.read, blocks if there is nothing to read)
+        and return all complete lines including the "\\n".
+        On end of file the incomplete last line is returned as well.
+        """
+        # use os.read directly to avoid buffering of file object which would hide the data from select
+        d = os.read(self.mainFile.fileno(), self.READ_SIZE)
+        buff = self.inBuff
+        if d:
+            buff += d
+            end = buff.rfind(b'\n') + 1
+            if end == 0:
+                return []
         else:
-            d = os.read(self.mainFile.fileno(), 1024).decode()
-            if buff:
-                last = buff.pop()
-                d = last + d
-            buff.extend(d.split('\n'))
-            if len(buff) > 1:
-                d = buff.popleft() + '\n'
-            else:
-                d = ""
+            self.eof = True
+            end = len(buff)
+            if end == 0:
+                return []
+
+        text = buff[:end].decode()
+        del buff[:end]
+        self.dupFile.write(text)
+        lines = text.split('\n')
+        last = lines.pop()
+        lines = [l + '\n' for l in lines]
+        if last:
+            lines.append(last)  # incomplete line at the end of file
+        return lines
 
-        self.dupFile.write(d)
-        return d
+    def readline(self):
+        lines = self.lines
+        while not lines and not self.eof:
+            lines.extend(self.readLines())
+        if lines:
+            return lines.popleft()
+        return ""
 
     def write(self, d):
         self.dupFile.write(d)
-        self.mainFile.write(d)
+        self.outBuff.append(d)
 
     def flush(self):
-        self.dupFile.flush()
-        self.mainFile.flush()
+        outBuff = self.outBuff
+        if not outBuff:
+            return
+        data = "".join(outBuff).encode()
+        outBuff.clear()
+        mainFile = self.mainFile
+        mainFile.flush()  # in the case something was written to mainFile directly
+        fd = mainFile.fileno()
+        while data:
+            data = data[os.write(fd, data):]
 
     def __repr__(self):
         return f"<{self.__class__.__name__:s} {self.mainFile} {self.dupFile}>"
 
 
+class GdbMiTranscriptWriter():
+    """
+    Debug transcript file which is written by a background thread so the MI loop does not wait for the disk.
+    If the file name ends with ".gz" the transcript is compressed.
+
+    :note: :meth:`~.flush` does not block, the thread flushes the file when there is nothing more to write.
+    """
+
+    def __init__(self, fileName: str, compress: Optional[bool]=None):
+        if compress is None:
+            compress = fileName.endswith(".gz")
+        self.compress = compress
+        self.file = gzip.open(fileName, "wt") if compress else open(fileName, "w")
+        self._queue: SimpleQueue[Optional[str]] = SimpleQueue()
+        self._thread = Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, value, traceback):
+        self.close()
+
+    def _run(self):
+        q = self._queue
+        f = self.file
+        while True:
+            buff = [q.get()]
+            while not q.empty():
+                buff.append(q.get_nowait())
+            try:
+                end = buff.index(None)
+            except ValueError:
+                end = None
+            f.write("".join(buff[:end]))
+            if end is not None:
+                return
+            if not self.compress and q.empty():
+                # the flush of compressed stream would degrade the compression
+                f.flush()
+
+    def write(self, d: str):
+        self._queue.put(d)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self.file.close()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.file}>"
+
+
 class GdbMiCmd():
 
     def __init__(self, token: Optional[int], name: str, params: List[Tuple[str, List[str]]], args: List[str]):
@@ -143,6 +240,24 @@ def gdbMiEscapeStrChar(c: str, quoter: Optional[str], sevenbit_strings:bool):
         yield c
 
 
+def _gdbMiEscapeTable(sevenbit_strings: bool) -> Dict[int, str]:
+    """
+    Translation table for str.translate generated from :func:`~.gdbMiEscapeStrChar`
+    """
+    table = {}
+    for i in range(0x100):
+        c = chr(i)
+        esc = ''.join(gdbMiEscapeStrChar(c, '"', sevenbit_strings))
+        if esc != c:
+            table[i] = esc
+    return table
+
+
+_GDB_MI_ESCAPE_TABLE_7BIT = _gdbMiEscapeTable(True)
+_GDB_MI_ESCAPE_TABLE_8BIT = _gdbMiEscapeTable(False)
+
+
+@lru_cache(maxsize=4096)
 def gdbMiEscapeStr(text: str, sevenbit_strings:bool=True):
     """
     MI-mode escapes are similar to standard Python escapes but:
@@ -156,40 +271,105 @@ def gdbMiEscapeStr(text: str, sevenbit_strings:bool=True):
     :param sevenbit_strings:True means that strings with character values >0x7F should be printed
        as octal escapes.  False means just print the value (e.g. it's an
        international character, and the terminal or window can cope.)
+    :note: The result is cached because the same strings (function name, IR file path, register names)
+        are escaped in every frame/breakpoint/variable message.
     """
-    buff = []
-    for c in text:
-        buff.extend(gdbMiEscapeStrChar(c, '"', sevenbit_strings))
-    _text = ''.join(buff)
-    return f'"{_text:s}"'
+    if sevenbit_strings:
+        if not text.isascii():
+            # non ASCII characters are escaped as octal escapes of its UTF-8 bytes
+            text = text.encode("utf-8").decode("latin-1")
+        table = _GDB_MI_ESCAPE_TABLE_7BIT
+    else:
+        table = _GDB_MI_ESCAPE_TABLE_8BIT
+    return f'"{text.translate(table):s}"'
+
+
+_GDB_MI_C_STR_ESCAPES = {
+    'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'b': '\b', 'v': '\v',
+    'a': '\a', 'e': '\033', '"': '"', '\\': '\\', "'": "'", '?': '?',
+}
+_RE_GDB_MI_C_STR_ESCAPE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2})|(.))', re.DOTALL)
 
 
-def parseGdbCmd(gdbCmdStr: str):
-    m = re.match('^(\d*)(-?)(.+)\n', gdbCmdStr)  # gdb/mi cmd
-    if m is None:
+def _gdbMiCStrEscapeReplace(m: re.Match):
+    octal, hexa, c = m.groups()
+    if octal is not None:
+        return chr(int(octal, 8))
+    elif hexa is not None:
+        return chr(int(hexa, 16))
+    return _GDB_MI_C_STR_ESCAPES.get(c, c)
+
+
+def gdbMiParseCStr(text: str):
+    """
+    Inverse of :func:`~.gdbMiEscapeStr`, decode C-string including the quotes.
+    """
+    assert len(text) >= 2 and text[0] == '"' and text[-1] == '"', text
+    text = text[1:-1]
+    if '\\' not in text:
+        return text
+    isAscii = text.isascii()
+    if not isAscii:
+        # unescaped non ASCII characters are converted to its UTF-8 bytes as well
+        text = text.encode("utf-8").decode("latin-1")
+    # numeric escapes are bytes of UTF-8 encoded string, the result contains each byte as a single character
+    text = _RE_GDB_MI_C_STR_ESCAPE.sub(_gdbMiCStrEscapeReplace, text)
+    if isAscii and text.isascii():
+        return text
+    try:
+        return text.encode("latin-1").decode("utf-8")
+    except UnicodeDecodeError:
+        return text  # not UTF-8, keep each byte as a character
+
+
+# token, "-" for MI command, the rest of the command
+_RE_GDB_MI_CMD = re.compile(r'[ \t]*(\d*)(-?)(.*)', re.DOTALL)
+# C-string or a sequence of non-blank characters
+_RE_GDB_MI_ARG = re.compile(r'("(?:[^"\\]|\\.)*")|([^ \t"]+)', re.DOTALL)
+
+
+@lru_cache(maxsize=1024)
+def _parseGdbCmdBody(body: str) -> Optional[Tuple[str, Tuple[str, ...], Tuple[str, ...]]]:
+    """
+    Tokenize the command without token, the result is cached as IDEs tend to send the same commands repeatedly.
+
+    :returns: tuple (name, params, args) or None if the body is empty
+    """
+    args = [gdbMiParseCStr(s) if s else word
+            for s, word in _RE_GDB_MI_ARG.findall(body)]
+    if not args:
         return None
-    if m.group(1):
-        token = int(m.group(1))
-    else:
-        token = None
-
-    cmd = None
-    args = []
-    # id or string with escapes
-    for gId, gStr, _  in re.findall(r'([a-zA-Z0-9/_\-\*\.:]+)|("[^"\\]*(\\.[^"\\]*)*")', m.group(3)):
-        if cmd is None:
-            cmd = gId
-        elif gId:
-            assert cmd is not None, gdbCmdStr
-            args.append(gId)
-        else:
-            args.append(gStr)
+    name, *params = args[0].split(",")
+    params = tuple((p, "") if "=" not in p else tuple(p.split("=", 1)) for p in params)
+    return (name, params, tuple(args[1:]))
+
+
+def parseGdbCmd(gdbCmdStr: str, token: Optional[int]=None) -> Optional[GdbMiCmd]:
+    """
+    Parse GDB/MI or CLI command
+    https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Input-Syntax.html
 
-    params = cmd.split(",")  # todo
-    cmd = params[0]
-    params = params[1:]
+    .. code-block:: text
+
+        [token] "-" operation ( " " option )* [ " --" ] ( " " parameter )*
+        [token] cli-command
+
+    Parameters are either sequences of non-blank characters or C-strings, C-strings are decoded
+    (the quotes are removed). Options are not separated from parameters, :see: :class:`~.GdbMiCmdRegistry`.
+
+    :param token: token used if the command does not specify its own (used for nested commands of interpreter-exec)
+    :returns: parsed command or None if the line is empty
+    """
+    m = _RE_GDB_MI_CMD.match(gdbCmdStr.rstrip("\r\n"))
+    _token, _, body = m.groups()
+    if _token:
+        token = int(_token)
 
-    return GdbMiCmd(token, cmd, params, args)
+    parsed = _parseGdbCmdBody(body)
+    if parsed is None:
+        return None
+    name, params, args = parsed
+    return GdbMiCmd(token, name, list(params), list(args))
 
 
 def gdbCmdResRunning(token: Optional[int], args:List[Tuple[str, List[str]]]):
@@ -238,7 +418,6 @@ def sendInterruptRunning(w: IO[Any], dbgFile: IO[Any], args: Tuple):
         dbgFile.write("<-: ")
     w.write(resp)
     w.write(NL)
-    w.flush()
 
 
 def _gdbCmdFormatArgs(args:List[Tuple[str, List[str]]]):
@@ -254,33 +433,114 @@ def gdbCmdResDone(token: Optional[int], args:List[Tuple[str, List[str]]]):
     return ",".join(parts)
 
 
-def gdbMsgFormatFrame(codeline: int, llvm: Optional[LlvmCompilationBundle], exeName: Optional[str]):
-    return (f'{{level="0",addr="0x{codeline*8:016x}",func="{llvm.main.getName().str() if llvm else "invalid":s}",'
-            f'file="{Path(exeName).name if exeName else "invalid":s}",fullname="{exeName if exeName else "invalid":s}",line="{codeline:d}",'
-            f'arch="i386:x86-64"}}')
-
-
-def gdbMsgFormatStack(codeline: int, llvm: LlvmCompilationBundle, exeName: str):
-    return (f'[frame={gdbMsgFormatFrame(codeline, llvm, exeName):s}]')
-
-
-def gdbMsgFormatBreakpoint(llvm: LlvmCompilationBundle, exeName: str, codeline:int, number:int, addr:int):
-    return (
-        f'{{number="{number:d}",type="breakpoint",disp="keep",enabled="y",addr="0x{addr:x}",'
-        f'func="{llvm.main.getName().str():s}",file="{Path(exeName).name:s}",fullname="{exeName:s}",line="{codeline:d}",'
-        'thread-groups=["i1"],times="0"}'
-    )
-
-
-def gdbMsgFormatStopped(codeline: int, llvm: LlvmCompilationBundle, exeName: str):
-#     https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Async-Records.html#GDB_002fMI-Async-Records
-    # https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Program-Execution.html
-    # return f'*stopped,reason="end-stepping-range",thread-id="1",frame={{file="{Path(exeName).name:s}",fullname="{exeName:s}",line="{codeline:d}",arch="i386:x86_64"}}'
-    return f'*stopped,reason="end-stepping-range",frame={gdbMsgFormatFrame(codeline, llvm, exeName)},thread-id="1",stopped-threads="all",core="0"'
-
+class GdbMiMsgFormatter():
+    """
+    Formatter of frame, breakpoint and stop records for a debugged file.
+    The function, file and fullname fragments are rendered once per function
+    and frames are cached per codeline, the formatting of stop records during stepping is just a dictionary lookup.
+
+    :ivar func: escaped name of the main function
+    :ivar location: func, file and fullname fields of frame/breakpoint record for the main function
+    :ivar fnNameByCodeline: optional function which resolves the name of function which contains the codeline
+        (for modules with multiple functions), if it returns None the main function is used
+    :ivar locationByFn: dictionary function name -> location
+    :ivar frameCache: dictionary codeline -> rendered frame
+    """
 
-def gdbMsgFormatStoppedByInterrupt(codeline: int, llvm: LlvmCompilationBundle, exeName: str):
-    return f'*stopped,signal-name="SIGINT",signal-meaning="Interrupt",frame={gdbMsgFormatFrame(codeline, llvm, exeName)},thread-id="1",stopped-threads="all",core="0"'
+    def __init__(self, fnName: Optional[str], exeName: Optional[str],
+                 fnNameByCodeline: Optional[Callable[[int], Optional[str]]]=None):
+        func = gdbMiEscapeStr(fnName if fnName else "invalid")
+        file = gdbMiEscapeStr(Path(exeName).name if exeName else "invalid")
+        fullname = gdbMiEscapeStr(exeName if exeName else "invalid")
+        self.func = func
+        self._fileLocation = f'file={file:s},fullname={fullname:s}'
+        self.location = f'func={func:s},{self._fileLocation:s}'
+        self.fnNameByCodeline = fnNameByCodeline
+        self.locationByFn: Dict[str, str] = {}
+        self.frameCache: Dict[int, str] = {}
+
+    def getLocation(self, codeline: int) -> str:
+        """
+        :returns: func, file and fullname fields for the function which contains the codeline
+        """
+        if self.fnNameByCodeline is None:
+            return self.location
+        fnName = self.fnNameByCodeline(codeline)
+        if fnName is None:
+            return self.location
+        location = self.locationByFn.get(fnName, None)
+        if location is None:
+            location = self.locationByFn[fnName] = f'func={gdbMiEscapeStr(fnName):s},{self._fileLocation:s}'
+        return location
+
+    def formatFrame(self, codeline: int, level: int=0):
+        if level != 0:
+            # only the current frame is cached because it is reported on every stop
+            return (f'{{level="{level:d}",addr="0x{codeline*8:016x}",{self.getLocation(codeline):s},line="{codeline:d}",'
+                    'arch="i386:x86-64"}')
+        frame = self.frameCache.get(codeline, None)
+        if frame is None:
+            frame = (f'{{level="0",addr="0x{codeline*8:016x}",{self.getLocation(codeline):s},line="{codeline:d}",'
+                     'arch="i386:x86-64"}')
+            self.frameCache[codeline] = frame
+        return frame
+
+    def formatStack(self, codeline: int):
+        return f'[frame={self.formatFrame(codeline):s}]'
+
+    def formatStackFrames(self, codelines: Sequence[int], firstLevel: int=0):
+        """
+        :param codelines: codelines of frames starting with the frame on firstLevel
+        """
+        frames = ",".join(f'frame={self.formatFrame(codeline, level):s}'
+                          for level, codeline in enumerate(codelines, firstLevel))
+        return f'[{frames:s}]'
+
+    def formatBreakpoint(self, codeline:int, number:int, addr:int, temporary: bool=False):
+        """
+        :param temporary: if True the breakpoint is deleted once hit (break-insert -t)
+        """
+        disp = "del" if temporary else "keep"
+        return (
+            f'{{number="{number:d}",type="breakpoint",disp="{disp:s}",enabled="y",addr="0x{addr:x}",'
+            f'{self.getLocation(codeline):s},line="{codeline:d}",'
+            'thread-groups=["i1"],times="0"}'
+        )
+
+    def formatStopped(self, codeline: int):
+        # https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Async-Records.html#GDB_002fMI-Async-Records
+        # https://sourceware.org/gdb/onlinedocs/gdb/GDB_002fMI-Program-Execution.html
+        return f'*stopped,reason="end-stepping-range",frame={self.formatFrame(codeline):s},thread-id="1",stopped-threads="all",core="0"'
+
+    def formatStoppedFunctionFinished(self, codeline: int):
+        return f'*stopped,reason="function-finished",frame={self.formatFrame(codeline):s},thread-id="1",stopped-threads="all",core="0"'
+
+    def formatStoppedByInterrupt(self, codeline: int):
+        return f'*stopped,signal-name="SIGINT",signal-meaning="Interrupt",frame={self.formatFrame(codeline):s},thread-id="1",stopped-threads="all",core="0"'
+
+
+def _llvmMainName(llvm: Optional["LlvmCompilationBundle"]):
+    return llvm.main.getName().str() if llvm else None
+
+
+def gdbMsgFormatFrame(codeline: int, llvm: Optional["LlvmCompilationBundle"], exeName: Optional[str]):
+    return GdbMiMsgFormatter(_llvmMainName(llvm), exeName).formatFrame(codeline)
+
+
+def gdbMsgFormatStack(codeline: int, llvm: "LlvmCompilationBundle", exeName: str):
+    return GdbMiMsgFormatter(_llvmMainName(llvm), exeName).formatStack(codeline)
+
+
+def gdbMsgFormatBreakpoint(llvm: "LlvmCompilationBundle", exeName: str, codeline:int, number:int, addr:int):
+    return GdbMiMsgFormatter(_llvmMainName(llvm), exeName).formatBreakpoint(codeline, number, addr)
+
+
+def gdbMsgFormatStopped(codeline: int, llvm: "LlvmCompilationBundle", exeName: str):
+    return GdbMiMsgFormatter(_llvmMainName(llvm), exeName).formatStopped(codeline)
+
+
+def gdbMsgFormatStoppedByInterrupt(codeline: int, llvm: "LlvmCompilationBundle", exeName: str):
+    return GdbMiMsgFormatter(_llvmMainName(llvm), exeName).formatStoppedByInterrupt(codeline)
 # reason="breakpoint-hit",disp="keep",bkptno="2",frame={
 # func="foo",args=[],file="hello.c",fullname="/home/foo/bar/hello.c",
 # line="13",arch="i386:x86_64"}
@@ -302,7 +562,6 @@ def format_exception(e):
 
 def sendGdbPrompt(w: IO[Any]):
     w.write(f"(gdb) {NL}")
-    w.flush()
 
 
 def writeCmdToDebugFile(cmd: GdbMiCmd, dbgFile: IO[Any]):
@@ -311,26 +570,3 @@ def writeCmdToDebugFile(cmd: GdbMiCmd, dbgFile: IO[Any]):
         dbgFile.write("    ")
         dbgFile.write(repr(cmd.args))
     dbgFile.write('\n')
-    dbgFile.flush()
-
-
-def filterArgs(args: List[str], ignoredArgs: List[List[str]]) -> List[str]:
-    res = []
-    argLen = len(args)
-    longestPattern = 0
-    for argI, a in enumerate(args):
-        if longestPattern != 0:
-            longestPattern -= 1
-            continue
-
-        for ignorePattern in ignoredArgs:
-            prnLen = len(ignorePattern)
-            if a == ignorePattern[0] and prnLen + argI <= argLen:
-                longestPattern = max(longestPattern, prnLen)
-
-        if longestPattern == 0:
-            res.append(a)
-        else:
-            longestPattern -= 1
-
-    return res
@@ -1,33 +1,91 @@
 import binascii
+from collections import deque
+from contextlib import contextmanager
+from math import ceil
 import re
 from select import select
 import socket
-from typing import Optional, Dict, Union, Literal, Callable, IO, Any
+from typing import Optional, Dict, Union, Literal, Callable, IO, Any, List, Deque, Sequence, Tuple
 
 from hwtHlsGdb.gdbRemoteMessages import GdbRemotePktAck, gdbParserReply, \
     gdbPacketReply, GdbBreakPointType, GdbRemotePktStopped
+from hwtHlsGdb.gdbRemoteTransport import gdbRemoteOpenConnection, GdbRemotePipeConnection
+
+
+class GdbRemoteRequest():
+    """
+    A request sent to stub whose reply may not be received yet (:see: :meth:`GdbRemoteClient.pipeline`)
+
+    :ivar reply: reply from stub, None if not received yet
+    :ivar expectOk: if True the reply is checked to be "OK"
+    :ivar error: the reply if it was not "OK" while expectOk, else None
+    :ivar posted: if True nobody waits for the reply and the error is reported
+        by :attr:`GdbRemoteClient.requestErrorHandler`
+    """
+    __slots__ = ["payload", "reply", "expectOk", "error", "posted"]
+
+    def __init__(self, payload: str, expectOk: bool, posted: bool):
+        self.payload = payload
+        self.reply: Optional[str] = None
+        self.expectOk = expectOk
+        self.error: Optional[str] = None
+        self.posted = posted
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} {self.payload:s} -> {self.reply}>"
 
 
 class GdbRemoteClient():
+    """
+    Client of GDB Remote Serial Protocol used by GDB/MI frontend to control the simulator (GDBServerStub).
+
+    Requests can be pipelined. :meth:`~.queueRequest` sends a packet without waiting for the reply,
+    replies are matched with requests in order in which they were sent. Inside of :meth:`~.pipeline` block
+    the packets are not sent until the end of the block and then they are sent back to back in a single write.
 
-    def __init__(self, host: str, port: int, interuptHandler: Callable[["GdbRemoteClient", GdbRemotePktStopped], None], dbgFile: Optional[IO[Any]]):
-        self.host = host
-        self.port = port
-        self.socket: Optional[socket.socket] = None
+    :ivar address: address of the stub (:see: :mod:`hwtHlsGdb.gdbRemoteTransport`)
+        or an already connected socket
+    """
+
+    def __init__(self, address: Union[str, socket.socket], interuptHandler: Callable[["GdbRemoteClient", GdbRemotePktStopped], None], dbgFile: Optional[IO[Any]]):
+        self.address = address
+        self.socket: Union[socket.socket, GdbRemotePipeConnection, None] = None
         self.noAckMode = False
         self.receiveBuffer = ""
         self._receivedPkt = None  # temporary to support push back of the packet during processing
         self.stubSupported: Dict[str, bool] = {}
-        self.timeout = 0.001
+        # actions supported in vCont packet, loaded on demand from "vCont?"
+        self.vContActions: Optional[Tuple[str, ...]] = None
+        self.timeout = 0  # timeout for non-blocking receive
         self._onInterrupt = interuptHandler
         self._dbgFile = dbgFile
+        self.running = False  # True if the remote was resumed and did not report stop yet
+        # size of each register in "g" packet, loaded on demand from qRegisterInfo
+        self.registerByteSizes: Optional[List[int]] = None
+        # values of all registers from last "g" packet, None if invalidated by execution
+        self._registerCache: Optional[List[int]] = None
+        # values of all registers from the "g" packet before the last one (from some previous stop),
+        # used to detect recently written registers
+        self.prevRegisters: Optional[List[int]] = None
+        self._lastRegisters: Optional[List[int]] = None
+        # packets which were not sent yet because of pipeline block
+        self._txQueue: List[str] = []
+        # requests which were sent (or queued in _txQueue) and are waiting for reply
+        self._pendingRequests: Deque[GdbRemoteRequest] = deque()
+        self._pipelineDepth = 0
+        # console output ("O" packets) of the monitor command which is waiting for reply
+        self._consoleOutput: Optional[List[str]] = None
+        # called for console output which is not a reply to monitor command (progress messages while running)
+        self.consoleOutputHandler: Optional[Callable[[str], None]] = None
+        # called for a failed request whose reply nobody waits for (breakpoint insert/delete with wait=False)
+        self.requestErrorHandler: Optional[Callable[[GdbRemoteRequest], None]] = None
 
     def __enter__(self):
         self._connect()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.socket is not None:
+        if self.isConnected():
             self._close()
 
     def receiveAck(self):
@@ -41,7 +99,118 @@ class GdbRemoteClient():
     def sendAck(self):
         return self.socket.send(b'+')
 
+    def sendPkt(self, payload: str):
+        self._sendPkts((payload,))
+
+    def _sendPkts(self, payloads: Sequence[str]):
+        self.socket.sendall(b"".join(gdbPacketReply(p) for p in payloads))
+
+    def queueRequest(self, payload: str, expectOk: bool=False, posted: bool=False) -> GdbRemoteRequest:
+        """
+        Send request without waiting for reply.
+        If called in :meth:`~.pipeline` block the request is sent at the end of the block.
+
+        :param posted: if True the error is reported by :attr:`~.requestErrorHandler`
+            when the reply is received, otherwise the caller checks it (:meth:`~.checkRequest`)
+        """
+        req = GdbRemoteRequest(payload, expectOk, posted)
+        self._txQueue.append(payload)
+        self._pendingRequests.append(req)
+        if self._pipelineDepth == 0:
+            self.flush()
+        return req
+
+    def flush(self):
+        """
+        Send all queued requests
+        """
+        txQueue = self._txQueue
+        if txQueue:
+            self._sendPkts(txQueue)
+            txQueue.clear()
+
+    def _completeRequest(self, reply: str):
+        pendingRequests = self._pendingRequests
+        if not pendingRequests:
+            self._dbgFile.write(f"remote -> unexpected reply without request: {reply:s}\n")
+            return
+        req = pendingRequests.popleft()
+        req.reply = reply
+        if req.expectOk and reply != "OK":
+            req.error = reply
+            if req.posted:
+                if self.requestErrorHandler is None:
+                    self._dbgFile.write(f"remote -> error for posted request {req.payload:s}: {reply:s}\n")
+                else:
+                    self.requestErrorHandler(req)
+
+    @staticmethod
+    def checkRequest(req: GdbRemoteRequest):
+        """
+        Check that the request which was waited for did not fail.
+        """
+        assert req.error is None, (req.payload, req.error)
+
+    def sync(self):
+        """
+        Send all queued requests and wait for all replies.
+        """
+        self.flush()
+        while self._pendingRequests:
+            pkt = self.receivePkt()
+            if pkt is GdbRemotePktAck:
+                continue
+            self._completeRequest(pkt)
+
+    def request(self, payload: str, expectOk: bool=False) -> str:
+        """
+        Send request and wait for its reply (and for replies of all previous requests).
+        """
+        req = self.queueRequest(payload, expectOk)
+        self.sync()
+        self.checkRequest(req)
+        return req.reply
+
+    @contextmanager
+    def pipeline(self):
+        """
+        Requests queued in this block are sent back to back at the end of the block
+        and all replies are received before leaving the block.
+        """
+        self._pipelineDepth += 1
+        try:
+            yield self
+        finally:
+            self._pipelineDepth -= 1
+            if self._pipelineDepth == 0:
+                self.sync()
+
+    def isConnected(self):
+        return self.socket is not None
+
+    def fileno(self) -> Optional[int]:
+        """
+        :returns: file descriptor which becomes readable when there is a packet from stub
+            or None if there is no such file descriptor
+        """
+        return self.socket.fileno()
+
+    def hasPendingInput(self) -> bool:
+        """
+        :returns: True if :meth:`~.poolInterrupts` should be called even if :meth:`~.fileno` is not readable
+        """
+        buff = self.receiveBuffer
+        return bool(buff) and (buff[0] == '+' or gdbParserReply(buff) is not None)
+
     def poolInterrupts(self):
+        while self._pendingRequests:
+            # complete posted requests (e.g. breakpoint insert) if reply is available
+            pkt = self.receivePkt(False)
+            if pkt is None:
+                return
+            elif pkt is not GdbRemotePktAck:
+                self._completeRequest(pkt)
+
         pkt = self.receivePkt(False)
         if pkt is not None:
             self.receivePktUndo(pkt)
@@ -52,78 +221,296 @@ class GdbRemoteClient():
             self._receivedPkt = None
             return pkt
 
+        replyPkt = self._receivePayload(blocking)
+        if replyPkt is None or replyPkt is GdbRemotePktAck:
+            return replyPkt
+
+        self._dbgFile.write("remote -> ")
+        self._dbgFile.write(replyPkt)
+        self._dbgFile.write('\n')
+        intrM = re.match("^S([0-9a-fA-F]{2})", replyPkt)
+        if intrM:
+            self.running = False
+            self._registerCache = None
+            self._onInterrupt(self, GdbRemotePktStopped(int(intrM.group(1), 16)))
+            return self.receivePkt(blocking)
+
+        outM = re.match("^O((?:[0-9a-fA-F]{2})+)$", replyPkt)
+        if outM:
+            text = bytes.fromhex(outM.group(1)).decode()
+            if self._consoleOutput is not None:
+                self._consoleOutput.append(text)
+            elif self.consoleOutputHandler is not None:
+                self.consoleOutputHandler(text)
+            return self.receivePkt(blocking)
+
+        return replyPkt  # return regular packet
+
+    def _receivePayload(self, blocking: bool) -> Union[None, str, Literal[GdbRemotePktAck]]:
+        """
+        Receive a single packet from the stub and return its decoded content.
+        """
         buff = self.receiveBuffer
-        if not buff:
-            if blocking:
-                buff = self.receiveBuffer = self.socket.recv(1024).decode()
-            else:
+        while True:
+            if buff:
+                if buff[0] == '+':
+                    self.receiveBuffer = buff[1:]
+                    return GdbRemotePktAck
+
+                replyPkt = gdbParserReply(buff)
+                if replyPkt is not None:
+                    m, replyPkt = replyPkt
+                    self.receiveBuffer = buff[len(m.group(0)):]
+                    return replyPkt
+                elif buff[0] != '$':
+                    raise AssertionError("Invalid packet", buff)
+                # else the rest of the packet was not received yet
+                blocking = True
+
+            if not blocking:
                 toRead, _, _ = select((self.socket,), (), (), self.timeout)
-                if toRead:
-                    buff = self.receiveBuffer = self.socket.recv(1024).decode()
-                else:
+                if not toRead:
                     return None
 
-        assert buff
-
-        if buff[0] == '+':
-            self.receiveBuffer = buff[1:]
-            return GdbRemotePktAck
-
-        replyPkt = gdbParserReply(buff)
-        if replyPkt is not None:
-            m, replyPkt = replyPkt
-            buff = self.receiveBuffer = buff[len(m.group(0)):]
-            self._dbgFile.write("remote -> ")
-            self._dbgFile.write(replyPkt)
-            self._dbgFile.write('\n')
-            intrM = re.match("^S([0-9a-fA-F]{2})", replyPkt)
-            if intrM:
-                self._onInterrupt(self, GdbRemotePktStopped(int(intrM.group(1), 16)))
-                return self.receivePkt(blocking)
-
-            return replyPkt  # return regular packet
-        else:
-            raise AssertionError("Invalid packet")
+            data = self.socket.recv(4096)
+            if not data:
+                raise ConnectionError("Connection closed by stub")
+            buff = self.receiveBuffer = buff + data.decode()
 
     def sendContinue(self):
-        self.socket.send(gdbPacketReply('c'))
-        okReply = self.receivePkt()
-        assert okReply == "OK", okReply
+        self._registerCache = None
+        self.request('c', expectOk=True)
+        self.running = True
 
     def sendStep(self):
-        self.socket.send(gdbPacketReply('s'))
-        okReply = self.receivePkt()
-        assert okReply == "OK", okReply
+        self._registerCache = None
+        self.request('s', expectOk=True)
+        self.running = True
+
+    def sendFinish(self) -> bool:
+        """
+        Run until the current function returns to its caller ("vHwtFinish" extension of GDBServerStub).
+
+        :returns: False if the stub refused it (the outermost frame or unsupported)
+        """
+        self._registerCache = None
+        if self.request("vHwtFinish") != "OK":
+            return False
+        self.running = True
+        return True
+
+    def sendNext(self) -> bool:
+        """
+        Step in the granularity selected by "monitor step-mode" without stop in called functions
+        ("vHwtNext" extension of GDBServerStub).
+
+        :returns: False if the stub does not support it
+        """
+        self._registerCache = None
+        if self.request("vHwtNext") != "OK":
+            return False
+        self.running = True
+        return True
+
+    def monitor(self, cmd: str) -> Optional[str]:
+        """
+        Execute the monitor command in the stub ("qRcmd").
+
+        :returns: console output of the command or None if the stub refused the command
+        """
+        output = self._consoleOutput = []
+        try:
+            reply = self.request("qRcmd," + cmd.encode().hex())
+        finally:
+            self._consoleOutput = None
+        if reply != "OK":
+            return None
+        return "".join(output)
+
+    def sendContinueBounded(self, instrCnt: int) -> bool:
+        """
+        Continue, the stub stops after instrCnt instructions ("monitor run N").
+
+        :returns: False if the stub refused it
+        """
+        self._registerCache = None
+        if self.monitor(f"run {instrCnt:d}") is None:
+            return False
+        self.running = True
+        return True
+
+    def supportsRangeStep(self) -> bool:
+        if self.vContActions is None:
+            reply = self.request("vCont?")
+            self.vContActions = tuple(reply.split(";")[1:]) if reply.startswith("vCont") else ()
+        return "r" in self.vContActions
+
+    def sendRangeStep(self, start: int, end: int):
+        """
+        Step while the address of the instruction is in [start, end), the called functions are stepped over.
+        """
+        self._registerCache = None
+        self.request(f"vCont;r{start:x},{end:x}", expectOk=True)
+        self.running = True
+
+    def sendUntil(self, addr: int) -> bool:
+        """
+        Run until the address or until the current function returns ("vHwtUntil" extension of GDBServerStub).
+
+        :returns: False if the stub refused it
+        """
+        self._registerCache = None
+        if self.request(f"vHwtUntil:{addr:x}") != "OK":
+            return False
+        self.running = True
+        return True
 
     def sendInterrupt(self):
-        self.socket.send(gdbPacketReply("vCtrlC"))
-        okReply = self.receivePkt()
-        assert okReply == "OK", okReply
+        self._registerCache = None
+        self.request("vCtrlC", expectOk=True)
 
     # def execRun(self):
     #    return self.sendContinue()
 
-    def breakInsert(self, addr: int):
-        self.socket.send(gdbPacketReply(f"Z{GdbBreakPointType.HARDWARE:d},{addr:x},0"))
-        okReply = self.receivePkt()
-        assert okReply == "OK", okReply
-    
-    def breakDelete(self, addr):
-        self.socket.send(gdbPacketReply(f"z{GdbBreakPointType.HARDWARE:d},{addr:x},0"))
-        okReply = self.receivePkt()
-        assert okReply == "OK", okReply
+    def breakInsert(self, addr: int, wait: bool=True):
+        """
+        :param wait: if False the reply is received later when some other request waits for reply
+            and an error is reported by :attr:`~.requestErrorHandler`
+        """
+        req = self.queueRequest(f"Z{GdbBreakPointType.HARDWARE:d},{addr:x},0", expectOk=True, posted=not wait)
+        if wait:
+            self.sync()
+            self.checkRequest(req)
+
+    def breakInsertTemporary(self, addr: int) -> bool:
+        """
+        Insert a breakpoint which the stub deletes once hit ("vHwtTbreak" extension of GDBServerStub).
+
+        :returns: False if the stub does not support it
+        """
+        return self.request(f"vHwtTbreak:{addr:x}") == "OK"
+
+    def breakInsertMany(self, addrs: Sequence[int]):
+        with self.pipeline():
+            reqs = [self.queueRequest(f"Z{GdbBreakPointType.HARDWARE:d},{addr:x},0", expectOk=True) for addr in addrs]
+        for req in reqs:
+            self.checkRequest(req)
+
+    def breakDelete(self, addr: int, wait: bool=True):
+        """
+        :param wait: same as for :meth:`~.breakInsert`
+        """
+        req = self.queueRequest(f"z{GdbBreakPointType.HARDWARE:d},{addr:x},0", expectOk=True, posted=not wait)
+        if wait:
+            self.sync()
+            self.checkRequest(req)
 
     def readRegister(self, regIndex: int):
-        self.socket.send(gdbPacketReply(f"p{regIndex:x}"))
-        reply = self.receivePkt()
+        """
+        Read a value of a register, all registers are read by a single "g" packet and cached until the execution resumes.
+        """
+        if self.running:
+            # the value may be changing, can not use cache
+            return self._readRegisterUncached(regIndex)
+        regs = self.readRegisters()
+        if regIndex < len(regs):
+            return regs[regIndex]
+        return self._readRegisterUncached(regIndex)
+
+    def readFrames(self) -> List[int]:
+        """
+        Read addresses of all frames of the call stack (the current frame first) by a single request
+        ("qHwtFrames" extension of GDBServerStub).
+
+        :note: If the stub does not support it, only the current frame is returned.
+        """
+        reply = self.request("qHwtFrames")
+        if not reply or reply[0] == "E":
+            return [self.readRegister(0)]
+        return [int(a, 16) for a in reply.split(",")]
+
+    @staticmethod
+    def _decodeRegisterValue(reply: str):
         try:
             return int.from_bytes(binascii.unhexlify(reply), 'little')
         except:
             raise ValueError(reply)
 
+    def _readRegisterUncached(self, regIndex: int):
+        return self._decodeRegisterValue(self.request(f"p{regIndex:x}"))
+
+    def readRegisterList(self, regIndices: Sequence[int]) -> List[int]:
+        """
+        Read values of multiple registers, from cache if the target is stopped
+        or using pipelined "p" packets if it is running.
+        """
+        if not self.running:
+            regs = self.readRegisters()
+            regCnt = len(regs)
+            if all(i < regCnt for i in regIndices):
+                return [regs[i] for i in regIndices]
+
+        with self.pipeline():
+            reqs = [self.queueRequest(f"p{i:x}") for i in regIndices]
+        return [self._decodeRegisterValue(r.reply) for r in reqs]
+
+    def invalidateRegisterCache(self):
+        self._registerCache = None
+
+    def _loadRegisterByteSizes(self):
+        sizes = []
+        chunk = 64  # number of qRegisterInfo requests sent at once
+        while True:
+            with self.pipeline():
+                reqs = [self.queueRequest(f"qRegisterInfo{i:x}") for i in range(len(sizes), len(sizes) + chunk)]
+            for req in reqs:
+                reply = req.reply
+                if not reply or reply[0] == "E":
+                    self.registerByteSizes = sizes
+                    return
+                for item in reply.split(";"):
+                    if item.startswith("bitsize:"):
+                        sizes.append(ceil(int(item[len("bitsize:"):]) / 8))
+                        break
+                else:
+                    raise ValueError("Missing bitsize in register info", reply)
+
+    def readRegisters(self) -> List[int]:
+        """
+        Read values of all registers using "g" packet (cached until the execution resumes)
+        """
+        regs = self._registerCache
+        if regs is not None:
+            return regs
+
+        if self.registerByteSizes is None:
+            self._loadRegisterByteSizes()
+
+        reply = self.request("g")
+        try:
+            data = binascii.unhexlify(reply)
+        except:
+            raise ValueError(reply)
+        regs = []
+        offset = 0
+        for size in self.registerByteSizes:
+            end = offset + size
+            regs.append(int.from_bytes(data[offset:end], 'little'))
+            offset = end
+        assert offset == len(data), ("Size of g packet does not match register sizes", offset, len(data))
+        self._registerCache = regs
+        self.prevRegisters = self._lastRegisters
+        self._lastRegisters = regs
+        return regs
+
     def _connect(self):
-        soc = self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        soc.connect((self.host, self.port))
+        if isinstance(self.address, str):
+            self.socket = gdbRemoteOpenConnection(self.address)
+        else:
+            self.socket = self.address
+        self._handshake()
+
+    def _handshake(self):
         """
         +
         $qSupported:...#77
@@ -139,32 +526,37 @@ class GdbRemoteClient():
         $OK#9a
         +
         """
-        soc.send(gdbPacketReply('qSupported:multiprocess+;swbreak+;hwbreak+'))
-        self.receiveAck()
+        self.sendPkt('qSupported:multiprocess+;swbreak+;hwbreak+')
+        if not self.noAckMode:
+            self.receiveAck()
         supported = self.receivePkt()
         for feature in supported.split(";"):
             isSupported = feature[-1]
             feature = feature[:-1]
             if isSupported == '+':
                 isSupported = True
-            elif isSupported == '+':
-                isSupported = True
+            elif isSupported == '-':
+                isSupported = False
             else:
                 raise ValueError("Unknonw spec for feature from stub", feature, isSupported)
             self.stubSupported[feature] = isSupported
 
-        soc.send(gdbPacketReply('vMustReplyEmpty'))
-        self.receiveAck()
+        self.sendPkt('vMustReplyEmpty')
+        if not self.noAckMode:
+            self.receiveAck()
         emptyReply = self.receivePkt()
         assert emptyReply == '', emptyReply
-        self.sendAck()
+        if not self.noAckMode:
+            self.sendAck()
 
-        soc.send(gdbPacketReply('QStartNoAckMode'))
-        self.receiveAck()
-        self.noAckMode = False
+        self.sendPkt('QStartNoAckMode')
+        if not self.noAckMode:
+            self.receiveAck()
         okReply = self.receivePkt()
         assert okReply == "OK", okReply
-        self.sendAck()
+        if not self.noAckMode:
+            self.sendAck()
+        self.noAckMode = True
 
     def _close(self):
         if self.socket is not None:
@@ -0,0 +1,87 @@
+from collections import deque
+from typing import Optional, Callable, IO, Any, Union, Literal, Deque, Sequence
+
+from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler
+from hwtHlsGdb.gdbRemoteClient import GdbRemoteClient
+from hwtHlsGdb.gdbRemoteMessages import GdbRemotePktStopped, GdbRemotePktAck
+from hwtHlsGdb.gdbServerStub import GDBServerStub
+
+
+class GDBServerStubLoopback(GDBServerStub):
+    """
+    GDBServerStub which passes replies directly to :class:`~.GdbRemoteClientLoopback` in the same process
+    (without socket and packet encoding).
+    """
+
+    def __init__(self, handler: GdbCmdHandler):
+        super(GDBServerStubLoopback, self).__init__(handler)
+        self.noAckMode = True
+
+    def sendPkt(self, conn: "GdbRemoteClientLoopback", reply: Union[str, bytes]):
+        if isinstance(reply, bytes):
+            reply = reply.decode()
+        conn.replies.append(reply)
+
+
+class GdbRemoteClientLoopback(GdbRemoteClient):
+    """
+    GdbRemoteClient which talks directly to :class:`~.GdbCmdHandler` in the same process.
+    Packets are passed to :meth:`GDBServerStub.handlePacket` and replies are returned as strings,
+    the simulation is executed during :meth:`~.poolInterrupts`.
+
+    :ivar replies: replies from stub which were not received yet
+    :ivar instrBatch: max number of instructions executed in a single call of :meth:`~.poolInterrupts`
+        (to keep MI frontend responsive during long simulation)
+    """
+
+    def __init__(self, handler: GdbCmdHandler,
+                 interuptHandler: Callable[["GdbRemoteClient", GdbRemotePktStopped], None],
+                 dbgFile: Optional[IO[Any]],
+                 instrBatch: int=1000):
+        super(GdbRemoteClientLoopback, self).__init__("loopback", interuptHandler, dbgFile)
+        self.stub = GDBServerStubLoopback(handler)
+        self.replies: Deque[str] = deque()
+        self.instrBatch = instrBatch
+        self._connected = False
+
+    def sendAck(self):
+        pass
+
+    def _sendPkts(self, payloads: Sequence[str]):
+        for p in payloads:
+            self.stub.handlePacket(self, p)
+
+    def isConnected(self):
+        return self._connected
+
+    def fileno(self) -> Optional[int]:
+        return None
+
+    def hasPendingInput(self) -> bool:
+        # the simulation is executed in poolInterrupts
+        return bool(self.replies) or not self.stub.exeStopped
+
+    def _receivePayload(self, blocking: bool) -> Union[None, str, Literal[GdbRemotePktAck]]:
+        replies = self.replies
+        stub = self.stub
+        if not replies:
+            instrCnt = 0
+            while not stub.exeStopped and (blocking or instrCnt < self.instrBatch):
+                if not stub.runCurrentInstr(self):
+                    break
+                instrCnt += 1
+
+        if replies:
+            return replies.popleft()
+        elif blocking:
+            raise AssertionError("Waiting for reply from stub which is not running")
+        else:
+            return None
+
+    def _connect(self):
+        self.noAckMode = True
+        self._connected = True
+        self._handshake()
+
+    def _close(self):
+        self._connected = False
@@ -2,8 +2,6 @@ import binascii
 import re
 from typing import Sequence, Union
 
-from hwt.pyUtils.arrayQuery import grouper
-
 ERROR_BAD_ACCESS_SIZE_FOR_ADDRESS = 0x34
 # https://sourceware.org/gdb/onlinedocs/gdb/Remote-Protocol.html#Remote-Protocol
 
@@ -56,8 +54,8 @@ def _bytesToUint32(databytes):
 
 
 def _bytesToInt32Array(databytes):
-    for i32 in grouper(4, databytes, padvalue=b'\x00'):
-        yield int.from_bytes(i32, 'little')
+    for i in range(0, len(databytes), 4):
+        yield int.from_bytes(databytes[i:i + 4], 'little')
 
 
 def _makeCharEscape(char: str):
@@ -107,6 +105,13 @@ def gdbReplyStopped(reason: int):
     return f'S{reason:02x}'.encode()
 
 
+def gdbReplyConsoleOutput(text: str):
+    """
+    Generates a console output packet ("O" + hex encoded text).
+    """
+    return "O" + text.encode().hex()
+
+
 def gdbReplyError(number: int):
     """
     Generates an Error reply with an Error No.
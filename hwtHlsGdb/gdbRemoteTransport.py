@@ -0,0 +1,84 @@
+"""
+Transports for GDB Remote Serial Protocol.
+
+Supported address formats (same for :class:`~.GdbRemoteClient` and for "target-select remote <address>"):
+
+* "host:port" - TCP
+* "unix:path" (or "unix::path") - Unix domain socket
+* "fd:N" - already connected socket inherited as a file descriptor N (e.g. one end of socket.socketpair())
+* "| command" - stdin/stdout of a child process started by shell (as "target remote | command" in GDB)
+"""
+import os
+import socket
+import subprocess
+from typing import Optional, Union
+
+
+class GdbRemotePipeConnection():
+    """
+    Socket like object for communication over a pair of file descriptors
+    (pipes of a child process or stdin/stdout of this process).
+    """
+
+    def __init__(self, rFd: int, wFd: int, proc: Optional[subprocess.Popen]=None):
+        self.rFd = rFd
+        self.wFd = wFd
+        self.proc = proc
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def fileno(self):
+        return self.rFd
+
+    def recv(self, bufsize: int) -> bytes:
+        return os.read(self.rFd, bufsize)
+
+    def send(self, data: bytes) -> int:
+        return os.write(self.wFd, data)
+
+    def sendall(self, data: bytes):
+        data = memoryview(data)
+        while data:
+            data = data[os.write(self.wFd, data):]
+
+    def close(self):
+        if self.proc is None:
+            os.close(self.rFd)
+            os.close(self.wFd)
+        else:
+            proc = self.proc
+            proc.stdin.close()
+            proc.stdout.close()
+            try:
+                proc.wait(1.0)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+                proc.wait()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__:s} r:{self.rFd:d} w:{self.wFd:d}>"
+
+
+def gdbRemoteOpenConnection(address: str) -> Union[socket.socket, GdbRemotePipeConnection]:
+    """
+    Connect to GDB stub (:see: module doc for format of address)
+    """
+    address = address.strip()
+    if address.startswith("|"):
+        proc = subprocess.Popen(address[1:].strip(), shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        return GdbRemotePipeConnection(proc.stdout.fileno(), proc.stdin.fileno(), proc)
+    elif address.startswith("unix:"):
+        soc = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        soc.connect(address[len("unix:"):].lstrip(":"))
+        return soc
+    elif address.startswith("fd:"):
+        return socket.socket(fileno=int(address[len("fd:"):]))
+    else:
+        host, port = address.rsplit(":", 1)
+        soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        soc.connect((host, int(port)))
+        return soc
@@ -1,12 +1,19 @@
 import logging
+import os
 import re
 from select import select
 import socket
+import stat
+import sys
+from time import perf_counter, perf_counter_ns
+from typing import Union, Optional, Tuple
 
-from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler
+from hwtHlsGdb.gdbCmdHandler import GdbCmdHandler, CycleLimitReached
 from hwtHlsGdb.gdbRemoteMessages import gdbReplyError, gdbReplyOk, \
     gdbReplyUnsupported, gdbPacketReply, gdbParserReply, gdbReplyStopped, \
-    GdbTargetSignal
+    GdbTargetSignal, gdbReplyConsoleOutput
+from hwtHlsGdb.gdbRemoteTransport import GdbRemotePipeConnection
+from hwtHlsGdb.gdbServerStubStats import GdbServerStubStats, GdbPacketStats
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -20,13 +27,30 @@ class GDBServerStub():
     It translates low level operations fro GDB remote protocol and passes them to target (in this case to simulator).
     
     Based on https://github.com/nomtats/gdbserver-stub
+
+    :ivar progressPeriod: period in seconds of progress notifications (console output packets) sent while running,
+        None to disable (set by "monitor progress")
+    :ivar runInstrCnt: number of instructions executed since the last resume
+    :ivar stats: latencies of packet processing ("monitor stats")
     """
+    # the time is checked only once per this number of instructions
+    PROGRESS_CHECK_INSTR_CNT = 256
 
     def __init__(self, handler: GdbCmdHandler):
         self.handler = handler
         self.noAckMode = False
         self.timeout = 0.001
+        self.receiveBuffer = ""
         self.exeStopped = True
+        self.progressPeriod: Optional[float] = 1.0
+        self.runInstrCnt = 0
+        # instructions executed before the last resume
+        self._prevRunsInstrCnt = 0
+        self.stats = GdbServerStubStats()
+        # stats of the packet which is currently handled (used for its reply)
+        self._curPktStats: Optional[GdbPacketStats] = None
+        self._runStartTime = 0.0
+        self._nextProgressTime = 0.0
         self.COMMON_QUERIES = (
             (re.compile("^qTStatus"), handler.handle_qTStatus),
             (re.compile('^qfThreadInfo'), handler.handleThreadInfo),
@@ -34,6 +58,7 @@ class GDBServerStub():
             (re.compile('^qTfV'), handler.handle_qTfV),
             (re.compile("^qTsV"), handler.handle_qTsV),
             (re.compile('^qC'), self.handler.handleCurrentThread),
+            (re.compile('^qHwtFrames'), self.handler.handleFrameInfo),
         )
 
 #    def __enter__(self, host:str="127.0.0.1", port:int=10000):
@@ -55,60 +80,235 @@ class GDBServerStub():
             conn, addr = s.accept()
             with conn:
                 debug(f"Connection accepted: {addr}")
+                self.serve(conn)
+            debug("Connection closed")
 
-                while True:
-                    toRead, _, _ = select((conn,), (), (), self.timeout)
-                    if toRead:
-                        data = conn.recv(1024)
-                        self.onData(conn, data)
-
-                    if not self.exeStopped:
-                        try:
-                            print("running: ", self.handler.instr)
-                            breakAddr = self.handler.runCurrentInstr()
-                        except:
-                            conn.send(gdbPacketReply(gdbReplyStopped(GdbTargetSignal.SIGKILL)))
-                            self.exeStopped = True
-                            break
-
-                        if breakAddr is not None:
-                            conn.send(gdbPacketReply(gdbReplyStopped(GdbTargetSignal.TRAP)))
-                            self.exeStopped = True
+        debug("Server shutdown")
 
-            debug("Connection closed")
+    def startUnix(self, path: str):
+        """
+        Start server on Unix domain socket (client address "unix:<path>")
+        """
+        if os.path.exists(path):
+            # only a stale socket from previous run is removed, not a file passed by mistake
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise FileExistsError(f"{path:s} exists and it is not a socket")
+            os.unlink(path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.bind(path)
+            debug(f"GDBServerStub started at {path}")
+            s.listen()
+            try:
+                conn, _ = s.accept()
+                with conn:
+                    debug(f"Connection accepted: {path}")
+                    self.serve(conn)
+                debug("Connection closed")
+            finally:
+                os.unlink(path)
 
         debug("Server shutdown")
 
+    def startFd(self, fd: int):
+        """
+        Start server on already connected socket inherited as a file descriptor
+        (e.g. one end of socket.socketpair(), client address "fd:<N>")
+        """
+        with socket.socket(fileno=fd) as conn:
+            debug(f"GDBServerStub started at fd:{fd:d}")
+            self.serve(conn)
+        debug("Server shutdown")
+
+    def startStdio(self):
+        """
+        Start server on stdin/stdout of this process (client address "| <command which starts this process>").
+
+        :note: The original stdout is used only for GDB packets, anything written to sys.stdout
+            is redirected to stderr.
+        """
+        sys.stdout.flush()
+        rFd = os.dup(sys.stdin.fileno())
+        wFd = os.dup(sys.stdout.fileno())
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        with GdbRemotePipeConnection(rFd, wFd) as conn:
+            debug(f"GDBServerStub started at stdio")
+            self.serve(conn)
+        debug("Server shutdown")
+
+    def serve(self, conn: Union[socket.socket, GdbRemotePipeConnection]):
+        """
+        Process packets from connected client until the simulation ends.
+        """
+        while True:
+            toRead, _, _ = select((conn,), (), (), self.timeout)
+            if toRead:
+                data = conn.recv(1024)
+                if not data:
+                    break  # client disconnected
+                self.onData(conn, data)
+
+            if not self.exeStopped:
+                if not self.runCurrentInstr(conn):
+                    break
+
+    def runCurrentInstr(self, conn: socket.socket) -> bool:
+        """
+        Execute a single instruction in handler and notify client if the execution stopped.
+
+        :returns: False if the simulation crashed and the connection should be closed
+        """
+        try:
+            trace(f"running: {self.handler.instr}")
+            breakAddr = self.handler.runCurrentInstr()
+        except:
+            self.sendPkt(conn, gdbReplyStopped(GdbTargetSignal.SIGKILL))
+            self.exeStopped = True
+            return False
+
+        if breakAddr is not None:
+            if breakAddr is not CycleLimitReached:
+                self.runInstrCnt += 1
+            self.sendPkt(conn, gdbReplyStopped(GdbTargetSignal.TRAP))
+            self.exeStopped = True
+        else:
+            runInstrCnt = self.runInstrCnt = self.runInstrCnt + 1
+            if self.progressPeriod is not None and runInstrCnt % self.PROGRESS_CHECK_INSTR_CNT == 0:
+                self._sendProgress(conn)
+        return True
+
+    def _resume(self):
+        self.exeStopped = False
+        self._prevRunsInstrCnt += self.runInstrCnt
+        self.runInstrCnt = 0
+        self._runStartTime = perf_counter()
+        if self.progressPeriod is not None:
+            self._nextProgressTime = self._runStartTime + self.progressPeriod
+
+    def _sendProgress(self, conn: socket.socket):
+        now = perf_counter()
+        if now < self._nextProgressTime:
+            return
+        self._nextProgressTime = now + self.progressPeriod
+        instrCnt = self.runInstrCnt
+        msg = f"running: {instrCnt:d} instructions"
+        simTime = self.handler.getSimTime()
+        if simTime is not None:
+            msg += f", simulation time {simTime:d}"
+        msg += f", {instrCnt / (now - self._runStartTime):.0f} instructions/s\n"
+        self.sendPkt(conn, gdbReplyConsoleOutput(msg))
+
+    def handleMonitorCmd(self, cmd: str) -> Tuple[Optional[str], Union[str, bytes]]:
+        """
+        Handle monitor commands of the stub, other commands are passed to the handler.
+
+        :returns: tuple (text for console output or None, reply)
+        """
+        args = cmd.split()
+        if args and args[0] == "run":
+            # bounded continue, the execution stops after specified number of instructions
+            if len(args) != 2:
+                return (None, gdbReplyError(1))
+            try:
+                instrCnt = int(args[1], 0)
+            except ValueError:
+                return (None, gdbReplyError(1))
+            if instrCnt <= 0:
+                return (None, gdbReplyError(1))
+            reply = self.handler.handleContinueBounded(instrCnt)
+            if reply == gdbReplyOk(None):
+                self._resume()
+            return (None, reply)
+
+        elif args and args[0] == "stats":
+            if args[1:] == ["reset"]:
+                # the instruction counter is a part of the report, it is reset as well
+                self.stats.reset()
+                self.runInstrCnt = 0
+                self._prevRunsInstrCnt = 0
+                return (None, gdbReplyOk(None))
+            elif len(args) > 2 or (len(args) == 2 and args[1] != "histogram"):
+                return (None, gdbReplyError(1))
+            handler = self.handler
+            output = self.stats.format(self._prevRunsInstrCnt + self.runInstrCnt,
+                                       handler.getSimTime(), handler.getWaveLogBytes(),
+                                       histograms=len(args) == 2)
+            return (output, gdbReplyOk(None))
+
+        elif args and args[0] == "progress":
+            if len(args) == 1:
+                period = "off" if self.progressPeriod is None else f"{self.progressPeriod:g}"
+                return (f"progress {period:s}\n", gdbReplyOk(None))
+            elif len(args) != 2:
+                return (None, gdbReplyError(1))
+            try:
+                period = float(args[1])
+            except ValueError:
+                return (None, gdbReplyError(1))
+            self.progressPeriod = period if period > 0 else None
+            return (None, gdbReplyOk(None))
+
+        output, reply = self.handler.handleMonitorCmd(cmd)
+        if not args or args[0] == "help":
+            output = ("run N - continue, stop after N instructions\n"
+                      "progress [SECONDS] - period of progress messages while running, 0 to disable\n"
+                      "stats [histogram|reset] - packet latencies, instructions, simulation time, wave log size\n"
+                      f"{output or '':s}")
+            reply = gdbReplyOk(None)
+        return (output, reply)
+
+    def sendPkt(self, conn: socket.socket, reply: Union[str, bytes]):
+        pktStats = self._curPktStats
+        if pktStats is None:
+            pktStats = self.stats.getPacketStats(None)
+        t0 = perf_counter_ns()
+        message = gdbPacketReply(reply)
+        t1 = perf_counter_ns()
+        trace(f'->:{message}')
+        conn.sendall(message)
+        pktStats.encode.record(t1 - t0)
+        pktStats.send.record(perf_counter_ns() - t1)
+
     def onData(self, soc: socket.socket, data: bytes):
         """
-        Process all packets in data
+        Process all packets in data, an incomplete packet at the end is kept for next call
+        (client may send many packets back to back and they may be split between reads)
         """
-        inp = data.decode()
-        err = False
+        inp = self.receiveBuffer + data.decode()
         while inp:
-            while True:
-                m = re.match('^\+', inp)
-                if m is not None:
-                    # ack
-                    trace(f"<-:{m.group(0)}")
-                    break
+            m = re.match('^\+', inp)
+            if m is not None:
+                # ack
+                trace(f"<-:{m.group(0)}")
+            else:
+                t0 = perf_counter_ns()
                 replyPkt = gdbParserReply(inp)
                 if replyPkt is not None:
                     trace(f'<-:{replyPkt}')
                     m, replyPkt = replyPkt
+                    self.stats.getPacketStats(replyPkt).parse.record(perf_counter_ns() - t0)
                     self.handlePacket(soc, replyPkt)
+                elif inp[0] == '$' and not re.search('#[0-9a-zA-Z]{2}', inp):
+                    # the rest of the packet was not received yet
                     break
                 else:
-                    trace(f'<-:{input}')
-                    debug(f'Unkown incoming message: {input}')
+                    trace(f'<-:{inp}')
+                    debug(f'Unkown incoming message: {inp}')
                     # Ignore the rest of the data.
-                    err = True
+                    inp = ""
                     break
-            if err:
-                break
             inp = inp[len(m.group(0)):]
 
+        self.receiveBuffer = inp
+
     def handlePacket(self, soc: socket.socket, packet: str):
+        t0 = perf_counter_ns()
+        pktStats = self._curPktStats = self.stats.getPacketStats(packet)
+        try:
+            self._handlePacket(soc, packet, pktStats, t0)
+        finally:
+            self._curPktStats = None
+
+    def _handlePacket(self, soc: socket.socket, packet: str, pktStats: GdbPacketStats, t0: int):
         if not self.noAckMode:
             # Reply with an acknowledgement first.
             trace("->:+")
@@ -126,9 +326,7 @@ class GDBServerStub():
             elif packet == 'vCtrlC':
                 self.exeStopped = True
                 reply = self.handler.handleInterruption()
-                message = gdbPacketReply(reply)
-                trace(f'->:{message}')
-                soc.send(message)
+                self.sendPkt(soc, reply)
                 reply = gdbReplyStopped(GdbTargetSignal.INT)
                 break
 
@@ -164,7 +362,7 @@ class GDBServerStub():
                 if m.group(1) is not None:
                     address = int(m.group(1), 16)
                 reply = self.handler.handleStep(address)
-                self.exeStopped = False
+                self._resume()
                 break
 
             m = re.match('^c([0-9a-zA-Z]+)?', packet)
@@ -173,7 +371,61 @@ class GDBServerStub():
                 if m.group(1) is not None:
                     address = int(m.group(1), 16)
                 reply = self.handler.handleContinue(address)
-                self.exeStopped = False
+                self._resume()
+                break
+
+            if packet == "vCont?":
+                reply = gdbReplyOk("vCont;c;C;s;S;r")
+                break
+
+            m = re.match('^vCont;([cCsSr])([0-9a-fA-F]*)(?:,([0-9a-fA-F]+))?', packet)
+            if m is not None:
+                # there is only a single thread, the first action applies to it
+                action = m.group(1)
+                if action == 'r':
+                    if not m.group(2) or m.group(3) is None:
+                        reply = gdbReplyError(1)
+                        break
+                    reply = self.handler.handleRangeStep(int(m.group(2), 16), int(m.group(3), 16))
+                elif action in ('s', 'S'):
+                    # signal numbers of S are ignored
+                    reply = self.handler.handleStep(None)
+                else:
+                    reply = self.handler.handleContinue(None)
+                if reply == gdbReplyOk(None):
+                    self._resume()
+                break
+
+            if packet == "vHwtNext":
+                reply = self.handler.handleNext()
+                if reply == gdbReplyOk(None):
+                    self._resume()
+                break
+
+            m = re.match('^qRcmd,([0-9a-fA-F]*)', packet)
+            if m is not None:
+                output, reply = self.handleMonitorCmd(bytes.fromhex(m.group(1)).decode())
+                if output:
+                    self.sendPkt(soc, gdbReplyConsoleOutput(output))
+                break
+
+            m = re.match('^vHwtUntil:([0-9a-fA-F]+)', packet)
+            if m is not None:
+                reply = self.handler.handleUntil(int(m.group(1), 16))
+                if reply == gdbReplyOk(None):
+                    self._resume()
+                break
+
+            m = re.match('^vHwtTbreak:([0-9a-fA-F]+)', packet)
+            if m is not None:
+                reply = self.handler.handleAddTemporaryBreakpoint(int(m.group(1), 16))
+                break
+
+            m = re.match('^vHwtFinish', packet)
+            if m is not None:
+                reply = self.handler.handleFinish()
+                if reply == gdbReplyOk(None):
+                    self._resume()
                 break
 
             m = re.match('^qSupported:(.*)', packet)
@@ -270,8 +522,8 @@ class GDBServerStub():
                 reply = gdbReplyUnsupported()
                 break
 
+        pktStats.handle.record(perf_counter_ns() - t0)
         if reply is not None:
-            message = gdbPacketReply(reply)
-            trace(f'->:{message}')
-            soc.send(message)
+            self.sendPkt(soc, reply)
+
 
@@ -0,0 +1,139 @@
+import re
+from typing import Dict, List, Optional
+
+# packet type is the name of q/Q/v packets (qSupported, vCont, qRcmd, ...) or the first character otherwise,
+# qRegisterInfo is followed by hex number without any separator
+RE_PACKET_TYPE = re.compile("^(?:qRegisterInfo|[qQv][A-Za-z]+|.)")
+
+
+class LatencyHistogram():
+    """
+    Histogram of latencies with log2 buckets, bucket i contains latencies in [2**(i-1), 2**i) ns
+    (the bucket 0 is for 0 ns).
+
+    :ivar cnt: number of recorded latencies
+    :ivar total: sum of all latencies in ns
+    :ivar max: max latency in ns
+    :ivar buckets: counter for each bucket
+    """
+
+    def __init__(self):
+        self.cnt = 0
+        self.total = 0
+        self.max = 0
+        self.buckets: List[int] = []
+
+    def record(self, t: int):
+        self.cnt += 1
+        self.total += t
+        if t > self.max:
+            self.max = t
+        i = t.bit_length()
+        buckets = self.buckets
+        if i >= len(buckets):
+            buckets.extend(0 for _ in range(i + 1 - len(buckets)))
+        buckets[i] += 1
+
+    def percentile(self, p: float) -> int:
+        """
+        :returns: upper bound of the bucket which contains the p-th percentile (in ns, at most max)
+        """
+        limit = self.cnt * p / 100
+        acc = 0
+        for i, c in enumerate(self.buckets):
+            acc += c
+            if c and acc >= limit:
+                return min(1 << i, self.max)
+        return 0
+
+    def formatBuckets(self) -> str:
+        return " ".join(f"<{_formatNs(1 << i)}:{c:d}" for i, c in enumerate(self.buckets) if c)
+
+
+def _formatNs(t: float) -> str:
+    if t < 1000:
+        return f"{t:.0f}ns"
+    elif t < 1000_000:
+        return f"{t / 1e3:.1f}us"
+    else:
+        return f"{t / 1e6:.1f}ms"
+
+
+class GdbPacketStats():
+    """
+    Latencies of the processing of a single type of RSP packet.
+
+    :ivar parse: extraction of the packet from received data
+    :ivar handle: handling of the packet in stub and handler
+    :ivar encode: encoding of the reply
+    :ivar send: sending of the reply
+    """
+    STAGES = ("parse", "handle", "encode", "send")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.parse = LatencyHistogram()
+        self.handle = LatencyHistogram()
+        self.encode = LatencyHistogram()
+        self.send = LatencyHistogram()
+
+
+class GdbServerStubStats():
+    """
+    Performance counters of :class:`hwtHlsGdb.gdbServerStub.GDBServerStub`.
+    The latencies are only recorded (a few :func:`time.perf_counter_ns` calls per packet, nothing per instruction),
+    the report is formatted on request ("monitor stats").
+
+    :ivar packets: packet type -> stats, the replies which are not a reply to any request
+        (stop replies, console output) are under ASYNC, empty packets under EMPTY
+    """
+    ASYNC = "(async)"
+    EMPTY = "(empty)"
+
+    def __init__(self):
+        self.packets: Dict[str, GdbPacketStats] = {}
+
+    def reset(self):
+        self.packets.clear()
+
+    def getPacketStats(self, packet: Optional[str]) -> GdbPacketStats:
+        """
+        :param packet: the packet or None for async replies
+        """
+        if packet is None:
+            name = self.ASYNC
+        else:
+            m = RE_PACKET_TYPE.match(packet)
+            name = self.EMPTY if m is None else m.group(0)
+        s = self.packets.get(name, None)
+        if s is None:
+            s = self.packets[name] = GdbPacketStats(name)
+        return s
+
+    def format(self, instrCnt: int, simTime: Optional[int], waveLogBytes: Optional[int], histograms: bool=False) -> str:
+        lines = [f"instructions: {instrCnt:d}"]
+        if simTime is not None:
+            lines.append(f"simulation time: {simTime:d}")
+        if waveLogBytes is not None:
+            lines.append(f"wave log bytes: {waveLogBytes:d}")
+
+        lines.append(f"{'packet':16s} {'count':>8s} " + " ".join(f"{s + ' avg/p99/max':>26s}" for s in GdbPacketStats.STAGES))
+        for s in sorted(self.packets.values(), key=lambda s: s.handle.total + s.send.total, reverse=True):
+            cnt = max(s.parse.cnt, s.handle.cnt, s.send.cnt)
+            if not cnt:
+                continue  # the packet which is currently handled
+            cols = []
+            for stage in GdbPacketStats.STAGES:
+                h: LatencyHistogram = getattr(s, stage)
+                if h.cnt:
+                    cols.append(f"{_formatNs(h.total / h.cnt)}/{_formatNs(h.percentile(99))}/{_formatNs(h.max)}")
+                else:
+                    cols.append("-")
+            lines.append(f"{s.name:16s} {cnt:8d} " + " ".join(f"{c:>26s}" for c in cols))
+            if histograms:
+                for stage in GdbPacketStats.STAGES:
+                    h = getattr(s, stage)
+                    if h.cnt:
+                        lines.append(f"  {stage:s}: {h.formatBuckets():s}")
+        lines.append("")
+        return "\n".join(lines)